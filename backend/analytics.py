@@ -0,0 +1,312 @@
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from queries import LINK_FIELDS
+from utils import decode_cursor, keyset_condition, keyset_page, keyset_params, validate_username
+
+logger = logging.getLogger(__name__)
+
+# Tap/scan analytics: events are validated on ingestion, appended to an
+# in-memory ring buffer and written to the append-only events table in
+# batches, so a card tap never waits on a write.
+
+EVENT_TYPES = ('view', 'scan', 'link_click')
+
+MAX_EVENTS_PER_REQUEST = 100
+
+# Client clocks drift; anything further ahead than this is rejected
+MAX_CLOCK_SKEW_SECONDS = 300
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def parse_timestamp(value):
+    """Accept epoch seconds/milliseconds or ISO 8601, returning aware UTC"""
+    if value is None:
+        return datetime.now(timezone.utc)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = value / 1000.0 if value > 1e11 else value
+        return datetime.fromtimestamp(seconds, timezone.utc)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc)
+    raise ValueError("timestamp must be an ISO 8601 string or epoch number")
+
+def normalize_event(raw):
+    """Validate one incoming event, returning (event, None) or (None, error)"""
+    if not isinstance(raw, dict):
+        return None, "Event must be an object"
+
+    event_type = raw.get('type')
+    if event_type not in EVENT_TYPES:
+        return None, f"type must be one of: {', '.join(EVENT_TYPES)}"
+
+    username = str(raw.get('username') or '').strip().lower()
+    if not validate_username(username):
+        return None, "Invalid username"
+
+    link_field = raw.get('link_field')
+    if event_type == 'link_click':
+        if link_field not in LINK_FIELDS:
+            return None, f"link_field must be one of: {', '.join(LINK_FIELDS)}"
+    else:
+        link_field = None
+
+    try:
+        occurred_at = parse_timestamp(raw.get('timestamp'))
+    except (ValueError, OverflowError, OSError):
+        return None, "Invalid timestamp"
+    if (occurred_at - datetime.now(timezone.utc)).total_seconds() > MAX_CLOCK_SKEW_SECONDS:
+        return None, "timestamp is in the future"
+
+    visitor_id = raw.get('visitor_id')
+    if visitor_id is not None:
+        visitor_id = str(visitor_id).strip()[:128] or None
+
+    return {
+        "type": event_type,
+        "username": username,
+        "link_field": link_field,
+        "visitor_id": visitor_id,
+        "occurred_at": occurred_at
+    }, None
+
+def normalize_payload(payload):
+    """Split a single event or {"events": [...]} payload into events and errors"""
+    if isinstance(payload, dict) and isinstance(payload.get('events'), list):
+        raw_events = payload['events']
+    else:
+        raw_events = [payload]
+
+    if len(raw_events) > MAX_EVENTS_PER_REQUEST:
+        return [], [{"index": None, "error": f"At most {MAX_EVENTS_PER_REQUEST} events per request"}]
+
+    events = []
+    errors = []
+    for index, raw in enumerate(raw_events):
+        event, error = normalize_event(raw)
+        if error:
+            errors.append({"index": index, "error": error})
+        else:
+            events.append(event)
+    return events, errors
+
+class EventBuffer:
+    """Bounded ring buffer of pending events.
+
+    When full, the oldest events are overwritten (and counted as dropped)
+    rather than blocking ingestion. ``on_batch_ready`` is called when the
+    buffer reaches ``batch_size`` so the flusher can run early.
+    """
+
+    def __init__(self, capacity=100000, batch_size=500, on_batch_ready=None):
+        self.capacity = max(1, int(capacity))
+        self.batch_size = max(1, int(batch_size))
+        self.on_batch_ready = on_batch_ready
+        self._events = deque(maxlen=self.capacity)
+        self._lock = threading.Lock()
+
+        # Counters
+        self.accepted = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flush_failures = 0
+        self.last_flush_at = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def extend(self, events):
+        notify = False
+        with self._lock:
+            for event in events:
+                if len(self._events) == self.capacity:
+                    self.dropped += 1
+                self._events.append(event)
+                self.accepted += 1
+            notify = len(self._events) >= self.batch_size
+        if notify and self.on_batch_ready:
+            self.on_batch_ready()
+
+    def drain(self, limit=None):
+        """Remove and return up to ``limit`` (default batch_size) oldest events"""
+        limit = limit or self.batch_size
+        with self._lock:
+            count = min(limit, len(self._events))
+            return [self._events.popleft() for _ in range(count)]
+
+    def requeue(self, batch):
+        """Put a failed batch back at the front, as far as capacity allows"""
+        with self._lock:
+            room = self.capacity - len(self._events)
+            keep = batch[:room] if room > 0 else []
+            self.dropped += len(batch) - len(keep)
+            self._events.extendleft(reversed(keep))
+
+    def record_flush(self, count, ok=True):
+        with self._lock:
+            if ok:
+                self.flushed += count
+                self.last_flush_at = datetime.now(timezone.utc).isoformat()
+            else:
+                self.flush_failures += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "pending": len(self._events),
+                "capacity": self.capacity,
+                "batch_size": self.batch_size,
+                "accepted": self.accepted,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "flush_failures": self.flush_failures,
+                "last_flush_at": self.last_flush_at
+            }
+
+def flush_buffer(buffer, sink):
+    """Drain the buffer through sink(batch) until empty or a write fails"""
+    while len(buffer):
+        batch = buffer.drain()
+        if not batch:
+            return
+        try:
+            sink(batch)
+        except Exception:
+            logger.exception("Failed to flush %d analytics events", len(batch))
+            buffer.requeue(batch)
+            buffer.record_flush(len(batch), ok=False)
+            return
+        buffer.record_flush(len(batch))
+
+class BackgroundFlusher:
+    """Daemon thread that flushes the buffer every interval or when a batch is ready"""
+
+    def __init__(self, buffer, sink, interval=2.0):
+        self.buffer = buffer
+        self.sink = sink
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        buffer.on_batch_ready = self._wake.set
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='analytics-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            flush_buffer(self.buffer, self.sink)
+
+    def stop(self):
+        """Stop the thread and write whatever is still buffered"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        flush_buffer(self.buffer, self.sink)
+
+EVENTS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        event_type TEXT NOT NULL,
+        link_field TEXT,
+        visitor_id TEXT,
+        occurred_at TIMESTAMP NOT NULL,
+        received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+'''
+
+EVENTS_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_events_user_time ON events (user_id, occurred_at)
+'''
+
+def resolve_user_ids(conn, usernames):
+    """Map usernames to user ids with a single IN query"""
+    usernames = list(set(usernames))
+    if not usernames:
+        return {}
+    placeholders = ', '.join('?' * len(usernames))
+    rows = conn.execute(
+        f'SELECT username, user_id FROM profiles WHERE username IN ({placeholders})',
+        usernames
+    ).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+def write_events(conn, batch):
+    """Append a batch of events in one transaction; unknown usernames are skipped.
+
+    Returns the (user_id, event) pairs that were written.
+    """
+    user_ids = resolve_user_ids(conn, [e['username'] for e in batch])
+    rows = [
+        (user_ids[e['username']], e)
+        for e in batch if e['username'] in user_ids
+    ]
+    conn.executemany('''
+        INSERT INTO events (user_id, event_type, link_field, visitor_id, occurred_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (user_id, e['type'], e['link_field'], e['visitor_id'],
+         e['occurred_at'].strftime(TIMESTAMP_FORMAT))
+        for user_id, e in rows
+    ])
+    return rows
+
+def sqlite_sink(get_connection, writers=()):
+    """Build a sink that writes batches through a connection factory.
+
+    Each of ``writers`` is called as writer(conn, rows) with the written
+    (user_id, event) pairs inside the same transaction, which is how derived
+    tables such as rollups stay in step with the raw events.
+    """
+    def sink(batch):
+        conn = get_connection()
+        try:
+            rows = write_events(conn, batch)
+            for writer in writers:
+                writer(conn, rows)
+            conn.commit()
+        finally:
+            conn.close()
+    return sink
+
+def list_events(conn, user_id, limit, secret, cursor=None, event_type=None):
+    """One page of a user's raw events, newest first, plus the next cursor.
+
+    Walks idx_events_user_time, whose entries end in the rowid, so deep pages
+    are a seek rather than an OFFSET scan.
+    """
+    scope = f"events:{user_id}"
+    sql = '''
+        SELECT id, event_type, link_field, visitor_id, occurred_at, received_at
+        FROM events WHERE user_id = ?
+    '''
+    params = [user_id]
+    if cursor:
+        occurred_at, row_id = decode_cursor(cursor, secret, scope)
+        sql += ' AND ' + keyset_condition('occurred_at', 'id')
+        params.extend(keyset_params(occurred_at, row_id))
+    if event_type:
+        sql += ' AND event_type = ?'
+        params.append(event_type)
+    sql += ' ORDER BY occurred_at DESC, id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    page, next_cursor = keyset_page(
+        rows, limit, lambda row: (row['occurred_at'], row['id']), secret, scope
+    )
+    return [dict(row) for row in page], next_cursor
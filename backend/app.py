@@ -1,12 +1,40 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file
 from flask_cors import CORS
-import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import re
 import os
 from dotenv import load_dotenv
 import json
+from config import Config
+from pool import get_pool
+from hashing import HashingPool, HashingPoolSaturated
+import io
+import tempfile
+import hmac
+import atexit
+import bulk
+import analytics
+import insights
+import sketches
+import images
+import conditional
+import connections
+import queries
+import search
+import geo
+import static_cards
+import vcard
+import qr
+import usernames
+import bloom
+from queries import LINK_FIELDS
+from repositories import DuplicateError, NotFoundError, sqlite_repositories
+from utils import ensure_column, parse_batch_lookup, parse_patch, page_size
+from cache import (
+    CardCache, TTLCache, create_backend, card_username_key, card_user_id_key,
+    profile_user_id_key, links_user_id_key, user_tag, vcard_username_key
+)
 
 # Load environment variables
 load_dotenv()
@@ -17,11 +45,124 @@ CORS(app)
 # SQLite Configuration
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'tapzx.db')
 
+db_pool = get_pool(
+    DATABASE_PATH,
+    max_size=Config.DB_POOL_SIZE,
+    timeout=Config.DB_POOL_TIMEOUT,
+    busy_timeout_ms=Config.DB_BUSY_TIMEOUT_MS,
+    cache_size_kb=Config.DB_CACHE_SIZE_KB,
+    mmap_size=Config.DB_MMAP_SIZE
+)
+
+# Gazetteer used to geocode profile locations for nearby search
+geo.configure(Config.GAZETTEER_PATH)
+
+# Serialized profile/links/card responses: a per-worker LRU in front of the
+# shared CACHE_URL backend, invalidated on profile/links writes
+profile_cache = CardCache(
+    create_backend(Config.CACHE_URL, Config.PROFILE_CACHE_SIZE),
+    max_entries=Config.PROFILE_CACHE_SIZE,
+    local_ttl=Config.PROFILE_CACHE_TTL,
+    shared_ttl=Config.CACHE_SHARED_TTL
+)
+
+# ETag/Last-Modified per cache key, dropped together with the cached bodies
+validator_cache = TTLCache(
+    max_entries=Config.PROFILE_CACHE_SIZE,
+    ttl=Config.PROFILE_CACHE_TTL
+)
+profile_cache.add_invalidation_listener(validator_cache.invalidate_tag)
+
+def json_body(payload):
+    """Serialize a payload the same way jsonify does"""
+    return jsonify(payload).get_data()
+
+def cached_json_response(body, status=200):
+    """Build a JSON response from cached, already-serialized bytes"""
+    return Response(body, status=status, mimetype='application/json')
+
+def lookup_validators(key, parts, fetch_versions, lookup):
+    """Return (etag, last_modified) for a key from the validator cache or one version query"""
+    validators = validator_cache.get(key)
+    if validators is not None:
+        return validators
+    # A write committing during the query invalidates before we store; skip
+    # caching then, or its stale validators would outlive it for the TTL
+    generation = validator_cache.generation
+    versions = fetch_versions(lookup)
+    if versions is None:
+        return None
+    validators = conditional.make_validators(versions, parts)
+    if validators is not None:
+        validator_cache.set(
+            key, validators, tags=[user_tag(versions['user_id'])], generation=generation
+        )
+    return validators
+
+def conditional_json_response(key, loader, parts, policy, fetch_versions, lookup):
+    """Answer 304 when the client's copy is current, else serve the cached body.
+
+    The precondition check only needs the validators, so an unchanged card is
+    never loaded or serialized.
+    """
+    validators = lookup_validators(key, parts, fetch_versions, lookup)
+    headers = conditional.validator_headers(*validators, policy) if validators else {}
+    if validators and conditional.not_modified(
+        request.headers.get('If-None-Match'),
+        request.headers.get('If-Modified-Since'),
+        *validators
+    ):
+        return Response(status=304, headers=headers)
+    
+    body, status = profile_cache.get_or_load(key, loader)
+    response = cached_json_response(body, status)
+    if status == 200:
+        response.headers.update(headers)
+    return response
+
+# Password hashing runs on a bounded pool so a signin burst cannot tie up
+# every request thread; overflow is rejected with 429
+hash_pool = HashingPool(
+    max_workers=Config.HASH_POOL_WORKERS,
+    max_queue=Config.HASH_POOL_QUEUE,
+    kind=Config.HASH_POOL_KIND
+)
+
+def too_many_hash_requests():
+    """429 response used when the hashing pool is saturated"""
+    response = jsonify({"error": "Too many sign-in requests, please try again shortly"})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+# Profile images live in a content-addressed blob store on disk; variants are
+# rendered by background workers after upload
+image_store = images.ImageStore(Config.IMAGE_STORE_PATH, Config.IMAGE_MAX_BYTES)
+image_pipeline = images.VariantPipeline(image_store, max_workers=Config.IMAGE_WORKERS)
+
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+    """Get a pooled database connection (close() returns it to the pool)"""
+    return db_pool.acquire()
+
+# Users, profiles, links and cards go through the shared repository
+# interface (the Mongo app implements the same one)
+repositories = sqlite_repositories(get_db_connection)
+
+# Public cards are also written as static files (HTML + JSON, precompressed)
+# and re-rendered in the background after writes; disabled without a path
+card_publisher = static_cards.StaticCardPublisher(
+    static_cards.StaticCardWriter(Config.STATIC_CARDS_PATH, Config.STATIC_CARDS_TEMPLATE or None)
+    if Config.STATIC_CARDS_PATH else None,
+    static_cards.sqlite_card_loader(get_db_connection),
+    max_workers=Config.STATIC_CARDS_WORKERS
+)
+
+# Rendered QR codes, content-addressed on disk
+qr_cache = qr.QrCache(Config.QR_CACHE_PATH, Config.QR_CACHE_MAX_BYTES)
+
+@app.teardown_request
+def release_db_connection(exc):
+    """Hand back a connection left checked out by an error path"""
+    db_pool.release_thread()
 
 def init_database():
     """Initialize database with tables"""
@@ -59,6 +200,7 @@ def init_database():
             discord TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            version INTEGER NOT NULL DEFAULT 1,
             FOREIGN KEY (user_id) REFERENCES users (id),
             UNIQUE(user_id)
         )
@@ -77,11 +219,39 @@ def init_database():
             profile_url TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            version INTEGER NOT NULL DEFAULT 1,
+            latitude REAL,
+            longitude REAL,
+            geohash TEXT,
             FOREIGN KEY (user_id) REFERENCES users (id),
             UNIQUE(user_id)
         )
     ''')
     
+    # Keyset index for the admin user listing
+    conn.execute(bulk.USERS_CREATED_INDEX_SQL)
+    
+    # Version counters (bumped on every write) for databases created before them
+    ensure_column(conn, 'links', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    ensure_column(conn, 'profiles', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    
+    # Create append-only analytics events table
+    conn.execute(analytics.EVENTS_TABLE_SQL)
+    conn.execute(analytics.EVENTS_INDEX_SQL)
+    conn.execute(insights.ROLLUPS_TABLE_SQL)
+    conn.execute(sketches.SKETCHES_TABLE_SQL)
+    
+    # Create connections (saved contacts) table
+    conn.execute(connections.CONNECTIONS_TABLE_SQL)
+    for index_sql in connections.CONNECTIONS_INDEX_SQL:
+        conn.execute(index_sql)
+    
+    # Full-text people search, kept in sync by triggers
+    search.init_search(conn)
+    
+    # Geocoded profile locations in an R*Tree for nearby search
+    geo.init_geo(conn, geo.get_gazetteer())
+    
     conn.commit()
     conn.close()
     print("Database initialized successfully!")
@@ -89,6 +259,41 @@ def init_database():
 # Initialize database on startup
 init_database()
 
+# Taken usernames, so availability checks skip the database
+username_index = usernames.UsernameIndex(refresh_interval=Config.USERNAME_INDEX_REFRESH)
+
+def refresh_username_index():
+    conn = get_db_connection()
+    usernames.load_index(conn, username_index)
+    conn.close()
+
+refresh_username_index()
+username_refresher = usernames.IndexRefresher(username_index, refresh_username_index).start()
+
+# Registered emails/phones, so most signups skip the uniqueness lookups
+signup_filter = bloom.SignupFilter(Config.SIGNUP_FILTER_PATH, capacity=Config.SIGNUP_FILTER_CAPACITY)
+
+def sync_signup_filter():
+    conn = get_db_connection()
+    bloom.sync_signup_filter(conn, signup_filter)
+    conn.close()
+
+signup_filter.load()
+sync_signup_filter()
+signup_filter.save()
+atexit.register(signup_filter.save)
+
+# Tap/scan events are buffered in memory and written in batches
+event_buffer = analytics.EventBuffer(
+    capacity=Config.ANALYTICS_BUFFER_SIZE,
+    batch_size=Config.ANALYTICS_BATCH_SIZE
+)
+event_flusher = analytics.BackgroundFlusher(
+    event_buffer,
+    analytics.sqlite_sink(get_db_connection, writers=[insights.write_rollups, sketches.write_sketches]),
+    interval=Config.ANALYTICS_FLUSH_INTERVAL
+).start()
+
 # Validation functions
 def validate_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -103,6 +308,18 @@ def validate_username(username):
     pattern = r'^[a-zA-Z0-9_-]{3,30}$'
     return re.match(pattern, username) is not None
 
+def profile_field_error(field, value):
+    """Validation message for one profile field, or None if it is acceptable"""
+    if field == 'username' and not validate_username(value):
+        return "Username must be 3-30 characters and contain only letters, numbers, underscore, and hyphen"
+    if field == 'bio' and len(value.split()) > 150:
+        return "Bio cannot exceed 150 words"
+    if field == 'organization_name' and len(value) < 2:
+        return "Organization name must be at least 2 characters"
+    if field == 'location' and len(value) < 2:
+        return "Location must be at least 2 characters"
+    return None
+
 def dict_from_row(row):
     """Convert sqlite3.Row to dictionary"""
     return dict(row) if row else None
@@ -152,31 +369,24 @@ def signup():
         if password != confirm_password:
             return jsonify({"error": "Passwords do not match"}), 400
         
-        conn = get_db_connection()
-        
-        # Check if user already exists
-        existing_email = conn.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()
-        if existing_email:
-            conn.close()
+        # Check if user already exists; only possible hits in the filter need a query
+        email_hit, phone_hit = signup_filter.check(email, phone_number)
+        if email_hit and repositories.users.is_registered('email', email):
             return jsonify({"error": "Email already registered"}), 400
         
-        existing_phone = conn.execute('SELECT id FROM users WHERE phone_number = ?', (phone_number,)).fetchone()
-        if existing_phone:
-            conn.close()
+        if phone_hit and repositories.users.is_registered('phone_number', phone_number):
             return jsonify({"error": "Phone number already registered"}), 400
         
-        # Hash password
-        hashed_password = generate_password_hash(password)
+        # Hash password without holding a pooled connection
+        hashed_password = hash_pool.run(generate_password_hash, password)
         
-        # Insert user
-        cursor = conn.execute('''
-            INSERT INTO users (full_name, email, phone_number, password)
-            VALUES (?, ?, ?, ?)
-        ''', (full_name, email, phone_number, hashed_password))
+        # Insert user; the UNIQUE constraints catch anything the filter missed
+        try:
+            user_id = repositories.users.create(full_name, email, phone_number, hashed_password)
+        except DuplicateError as e:
+            return jsonify({"error": bloom.DUPLICATE_MESSAGES[e.field]}), 400
         
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        signup_filter.add(email, phone_number)
         
         return jsonify({
             "message": "User created successfully",
@@ -184,6 +394,8 @@ def signup():
             "success": True
         }), 201
         
+    except HashingPoolSaturated:
+        return too_many_hash_requests()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -198,17 +410,14 @@ def signin():
         email = data['email'].strip().lower()
         password = data['password']
         
-        conn = get_db_connection()
-        
         # Find user
-        user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
-        conn.close()
+        user = repositories.users.get_by_email(email)
         
         if not user:
             return jsonify({"error": "Invalid email or password"}), 401
         
         # Check password
-        if not check_password_hash(user['password'], password):
+        if not hash_pool.run(check_password_hash, user['password_hash'], password):
             return jsonify({"error": "Invalid email or password"}), 401
         
         # Return user info
@@ -220,20 +429,20 @@ def signin():
                 "full_name": user['full_name'],
                 "email": user['email'],
                 "phone_number": user['phone_number'],
-                "is_profile_complete": bool(user['is_profile_complete'])
+                "is_profile_complete": user['is_profile_complete']
             },
             "success": True
         }), 200
         
+    except HashingPoolSaturated:
+        return too_many_hash_requests()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/auth/check-user/<int:user_id>', methods=['GET'])
 def check_user(user_id):
     try:
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-        conn.close()
+        user = repositories.users.get(user_id)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -244,7 +453,7 @@ def check_user(user_id):
                 "full_name": user['full_name'],
                 "email": user['email'],
                 "phone_number": user['phone_number'],
-                "is_profile_complete": bool(user['is_profile_complete'])
+                "is_profile_complete": user['is_profile_complete']
             },
             "success": True
         }), 200
@@ -264,50 +473,16 @@ def save_links():
         
         user_id = data['user_id']
         
-        conn = get_db_connection()
-        
-        # Check if user exists
-        user = conn.execute('SELECT id FROM users WHERE id = ?', (user_id,)).fetchone()
-        if not user:
-            conn.close()
+        # One upsert; the links.user_id foreign key rejects unknown users
+        try:
+            created = repositories.links.save(user_id, data)
+        except NotFoundError:
             return jsonify({"error": "User not found"}), 404
         
-        # Check if links already exist for this user
-        existing_links = conn.execute('SELECT id FROM links WHERE user_id = ?', (user_id,)).fetchone()
-        
-        if existing_links:
-            # Update existing links
-            conn.execute('''
-                UPDATE links SET 
-                website = ?, email = ?, phone = ?, whatsapp = ?, instagram = ?,
-                twitter = ?, linkedin = ?, facebook = ?, youtube = ?, tiktok = ?,
-                github = ?, discord = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (
-                data.get('website'), data.get('email'), data.get('phone'),
-                data.get('whatsapp'), data.get('instagram'), data.get('twitter'),
-                data.get('linkedin'), data.get('facebook'), data.get('youtube'),
-                data.get('tiktok'), data.get('github'), data.get('discord'),
-                user_id
-            ))
-            message = "Links updated successfully"
-        else:
-            # Create new links
-            conn.execute('''
-                INSERT INTO links (
-                    user_id, website, email, phone, whatsapp, instagram,
-                    twitter, linkedin, facebook, youtube, tiktok, github, discord
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user_id, data.get('website'), data.get('email'), data.get('phone'),
-                data.get('whatsapp'), data.get('instagram'), data.get('twitter'),
-                data.get('linkedin'), data.get('facebook'), data.get('youtube'),
-                data.get('tiktok'), data.get('github'), data.get('discord')
-            ))
-            message = "Links saved successfully"
-        
-        conn.commit()
-        conn.close()
+        message = "Links saved successfully" if created else "Links updated successfully"
+        
+        profile_cache.invalidate_tag(user_tag(user_id))
+        card_publisher.submit(user_id)
         
         return jsonify({
             "message": message,
@@ -317,24 +492,62 @@ def save_links():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/links/get/<int:user_id>', methods=['GET'])
-def get_links(user_id):
+@app.route('/api/links/<int:user_id>', methods=['PATCH'])
+def patch_links(user_id):
     try:
-        conn = get_db_connection()
-        links = conn.execute('SELECT * FROM links WHERE user_id = ?', (user_id,)).fetchone()
-        conn.close()
+        try:
+            changes, expected_version = parse_patch(request.get_json(silent=True), LINK_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Only the sent columns are written; a stale version matches no row
+        try:
+            version = repositories.links.patch(user_id, changes, expected_version)
+        except NotFoundError:
+            return jsonify({"error": "User not found"}), 404
+        if version is None:
+            current = repositories.links.version(user_id)
+            if current is None:
+                return jsonify({"error": "Links not found"}), 404
+            return jsonify({
+                "error": "Links were changed by another request",
+                "version": current
+            }), 409
         
-        if not links:
-            return jsonify({"error": "Links not found"}), 404
+        profile_cache.invalidate_tag(user_tag(user_id))
+        card_publisher.submit(user_id)
         
         return jsonify({
-            "links": dict_from_row(links),
+            "message": "Links updated successfully",
+            "version": version,
             "success": True
         }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/links/get/<int:user_id>', methods=['GET'])
+def get_links(user_id):
+    try:
+        def load():
+            links = repositories.links.get(user_id)
+            
+            if not links:
+                return json_body({"error": "Links not found"}), 404, None
+            
+            return json_body({
+                "links": links,
+                "success": True
+            }), 200, [user_tag(user_id)]
+        
+        return conditional_json_response(
+            links_user_id_key(user_id), load,
+            conditional.LINKS, 'private', repositories.cards.versions_by_user_id, user_id
+        )
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Profile Routes
 
 @app.route('/api/profile/save', methods=['POST'])
@@ -353,79 +566,106 @@ def save_profile():
         organization_name = data['organization_name'].strip()
         bio = data['bio'].strip()
         location = data['location'].strip()
-        profile_image = data.get('profile_image')
         
-        conn = get_db_connection()
+        # Validate fields
+        for field, value in (('username', username), ('bio', bio),
+                             ('organization_name', organization_name), ('location', location)):
+            error = profile_field_error(field, value)
+            if error:
+                return jsonify({"error": error}), 400
         
-        # Check if user exists
-        user = conn.execute('SELECT id FROM users WHERE id = ?', (user_id,)).fetchone()
-        if not user:
-            conn.close()
-            return jsonify({"error": "User not found"}), 404
+        try:
+            profile_image = images.store_profile_image(image_store, image_pipeline, data.get('profile_image'))
+        except images.ImageError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Validate username
-        if not validate_username(username):
-            conn.close()
-            return jsonify({"error": "Username must be 3-30 characters and contain only letters, numbers, underscore, and hyphen"}), 400
-        
-        # Check if username is already taken by another user
-        existing_profile = conn.execute(
-            'SELECT id FROM profiles WHERE username = ? AND user_id != ?', 
-            (username, user_id)
-        ).fetchone()
-        if existing_profile:
-            conn.close()
+        # Generate profile URL
+        profile_url = f"tapzx.app/{username}"
+        
+        # Mark the user complete and upsert the profile in one transaction;
+        # the profiles.username UNIQUE constraint rejects taken usernames
+        try:
+            created = repositories.profiles.save(user_id, {
+                "username": username,
+                "organization_name": organization_name,
+                "bio": bio,
+                "location": location,
+                "profile_image": profile_image,
+                "profile_url": profile_url,
+                **geo.location_fields(location, geo.get_gazetteer())
+            })
+        except DuplicateError:
             return jsonify({"error": "Username already taken"}), 400
+        except NotFoundError:
+            return jsonify({"error": "User not found"}), 404
         
-        # Validate bio word count
-        bio_words = len(bio.split())
-        if bio_words > 150:
-            conn.close()
-            return jsonify({"error": "Bio cannot exceed 150 words"}), 400
+        message = "Profile created successfully" if created else "Profile updated successfully"
         
-        # Validate other fields
-        if len(organization_name) < 2:
-            conn.close()
-            return jsonify({"error": "Organization name must be at least 2 characters"}), 400
+        profile_cache.invalidate_tag(user_tag(user_id))
+        card_publisher.submit(user_id)
+        username_index.set(user_id, username)
         
-        if len(location) < 2:
-            conn.close()
-            return jsonify({"error": "Location must be at least 2 characters"}), 400
+        return jsonify({
+            "message": message,
+            "profile_url": profile_url,
+            "success": True
+        }), 200
         
-        # Generate profile URL
-        profile_url = f"tapzx.app/{username}"
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/profile/<int:user_id>', methods=['PATCH'])
+def patch_profile(user_id):
+    try:
+        try:
+            changes, expected_version = parse_patch(request.get_json(silent=True), queries.PATCHABLE_PROFILE_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        for field, value in changes.items():
+            if field == 'profile_image':
+                continue
+            if value is None:
+                return jsonify({"error": f"{field} cannot be empty"}), 400
+            value = value.strip()
+            if field == 'username':
+                value = value.lower()
+            changes[field] = value
+            error = profile_field_error(field, value)
+            if error:
+                return jsonify({"error": error}), 400
+        
+        if 'profile_image' in changes:
+            try:
+                changes['profile_image'] = images.store_profile_image(image_store, image_pipeline, changes['profile_image'])
+            except images.ImageError as e:
+                return jsonify({"error": str(e)}), 400
+        
+        if 'location' in changes:
+            changes.update(geo.location_fields(changes['location'], geo.get_gazetteer()))
+        
+        # Only the sent columns are written; a stale version matches no row
+        try:
+            version = repositories.profiles.patch(user_id, changes, expected_version)
+        except DuplicateError:
+            return jsonify({"error": "Username already taken"}), 400
+        if version is None:
+            current = repositories.profiles.version(user_id)
+            if current is None:
+                return jsonify({"error": "Profile not found"}), 404
+            return jsonify({
+                "error": "Profile was changed by another request",
+                "version": current
+            }), 409
         
-        # Check if profile already exists for this user
-        existing_user_profile = conn.execute('SELECT id FROM profiles WHERE user_id = ?', (user_id,)).fetchone()
-        
-        if existing_user_profile:
-            # Update existing profile
-            conn.execute('''
-                UPDATE profiles SET 
-                username = ?, organization_name = ?, bio = ?, location = ?,
-                profile_image = ?, profile_url = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (username, organization_name, bio, location, profile_image, profile_url, user_id))
-            message = "Profile updated successfully"
-        else:
-            # Create new profile
-            conn.execute('''
-                INSERT INTO profiles (
-                    user_id, username, organization_name, bio, location,
-                    profile_image, profile_url
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, username, organization_name, bio, location, profile_image, profile_url))
-            message = "Profile created successfully"
-        
-        # Update user's profile completion status
-        conn.execute('UPDATE users SET is_profile_complete = TRUE WHERE id = ?', (user_id,))
-        
-        conn.commit()
-        conn.close()
+        profile_cache.invalidate_tag(user_tag(user_id))
+        card_publisher.submit(user_id)
+        if 'username' in changes:
+            username_index.set(user_id, changes['username'])
         
         return jsonify({
-            "message": message,
-            "profile_url": profile_url,
+            "message": "Profile updated successfully",
+            "version": version,
             "success": True
         }), 200
         
@@ -435,17 +675,74 @@ def save_profile():
 @app.route('/api/profile/get/<int:user_id>', methods=['GET'])
 def get_profile(user_id):
     try:
-        conn = get_db_connection()
-        profile = conn.execute('SELECT * FROM profiles WHERE user_id = ?', (user_id,)).fetchone()
-        conn.close()
+        def load():
+            profile = repositories.profiles.get(user_id)
+            
+            if not profile:
+                return json_body({"error": "Profile not found"}), 404, None
+            
+            return json_body({
+                "profile": profile,
+                "success": True
+            }), 200, [user_tag(user_id)]
+        
+        return conditional_json_response(
+            profile_user_id_key(user_id), load,
+            conditional.PROFILE, 'private', repositories.cards.versions_by_user_id, user_id
+        )
         
-        if not profile:
-            return jsonify({"error": "Profile not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/profile/image', methods=['POST'])
+def upload_profile_image():
+    try:
+        upload = request.files.get('image')
+        stream = upload.stream if upload else request.stream
+        
+        try:
+            digest, fmt = image_store.put_stream(stream)
+        except images.ImageError as e:
+            return jsonify({"error": str(e)}), 400
+        image_pipeline.submit(digest)
+        
+        url = images.image_url(digest)
+        user_id = request.form.get('user_id') or request.args.get('user_id')
+        if user_id:
+            if repositories.profiles.set_image(user_id, url):
+                profile_cache.invalidate_tag(user_tag(user_id))
+                card_publisher.submit(user_id)
         
         return jsonify({
-            "profile": dict_from_row(profile),
+            "image": {
+                "id": digest,
+                "format": fmt,
+                "url": url,
+                "variants": images.variant_urls(digest)
+            },
             "success": True
-        }), 200
+        }), 201
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/images/<digest>', methods=['GET'])
+def serve_image(digest):
+    try:
+        resolved = image_store.resolve(
+            digest,
+            request.args.get('size'),
+            webp='image/webp' in request.headers.get('Accept', '')
+        )
+        if not resolved:
+            return jsonify({"error": "Image not found"}), 404
+        path, mimetype, etag = resolved
+        
+        # send_file streams the file and answers If-None-Match and Range
+        response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=31536000)
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response.vary.add('Accept')
+        return response
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -461,13 +758,11 @@ def check_username(username):
                 "message": "Username must be 3-30 characters and contain only letters, numbers, underscore, and hyphen"
             }), 400
         
-        conn = get_db_connection()
-        existing_profile = conn.execute('SELECT id FROM profiles WHERE username = ?', (username,)).fetchone()
-        conn.close()
+        # A user's own current username counts as available to them
+        result = username_index.check(username, user_id=request.args.get('user_id'))
         
         return jsonify({
-            "username": username,
-            "available": existing_profile is None,
+            **result,
             "success": True
         }), 200
         
@@ -479,32 +774,124 @@ def get_profile_by_username(username):
     try:
         username = username.strip().lower()
         
-        conn = get_db_connection()
+        def load():
+            card = repositories.cards.by_username(username)
+            
+            if not card:
+                return json_body({"error": "Profile not found"}), 404, None
+            
+            if not card['user']:
+                return json_body({"error": "User not found"}), 404, None
+            
+            return json_body({
+                "profile": card['profile'],
+                "user": card['user'],
+                "links": card['links'],
+                "success": True
+            }), 200, [user_tag(card['profile']['user_id'])]
+        
+        return conditional_json_response(
+            card_username_key(username), load,
+            conditional.CARD, 'public', repositories.cards.versions_by_username, username
+        )
         
-        # Get profile
-        profile = conn.execute('SELECT * FROM profiles WHERE username = ?', (username,)).fetchone()
-        if not profile:
-            conn.close()
-            return jsonify({"error": "Profile not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/card/<username>.vcf', methods=['GET'])
+def get_vcard(username):
+    try:
+        username = username.strip().lower()
+        photo = request.args.get('photo', 'embed')
+        if photo not in vcard.PHOTO_MODES:
+            return jsonify({"error": f"photo must be one of {', '.join(vcard.PHOTO_MODES)}"}), 400
+        # Photo URLs (linked, or embeds too large to inline) carry the base URL;
+        # the request's Host is client controlled, so only a configured one is cached
+        base_url = Config.PUBLIC_BASE_URL or request.host_url
+        
+        def load():
+            card = repositories.cards.by_username(username)
+            
+            if not card or not card['user']:
+                return json_body({"error": "Profile not found"}), 404, None
+            
+            photo_uri = vcard.card_photo(card['profile']['profile_image'], image_store, photo, base_url)
+            return vcard.build_vcard(card, photo_uri).encode('utf-8'), 200, [user_tag(card['profile']['user_id'])]
+        
+        if Config.PUBLIC_BASE_URL or photo == 'none':
+            body, status = profile_cache.get_or_load(vcard_username_key(username, photo), load)
+        else:
+            body, status, _ = load()
+        if status != 200:
+            return cached_json_response(body, status)
+        return Response(
+            body,
+            mimetype='text/vcard',
+            headers={"Content-Disposition": f"attachment; filename={username}.vcf"}
+        )
         
-        # Get user info
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (profile['user_id'],)).fetchone()
-        if not user:
-            conn.close()
-            return jsonify({"error": "User not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/qr/<username>.<fmt>', methods=['GET'])
+def get_qr_code(username, fmt):
+    try:
+        username = username.strip().lower()
+        try:
+            fmt, size, level, border = qr.parse_params(
+                fmt, request.args.get('size'), request.args.get('ecc'), request.args.get('border')
+            )
+        except qr.QrError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Checked in the database: the username index can lag other workers' writes
+        if not repositories.profiles.get_by_username(username):
+            return jsonify({"error": "Profile not found"}), 404
         
-        # Get links
-        links = conn.execute('SELECT * FROM links WHERE user_id = ?', (profile['user_id'],)).fetchone()
+        # The code depends only on the URL and parameters, so a rendering
+        # never changes and can be cached forever under its key
+        data, key = qr_cache.get_or_render(
+            qr.profile_link(f"tapzx.app/{username}"), fmt, size, level, border
+        )
+        if request.if_none_match.contains(key):
+            response = Response(status=304)
+        else:
+            response = Response(data, mimetype=qr.CONTENT_TYPES[fmt])
+        response.set_etag(key)
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
         
-        conn.close()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/profiles/batch', methods=['POST'])
+def get_profiles_batch():
+    try:
+        try:
+            usernames, user_ids = parse_batch_lookup(request.get_json(silent=True), Config.PROFILE_BATCH_MAX)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        cards = repositories.cards.many(usernames, user_ids)
+        
+        by_username = {}
+        by_user_id = {}
+        for card in cards:
+            if not card['user']:
+                continue
+            body = {"profile": card['profile'], "user": card['user'], "links": card['links']}
+            by_username[card['profile']['username']] = body
+            by_user_id[card['profile']['user_id']] = body
         
         return jsonify({
-            "profile": dict_from_row(profile),
-            "user": {
-                "full_name": user['full_name'],
-                "email": user['email']
+            "profiles": {
+                "by_username": {u: by_username[u] for u in usernames if u in by_username},
+                "by_user_id": {str(i): by_user_id[i] for i in user_ids if i in by_user_id}
+            },
+            "not_found": {
+                "usernames": [u for u in usernames if u not in by_username],
+                "user_ids": [i for i in user_ids if i not in by_user_id]
             },
-            "links": dict_from_row(links) if links else None,
             "success": True
         }), 200
         
@@ -516,39 +903,522 @@ def get_profile_by_username(username):
 @app.route('/api/user/complete/<int:user_id>', methods=['GET'])
 def get_complete_user_data(user_id):
     try:
+        def load():
+            data = repositories.cards.complete_user(user_id)
+            
+            if not data:
+                return json_body({"error": "User not found"}), 404, None
+            
+            user = data['user']
+            
+            return json_body({
+                "user": {
+                    "id": user['id'],
+                    "full_name": user['full_name'],
+                    "email": user['email'],
+                    "phone_number": user['phone_number'],
+                    "is_profile_complete": bool(user['is_profile_complete']),
+                    "created_at": user['created_at']
+                },
+                "links": data['links'],
+                "profile": data['profile'],
+                "success": True
+            }), 200, [user_tag(user_id)]
+        
+        return conditional_json_response(
+            card_user_id_key(user_id), load,
+            conditional.CARD, 'private', repositories.cards.versions_by_user_id, user_id
+        )
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Connections Routes
+
+def connection_owner_exists(conn, owner_id):
+    return conn.execute('SELECT id FROM users WHERE id = ?', (owner_id,)).fetchone() is not None
+
+def connection_owner_id(data):
+    """owner_id from a request body as an int, or None if it is not one"""
+    try:
+        return int(data['owner_id'])
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/api/connections/save', methods=['POST'])
+def save_connection():
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('owner_id'):
+            return jsonify({"error": "owner_id is required"}), 400
+        owner_id = connection_owner_id(data)
+        if owner_id is None:
+            return jsonify({"error": "Invalid owner_id"}), 400
+        
         conn = get_db_connection()
+        if not connection_owner_exists(conn, owner_id):
+            conn.close()
+            return jsonify({"error": "User not found"}), 404
+        
+        result = connections.save_connections(conn, owner_id, [data])[0]
+        conn.close()
+        
+        if result['status'] == 'error':
+            status = 404 if result['error'] == "Target user not found" else 400
+            return jsonify({"error": result['error']}), status
+        
+        return jsonify({
+            "message": "Connection saved successfully",
+            "target_user_id": result['target_user_id'],
+            "success": True
+        }), 200
         
-        # Get user
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/connections/sync', methods=['POST'])
+def sync_connections():
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('owner_id'):
+            return jsonify({"error": "owner_id is required"}), 400
+        scans = data.get('scans')
+        if not isinstance(scans, list) or not scans:
+            return jsonify({"error": "scans must be a non-empty list"}), 400
+        if len(scans) > connections.MAX_SYNC_ITEMS:
+            return jsonify({"error": f"At most {connections.MAX_SYNC_ITEMS} scans per sync"}), 400
+        owner_id = connection_owner_id(data)
+        if owner_id is None:
+            return jsonify({"error": "Invalid owner_id"}), 400
+        
+        conn = get_db_connection()
+        if not connection_owner_exists(conn, owner_id):
+            conn.close()
+            return jsonify({"error": "User not found"}), 404
+        
+        results = connections.save_connections(conn, owner_id, scans)
+        conn.close()
+        
+        return jsonify({
+            "saved": sum(1 for r in results if r['status'] == 'saved'),
+            "failed": sum(1 for r in results if r['status'] == 'error'),
+            "results": results,
+            "success": True
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/connections/<int:owner_id>', methods=['GET'])
+def list_connections(owner_id):
+    try:
+        try:
+            limit = page_size(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        try:
+            items, next_cursor = connections.list_connections(
+                conn, owner_id, limit, Config.SECRET_KEY,
+                cursor=request.args.get('cursor'),
+                tag=request.args.get('tag')
+            )
+        except ValueError as e:
+            conn.close()
+            return jsonify({"error": str(e)}), 400
+        conn.close()
+        
+        return jsonify({
+            "connections": items,
+            "next_cursor": next_cursor,
+            "success": True
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/connections/<int:owner_id>/contacts.vcf', methods=['GET'])
+def export_connection_vcards(owner_id):
+    photo = request.args.get('photo', 'link')
+    if photo not in vcard.PHOTO_MODES:
+        return jsonify({"error": f"photo must be one of {', '.join(vcard.PHOTO_MODES)}"}), 400
+    
+    # Generated one page of connections at a time while the response streams
+    cards = vcard.iter_connection_vcards(
+        get_db_connection, owner_id, image_store, photo, Config.PUBLIC_BASE_URL or request.host_url,
+        tag=request.args.get('tag')
+    )
+    return Response(
+        stream_with_context(cards),
+        mimetype='text/vcard',
+        headers={"Content-Disposition": f"attachment; filename=tapzx-connections-{owner_id}.vcf"}
+    )
+
+@app.route('/api/connections/<int:user_id>/status/<int:other_id>', methods=['GET'])
+def get_connection_status(user_id, other_id):
+    try:
+        conn = get_db_connection()
+        status = connections.connection_status(conn, user_id, other_id)
+        conn.close()
+        
+        return jsonify({**status, "success": True}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/connections/<int:owner_id>/<int:target_user_id>', methods=['DELETE'])
+def remove_connection(owner_id, target_user_id):
+    try:
+        conn = get_db_connection()
+        deleted = connections.delete_connection(conn, owner_id, target_user_id)
+        conn.close()
+        
+        if not deleted:
+            return jsonify({"error": "Connection not found"}), 404
+        
+        return jsonify({
+            "message": "Connection deleted successfully",
+            "success": True
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Analytics Routes
+
+@app.route('/api/events', methods=['POST'])
+def ingest_events():
+    try:
+        data = request.get_json(silent=True)
+        if data is None:
+            return jsonify({"error": "JSON body is required"}), 400
+        
+        events, errors = analytics.normalize_payload(data)
+        if not events:
+            return jsonify({"error": "No valid events", "errors": errors}), 400
+        
+        event_buffer.extend(events)
+        
+        return jsonify({
+            "accepted": len(events),
+            "rejected": errors,
+            "success": True
+        }), 202
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/insights/<int:user_id>', methods=['GET'])
+def get_insights(user_id):
+    try:
+        try:
+            granularity, start, end = insights.resolve_range(
+                request.args.get('granularity', 'day'),
+                request.args.get('start'),
+                request.args.get('end')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        user = conn.execute('SELECT id FROM users WHERE id = ?', (user_id,)).fetchone()
         if not user:
             conn.close()
             return jsonify({"error": "User not found"}), 404
         
-        # Get links
-        links = conn.execute('SELECT * FROM links WHERE user_id = ?', (user_id,)).fetchone()
+        data = insights.query_insights(conn, user_id, granularity, start, end)
+        conn.close()
         
-        # Get profile
-        profile = conn.execute('SELECT * FROM profiles WHERE user_id = ?', (user_id,)).fetchone()
+        return jsonify({
+            "insights": data,
+            "success": True
+        }), 200
         
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/insights/<int:user_id>/unique', methods=['GET'])
+def get_unique_visitors(user_id):
+    try:
+        try:
+            first, last = sketches.resolve_days(
+                request.args.get('period'),
+                request.args.get('start'),
+                request.args.get('end')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        user = conn.execute('SELECT id FROM users WHERE id = ?', (user_id,)).fetchone()
+        if not user:
+            conn.close()
+            return jsonify({"error": "User not found"}), 404
+        
+        data = sketches.query_unique(conn, user_id, first, last)
         conn.close()
         
         return jsonify({
-            "user": {
-                "id": user['id'],
-                "full_name": user['full_name'],
-                "email": user['email'],
-                "phone_number": user['phone_number'],
-                "is_profile_complete": bool(user['is_profile_complete']),
-                "created_at": user['created_at']
-            },
-            "links": dict_from_row(links) if links else None,
-            "profile": dict_from_row(profile) if profile else None,
+            "visitors": data,
+            "success": True
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/insights/<int:user_id>/events', methods=['GET'])
+def list_user_events(user_id):
+    try:
+        try:
+            limit = page_size(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        try:
+            events, next_cursor = analytics.list_events(
+                conn, user_id, limit, Config.SECRET_KEY,
+                cursor=request.args.get('cursor'),
+                event_type=request.args.get('type')
+            )
+        except ValueError as e:
+            conn.close()
+            return jsonify({"error": str(e)}), 400
+        conn.close()
+        
+        return jsonify({
+            "events": events,
+            "next_cursor": next_cursor,
             "success": True
         }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Search Routes
+
+@app.route('/api/search', methods=['GET'])
+def search_people():
+    try:
+        try:
+            limit = page_size(request.args.get('limit'), default=20)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        try:
+            results, next_cursor = search.search_profiles(
+                conn, request.args.get('q'), limit, Config.SECRET_KEY,
+                cursor=request.args.get('cursor')
+            )
+        except ValueError as e:
+            conn.close()
+            return jsonify({"error": str(e)}), 400
+        conn.close()
+        
+        return jsonify({
+            "results": results,
+            "next_cursor": next_cursor,
+            "success": True
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/nearby', methods=['GET'])
+def nearby_people():
+    try:
+        try:
+            k, radius_km = geo.parse_nearby_params(request.args.get('k'), request.args.get('radius_km'))
+            exclude_user_id = request.args.get('user_id', type=int)
+            if request.args.get('lat') is not None or request.args.get('lon') is not None:
+                latitude, longitude = geo.parse_point(request.args.get('lat'), request.args.get('lon'))
+            elif request.args.get('username'):
+                latitude = longitude = None
+            elif request.args.get('location'):
+                place = geo.get_gazetteer().geocode(request.args['location'])
+                if place is None:
+                    return jsonify({"error": "Location not recognized"}), 404
+                latitude, longitude = place.latitude, place.longitude
+            else:
+                return jsonify({"error": "lat and lon, username or location is required"}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        if latitude is None:
+            profile = conn.execute(
+                'SELECT user_id, latitude, longitude FROM profiles WHERE username = ?',
+                (request.args['username'].strip().lower(),)
+            ).fetchone()
+            if not profile:
+                conn.close()
+                return jsonify({"error": "Profile not found"}), 404
+            if profile['latitude'] is None:
+                conn.close()
+                return jsonify({"error": "Profile location is not known"}), 404
+            latitude, longitude = profile['latitude'], profile['longitude']
+            if exclude_user_id is None:
+                exclude_user_id = profile['user_id']
+        
+        results = geo.nearest_profiles(conn, latitude, longitude, k, radius_km, exclude_user_id)
+        conn.close()
+        
+        return jsonify({
+            "results": results,
+            "center": {"latitude": latitude, "longitude": longitude},
+            "success": True
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Admin Routes
+
+def require_admin():
+    """Return an error response unless the request carries the admin API key"""
+    if not Config.ADMIN_API_KEY:
+        return jsonify({"error": "Admin API is disabled"}), 403
+    provided = request.headers.get('X-Admin-Key', '')
+    if not hmac.compare_digest(provided, Config.ADMIN_API_KEY):
+        return jsonify({"error": "Invalid admin key"}), 401
+    return None
+
+def bulk_format():
+    """Pick ndjson/csv from ?format= or the Content-Type header"""
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if 'csv' in (request.content_type or '') else 'ndjson'
+    return fmt if fmt in bulk.FORMATS else None
+
+@app.route('/api/admin/users', methods=['GET'])
+def admin_list_users():
+    try:
+        error = require_admin()
+        if error:
+            return error
+        
+        try:
+            limit = page_size(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        try:
+            users, next_cursor = bulk.list_users(
+                conn, limit, Config.SECRET_KEY, cursor=request.args.get('cursor')
+            )
+        except ValueError as e:
+            conn.close()
+            return jsonify({"error": str(e)}), 400
+        conn.close()
+        
+        return jsonify({
+            "users": users,
+            "next_cursor": next_cursor,
+            "success": True
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/admin/bulk/import', methods=['POST'])
+def bulk_import():
+    try:
+        error = require_admin()
+        if error:
+            return error
+        
+        fmt = bulk_format()
+        if not fmt:
+            return jsonify({"error": "format must be ndjson or csv"}), 400
+        
+        chunk_size = request.args.get('chunk_size', bulk.DEFAULT_CHUNK_SIZE, type=int)
+        
+        # Parse the body incrementally instead of loading it into memory
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        summary = bulk.import_records(
+            get_db_connection,
+            bulk.parse_records(stream, fmt),
+            generate_password_hash,
+            hash_pool,
+            chunk_size=max(1, min(chunk_size, 5000))
+        )
+        
+        for user_id in summary.pop('user_ids'):
+            card_publisher.submit(user_id)
+        refresh_username_index()
+        sync_signup_filter()
+        
+        return jsonify({
+            "message": f"Imported {summary['imported']} users",
+            **summary,
+            "success": summary['failed'] == 0
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/admin/bulk/export', methods=['GET'])
+def bulk_export():
+    error = require_admin()
+    if error:
+        return error
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in bulk.FORMATS:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    
+    rows = bulk.export_rows(get_db_connection)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(bulk.serialize_export(rows, fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=tapzx-users.{fmt}"}
+    )
+
+@app.route('/api/admin/qr/roster', methods=['GET'])
+def qr_roster():
+    try:
+        error = require_admin()
+        if error:
+            return error
+        
+        organization = (request.args.get('organization') or '').strip()
+        if not organization:
+            return jsonify({"error": "organization is required"}), 400
+        try:
+            fmt, size, level, border = qr.parse_params(
+                request.args.get('format', 'svg'), request.args.get('size'),
+                request.args.get('ecc'), request.args.get('border')
+            )
+        except qr.QrError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conn = get_db_connection()
+        members = [tuple(row) for row in conn.execute(qr.ROSTER_SQL, (organization,))]
+        conn.close()
+        if not members:
+            return jsonify({"error": "No profiles in this organization"}), 404
+        
+        codes = qr.render_roster(members, qr_cache, fmt, size, level, border, Config.QR_WORKERS)
+        
+        # Large rosters spill to disk instead of growing the worker's memory
+        archive = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        qr.write_roster_zip(archive, codes, fmt)
+        archive.seek(0)
+        slug = re.sub(r'[^a-z0-9]+', '-', organization.lower()).strip('-') or 'organization'
+        return send_file(
+            archive, mimetype='application/zip', as_attachment=True,
+            download_name=f"tapzx-qr-{slug}.zip"
+        )
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Health Check
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -561,6 +1431,7 @@ def health_check():
         return jsonify({
             "status": "healthy",
             "database": "connected",
+            "pool": db_pool.metrics(),
             "timestamp": datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -569,5 +1440,21 @@ def health_check():
             "error": str(e)
         }), 500
 
+# Metrics
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        "db_pool": db_pool.metrics(),
+        "profile_cache": profile_cache.stats(),
+        "hash_pool": hash_pool.metrics(),
+        "analytics": event_buffer.metrics(),
+        "images": image_pipeline.metrics(),
+        "usernames": username_index.stats(),
+        "signup_filter": signup_filter.stats(),
+        "static_cards": card_publisher.metrics(),
+        "qr_cache": qr_cache.stats(),
+        "success": True
+    }), 200
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
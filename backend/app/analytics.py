@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from analytics import EventBuffer
+from app.config import settings
+from app.database import get_database
+from app.insights import write_rollups
+from app.sketches import write_sketches
+
+logger = logging.getLogger(__name__)
+
+# Mongo side of the analytics pipeline: events share the ring buffer with the
+# Flask app and are flushed by an asyncio task into the append-only events
+# collection. Each event gets its _id when buffered, so a batch that is
+# retried after a partial insert_many does not store anything twice.
+
+event_buffer = EventBuffer(
+    capacity=settings.ANALYTICS_BUFFER_SIZE,
+    batch_size=settings.ANALYTICS_BATCH_SIZE
+)
+
+# Derived writers applied to every flushed batch as writer(db, rows)
+WRITERS = [write_rollups, write_sketches]
+
+# (writer, rows) steps that failed after their events were stored; retried
+# on the next flush instead of requeueing (and re-inserting) the events
+_pending_writes: List[tuple] = []
+
+DUPLICATE_KEY = 11000
+
+_wake: Optional[asyncio.Event] = None
+_task: Optional[asyncio.Task] = None
+
+def enqueue(events: List[dict]) -> None:
+    """Assign event ids and append normalized events to the buffer"""
+    for event in events:
+        event["id"] = ObjectId()
+    event_buffer.extend(events)
+
+async def write_events(db, batch: List[dict]) -> List[tuple]:
+    """Append a batch with insert_many; unknown usernames are skipped.
+
+    Returns the (user_id, event) pairs that were written.
+    """
+    usernames = list({e["username"] for e in batch})
+    user_ids = {}
+    async for doc in db.profiles.find({"username": {"$in": usernames}}, {"username": 1, "user_id": 1}):
+        user_ids[doc["username"]] = doc["user_id"]
+
+    rows = [(user_ids[e["username"]], e) for e in batch if e["username"] in user_ids]
+    if rows:
+        try:
+            await db.events.insert_many([{
+                "_id": e["id"],
+                "user_id": user_id,
+                "event_type": e["type"],
+                "link_field": e["link_field"],
+                "visitor_id": e["visitor_id"],
+                "occurred_at": e["occurred_at"]
+            } for user_id, e in rows], ordered=False)
+        except BulkWriteError as error:
+            # Events already stored by an earlier, partly failed attempt
+            write_errors = error.details.get("writeErrors", [])
+            if error.details.get("writeConcernErrors") or any(
+                e.get("code") != DUPLICATE_KEY for e in write_errors
+            ):
+                raise
+    return rows
+
+async def _apply(db, writer: Callable, rows: List[tuple]) -> bool:
+    try:
+        await writer(db, rows)
+    except Exception:
+        logger.exception("Analytics writer %s failed for %d events", writer.__name__, len(rows))
+        _pending_writes.append((writer, rows))
+        return False
+    return True
+
+async def flush() -> None:
+    """Drain the buffer into Mongo until empty or a write fails"""
+    db = get_database()
+    retry = _pending_writes[:]
+    _pending_writes.clear()
+    for writer, rows in retry:
+        await _apply(db, writer, rows)
+    if _pending_writes:
+        event_buffer.record_flush(0, ok=False)
+        return
+    while len(event_buffer):
+        batch = event_buffer.drain()
+        if not batch:
+            return
+        try:
+            rows = await write_events(db, batch)
+        except Exception:
+            logger.exception("Failed to flush %d analytics events", len(batch))
+            event_buffer.requeue(batch)
+            event_buffer.record_flush(len(batch), ok=False)
+            return
+        event_buffer.record_flush(len(batch))
+        # Only the failed derived writes are retried; the events are stored
+        results = [await _apply(db, writer, rows) for writer in WRITERS]
+        if not all(results):
+            event_buffer.record_flush(0, ok=False)
+            return
+
+async def _flush_loop() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=settings.ANALYTICS_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        await flush()
+
+def start_flusher() -> None:
+    """Start the background flush task on the running event loop"""
+    global _wake, _task
+    _wake = asyncio.Event()
+    event_buffer.on_batch_ready = _wake.set
+    _task = asyncio.create_task(_flush_loop())
+
+async def stop_flusher() -> None:
+    """Cancel the flush task and write whatever is still buffered"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    await flush()
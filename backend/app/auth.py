@@ -1,3 +1,5 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -5,16 +7,39 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import settings
-from app.database import get_database
+from app.repositories import repositories
 from app.models import TokenData, UserResponse
-from bson import ObjectId
+from app.card_cache import profile_cache
+from hashing import HashingPool, HashingPoolSaturated
+from cache import TTLCache, user_tag
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt runs on a bounded pool so it never blocks the event loop
+hash_pool = HashingPool(
+    max_workers=settings.HASH_POOL_WORKERS,
+    max_queue=settings.HASH_POOL_QUEUE,
+    kind=settings.HASH_POOL_KIND
+)
+
 # Token security
 security = HTTPBearer()
 
+# Verified token -> user document, so authenticated calls skip the users
+# lookup. Entries never outlive the token's exp and are dropped (in every
+# worker) whenever the user's cache tag is invalidated, which every profile,
+# links and account write does.
+token_cache = TTLCache(
+    max_entries=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL
+)
+profile_cache.add_invalidation_listener(token_cache.invalidate_tag)
+
+def _token_key(token: str) -> str:
+    """Cache key for a token (the raw token is never kept in memory)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +48,25 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def _run_hash(fn, *args):
+    """Run a hashing function on the pool, answering 429 when it is saturated"""
+    try:
+        return await hash_pool.arun(fn, *args)
+    except HashingPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many sign-in requests, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash off the event loop"""
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await _run_hash(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -35,18 +79,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_user_by_email(email: str):
-    """Get user by email from database"""
-    db = get_database()
-    user = await db.users.find_one({"email": email})
-    return user
-
 async def authenticate_user(email: str, password: str):
-    """Authenticate user with email and password"""
-    user = await get_user_by_email(email)
+    """Authenticate user with email and password; returns the user record"""
+    user = await repositories.users.get_by_email(email)
     if not user:
         return False
-    if not verify_password(password, user["hashed_password"]):
+    if not await verify_password_async(password, user["password_hash"]):
         return False
     return user
 
@@ -58,8 +96,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    token = credentials.credentials
+    cache_key = _token_key(token)
+    cached_user = token_cache.get(cache_key)
+    if cached_user is not None:
+        # A copy, so a caller changing it cannot alter other requests' user
+        return dict(cached_user)
+    
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
@@ -68,10 +112,20 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user = await get_user_by_email(email=token_data.email)
+    user = await repositories.users.get_by_email(token_data.email)
     if user is None:
         raise credentials_exception
     
+    # Cache until the token expires, capped by the cache TTL
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(
+            cache_key,
+            dict(user),
+            tags=[user_tag(user["id"])],
+            ttl=min(settings.TOKEN_CACHE_TTL, expires_in)
+        )
+    
     return user
 
 async def get_current_active_user(current_user: dict = Depends(get_current_user)):
@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from bulk import (
+    DEFAULT_CHUNK_SIZE,
+    EXPORT_FIELDS,
+    LINK_FIELDS,
+    PROFILE_FIELDS,
+    chunked,
+    hash_passwords,
+    normalize_chunk,
+    validate_chunk
+)
+from app.auth import get_password_hash, hash_pool
+from app.queries import PROFILE_PROJECTION, LINKS_PROJECTION, _lookup_by_user_id
+from app.geo import POINT_FIELD, point
+
+# Mongo side of the bulk pipeline: same parsing and validation as the SQLite
+# importer, written with unordered insert_many per chunk.
+
+async def _existing(db, records: list):
+    """Emails, phone numbers and usernames in the chunk that are already taken"""
+    emails = [r["user"]["email"] for r in records]
+    phones = [r["user"]["phone_number"] for r in records]
+    usernames = [r["profile"]["username"] for r in records if r["profile"]]
+
+    taken_emails, taken_phones, taken_usernames = set(), set(), set()
+    if emails:
+        cursor = db.users.find(
+            {"$or": [{"email": {"$in": emails}}, {"phone_number": {"$in": phones}}]},
+            {"email": 1, "phone_number": 1}
+        )
+        async for doc in cursor:
+            taken_emails.add(doc["email"])
+            taken_phones.add(doc["phone_number"])
+    if usernames:
+        async for doc in db.profiles.find({"username": {"$in": usernames}}, {"username": 1}):
+            taken_usernames.add(doc["username"])
+    return taken_emails, taken_phones, taken_usernames
+
+def _failed_indexes(error: BulkWriteError) -> dict:
+    return {e["index"]: e.get("errmsg", "Duplicate key") for e in error.details.get("writeErrors", [])}
+
+async def import_chunk(db, chunk: list):
+    """Validate and insert one chunk; returns (inserted_user_ids, errors)"""
+    normalized = normalize_chunk(chunk)
+    taken = await _existing(db, [rec for _, rec, _ in normalized if rec])
+    valid, errors = validate_chunk(normalized, *taken)
+    if not valid:
+        return [], errors
+
+    needs_hash = [rec for _, rec in valid if not rec["password_hash"]]
+    if needs_hash:
+        hashed = await asyncio.to_thread(
+            hash_passwords, [r["password"] for r in needs_hash], get_password_hash, hash_pool
+        )
+        for rec, value in zip(needs_hash, hashed):
+            rec["password_hash"] = value
+
+    now = datetime.utcnow()
+    user_docs = [{
+        **rec["user"],
+        "hashed_password": rec["password_hash"],
+        "created_at": now,
+        "is_profile_complete": rec["profile"] is not None
+    } for _, rec in valid]
+
+    failed = {}
+    try:
+        await db.users.insert_many(user_docs, ordered=False)
+    except BulkWriteError as e:
+        failed = _failed_indexes(e)
+
+    inserted = []
+    for index, ((line_number, rec), doc) in enumerate(zip(valid, user_docs)):
+        if index in failed:
+            errors.append({"line": line_number, "error": f"Conflicts with existing data: {failed[index]}"})
+        else:
+            inserted.append((line_number, rec, str(doc["_id"])))
+
+    profile_docs = [
+        (line_number, user_id, {
+            "user_id": user_id,
+            **rec["profile"],
+            "full_name": rec["user"]["full_name"],
+            POINT_FIELD: point(rec["profile"]["latitude"], rec["profile"]["longitude"]),
+            "created_at": now,
+            "updated_at": now
+        })
+        for line_number, rec, user_id in inserted if rec["profile"]
+    ]
+    if profile_docs:
+        try:
+            await db.profiles.insert_many([doc for _, _, doc in profile_docs], ordered=False)
+        except BulkWriteError as e:
+            # A concurrent save took the username: remove the user created for
+            # that row so the whole record is rejected, as in the SQLite importer
+            profile_failed = _failed_indexes(e)
+            orphans = set()
+            for index, (line_number, user_id, _) in enumerate(profile_docs):
+                if index in profile_failed:
+                    errors.append({"line": line_number, "error": "Username already taken"})
+                    orphans.add(user_id)
+            if orphans:
+                await db.users.delete_many({"_id": {"$in": [ObjectId(user_id) for user_id in orphans]}})
+                inserted = [entry for entry in inserted if entry[2] not in orphans]
+
+    links_docs = [{
+        "user_id": user_id,
+        **rec["links"],
+        "created_at": now,
+        "updated_at": now
+    } for _, rec, user_id in inserted if rec["links"]]
+    if links_docs:
+        await db.links.insert_many(links_docs, ordered=False)
+
+    errors.sort(key=lambda e: e["line"])
+    return [user_id for _, _, user_id in inserted], errors
+
+async def import_records(db, records: Iterable, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Import (line_number, record) pairs chunk by chunk and summarize"""
+    user_ids: List[str] = []
+    errors: List[dict] = []
+    for chunk in chunked(records, chunk_size):
+        ids, chunk_errors = await import_chunk(db, chunk)
+        user_ids.extend(ids)
+        errors.extend(chunk_errors)
+    return {
+        "imported": len(user_ids),
+        "failed": len(errors),
+        "errors": errors,
+        "user_ids": user_ids
+    }
+
+async def export_rows(db, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[dict]:
+    """Yield export rows in _id keyset pages joined with profiles and links"""
+    last_id = None
+    while True:
+        match = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"_id": 1}},
+            {"$limit": chunk_size},
+            _lookup_by_user_id("profiles", "profile", PROFILE_PROJECTION, {"$toString": "$_id"}),
+            _lookup_by_user_id("links", "links", LINKS_PROJECTION, {"$toString": "$_id"}),
+            {"$project": {"hashed_password": 0}}
+        ]
+        docs = await db.users.aggregate(pipeline).to_list(length=chunk_size)
+        if not docs:
+            return
+        for doc in docs:
+            profile = doc["profile"][0] if doc["profile"] else {}
+            links = doc["links"][0] if doc["links"] else {}
+            row = {
+                "user_id": str(doc["_id"]),
+                "full_name": doc.get("full_name"),
+                "email": doc.get("email"),
+                "phone_number": doc.get("phone_number"),
+                "created_at": doc.get("created_at"),
+                "profile_url": profile.get("profile_url")
+            }
+            row.update({field: profile.get(field) for field in PROFILE_FIELDS})
+            row.update({f"link_{field}": links.get(field) for field in LINK_FIELDS})
+            yield {field: row[field] for field in EXPORT_FIELDS}
+        last_id = docs[-1]["_id"]
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from typing import Awaitable, Callable, Optional, Tuple
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+from cache import (
+    CardCache,
+    TTLCache,
+    create_backend,
+    user_tag
+)
+from app.config import settings
+from app.static_cards import card_publisher
+from conditional import make_validators, not_modified, validator_headers
+
+# Serialized profile/links/card responses: a per-worker LRU in front of the
+# shared CACHE_URL backend, invalidated on profile/links writes
+profile_cache = CardCache(
+    create_backend(settings.CACHE_URL, settings.PROFILE_CACHE_SIZE),
+    max_entries=settings.PROFILE_CACHE_SIZE,
+    local_ttl=settings.PROFILE_CACHE_TTL,
+    shared_ttl=settings.CACHE_SHARED_TTL
+)
+
+# ETag/Last-Modified per cache key, dropped together with the cached bodies
+validator_cache = TTLCache(
+    max_entries=settings.PROFILE_CACHE_SIZE,
+    ttl=settings.PROFILE_CACHE_TTL
+)
+profile_cache.add_invalidation_listener(validator_cache.invalidate_tag)
+
+def serialize(model: BaseModel) -> bytes:
+    """Serialize a response model the way FastAPI would"""
+    return json.dumps(jsonable_encoder(model), separators=(",", ":")).encode("utf-8")
+
+async def cached_response(
+    key: str,
+    loader: Callable[[], Awaitable[Tuple[bytes, int, list]]]
+) -> Response:
+    """Serve a key from the cache, running loader() once on a miss"""
+    body, status_code = await profile_cache.aget_or_load(key, loader)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+async def conditional_response(
+    request: Request,
+    key: str,
+    loader: Callable[[], Awaitable[Tuple[bytes, int, list]]],
+    parts: tuple,
+    policy: str,
+    fetch_versions: Callable[[], Awaitable[Optional[dict]]]
+) -> Response:
+    """Answer 304 when the client's copy is current, else serve the cached body.
+
+    The precondition check only needs the validators, so an unchanged card is
+    never loaded or serialized.
+    """
+    validators = validator_cache.get(key)
+    if validators is None:
+        # Not cached if a write invalidated while the versions were read
+        generation = validator_cache.generation
+        versions = await fetch_versions()
+        if versions is not None:
+            validators = make_validators(versions, parts)
+            if validators is not None:
+                validator_cache.set(
+                    key, validators, tags=[user_tag(versions["user_id"])], generation=generation
+                )
+    
+    headers = validator_headers(*validators, policy) if validators else {}
+    if validators and not_modified(
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since"),
+        *validators
+    ):
+        return Response(status_code=304, headers=headers)
+    
+    response = await cached_response(key, loader)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
+async def invalidate_user(user_id: str) -> None:
+    """Drop every cached representation belonging to a user in all workers
+    and re-render their static page"""
+    await asyncio.to_thread(profile_cache.invalidate_tag, user_tag(user_id))
+    card_publisher.submit(user_id)
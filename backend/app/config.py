@@ -11,6 +11,63 @@ class Settings:
     ALGORITHM: str = config("ALGORITHM", default="HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=30, cast=int)
     
+    # Verified token cache settings
+    TOKEN_CACHE_SIZE: int = config("TOKEN_CACHE_SIZE", default=10000, cast=int)
+    TOKEN_CACHE_TTL: float = config("TOKEN_CACHE_TTL", default=60.0, cast=float)
+    
+    # Password hashing pool (thread or process workers)
+    HASH_POOL_WORKERS: int = config("HASH_POOL_WORKERS", default=2, cast=int)
+    HASH_POOL_QUEUE: int = config("HASH_POOL_QUEUE", default=16, cast=int)
+    HASH_POOL_KIND: str = config("HASH_POOL_KIND", default="thread")
+    
+    # Public profile card cache settings
+    PROFILE_CACHE_SIZE: int = config("PROFILE_CACHE_SIZE", default=4096, cast=int)
+    PROFILE_CACHE_TTL: float = config("PROFILE_CACHE_TTL", default=60.0, cast=float)
+    
+    # Shared cache backend (memory://, fakeredis:// or redis://host:6379/0)
+    CACHE_URL: str = config("CACHE_URL", default="memory://")
+    CACHE_SHARED_TTL: float = config("CACHE_SHARED_TTL", default=300.0, cast=float)
+    
+    # Largest number of profiles one batch lookup may request
+    PROFILE_BATCH_MAX: int = config("PROFILE_BATCH_MAX", default=200, cast=int)
+    
+    # In-memory username index: seconds between reloads (0 disables)
+    USERNAME_INDEX_REFRESH: float = config("USERNAME_INDEX_REFRESH", default=300.0, cast=float)
+    
+    # Signup Bloom filter over registered emails and phone numbers
+    SIGNUP_FILTER_PATH: str = config("SIGNUP_FILTER_PATH", default="signup_filter.mongo.bloom")
+    SIGNUP_FILTER_CAPACITY: int = config("SIGNUP_FILTER_CAPACITY", default=500000, cast=int)
+    
+    # Offline gazetteer for geocoding profile locations (empty uses data/gazetteer.csv)
+    GAZETTEER_PATH: str = config("GAZETTEER_PATH", default="")
+    
+    # Static card pages (HTML + JSON per username); disabled when empty
+    STATIC_CARDS_PATH: str = config("STATIC_CARDS_PATH", default="")
+    STATIC_CARDS_TEMPLATE: str = config("STATIC_CARDS_TEMPLATE", default="")
+    STATIC_CARDS_WORKERS: int = config("STATIC_CARDS_WORKERS", default=1, cast=int)
+    
+    # Rendered QR codes (disk cache, least recently used evicted past the byte budget)
+    QR_CACHE_PATH: str = config("QR_CACHE_PATH", default="qr_cache")
+    QR_CACHE_MAX_BYTES: int = config("QR_CACHE_MAX_BYTES", default=64 * 1024 * 1024, cast=int)
+    QR_WORKERS: int = config("QR_WORKERS", default=0, cast=int)
+    
+    # Analytics ingestion (ring buffer flushed in batches)
+    ANALYTICS_BUFFER_SIZE: int = config("ANALYTICS_BUFFER_SIZE", default=100000, cast=int)
+    ANALYTICS_BATCH_SIZE: int = config("ANALYTICS_BATCH_SIZE", default=500, cast=int)
+    ANALYTICS_FLUSH_INTERVAL: float = config("ANALYTICS_FLUSH_INTERVAL", default=2.0, cast=float)
+    
+    # Profile image blob store and variant rendering workers
+    IMAGE_STORE_PATH: str = config("IMAGE_STORE_PATH", default="media")
+    IMAGE_MAX_BYTES: int = config("IMAGE_MAX_BYTES", default=5 * 1024 * 1024, cast=int)
+    IMAGE_WORKERS: int = config("IMAGE_WORKERS", default=2, cast=int)
+    
+    # Public origin for absolute URLs in responses (e.g. https://api.tapzx.app);
+    # when empty the request's host is used and vCards with linked photos are not cached
+    PUBLIC_BASE_URL: str = config("PUBLIC_BASE_URL", default="")
+    
+    # Admin API (bulk import/export); disabled when empty
+    ADMIN_API_KEY: str = config("ADMIN_API_KEY", default="")
+    
     # Server settings
     HOST: str = config("HOST", default="0.0.0.0")
     PORT: int = config("PORT", default=8000, cast=int)
@@ -0,0 +1,129 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.pagination import PageParams, keyset_find
+from connections import cursor_scope, normalize_connection
+
+# Mongo side of the connections subsystem. The unique (owner_id,
+# target_user_id) index makes re-synced scans idempotent and the
+# (owner_id, created_at, _id) index serves the newest-first listing.
+
+async def _resolve_targets(db, items: List[dict]) -> set:
+    """Fill in target_user_id for username targets and return the ids that exist"""
+    usernames = list({item["target_username"] for item in items if item["target_username"]})
+    user_ids = {}
+    if usernames:
+        async for doc in db.profiles.find({"username": {"$in": usernames}}, {"username": 1, "user_id": 1}):
+            user_ids[doc["username"]] = doc["user_id"]
+
+    ids = [
+        ObjectId(item["target_user_id"]) for item in items
+        if item["target_user_id"] is not None and ObjectId.is_valid(item["target_user_id"])
+    ]
+    existing = set(user_ids.values())
+    if ids:
+        async for doc in db.users.find({"_id": {"$in": ids}}, {"_id": 1}):
+            existing.add(str(doc["_id"]))
+
+    for item in items:
+        if item["target_username"]:
+            item["target_user_id"] = user_ids.get(item["target_username"])
+    return existing
+
+async def save_connections(db, owner_id: str, raw_items: List[dict]) -> List[dict]:
+    """Validate and upsert a batch of connections with one unordered bulk_write"""
+    results = []
+    valid = []
+    for index, raw in enumerate(raw_items):
+        item, error = normalize_connection(raw, id_type=str)
+        if error:
+            results.append({"index": index, "status": "error", "error": error})
+        else:
+            valid.append((index, item))
+
+    existing = await _resolve_targets(db, [item for _, item in valid])
+    operations = []
+    for index, item in valid:
+        target = item["target_user_id"]
+        if target is None or target not in existing:
+            results.append({"index": index, "status": "error", "error": "Target user not found"})
+            continue
+        if target == owner_id:
+            results.append({"index": index, "status": "error", "error": "Cannot connect to yourself"})
+            continue
+
+        update = {
+            "$setOnInsert": {"owner_id": owner_id, "target_user_id": target},
+            "$min": {"created_at": item["created_at"].replace(tzinfo=None)},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+        if item["notes"] is not None:
+            update["$set"]["notes"] = item["notes"]
+        if item["tags"]:
+            update["$set"]["tags"] = item["tags"]
+        operations.append(UpdateOne({"owner_id": owner_id, "target_user_id": target}, update, upsert=True))
+        results.append({"index": index, "status": "saved", "target_user_id": target})
+
+    if operations:
+        await db.connections.bulk_write(operations, ordered=False)
+    results.sort(key=lambda result: result["index"])
+    return results
+
+async def list_connections(
+    db,
+    owner_id: str,
+    page: PageParams,
+    tag: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of a user's connections, newest first, plus the next cursor"""
+    query = {"owner_id": owner_id}
+    if tag:
+        query["tags"] = tag
+    docs, next_cursor = await keyset_find(db.connections, query, page, cursor_scope(owner_id))
+
+    profiles = {}
+    targets = [doc["target_user_id"] for doc in docs]
+    if targets:
+        async for profile in db.profiles.find(
+            {"user_id": {"$in": targets}},
+            {"user_id": 1, "username": 1, "organization_name": 1, "profile_image": 1}
+        ):
+            profiles[profile["user_id"]] = profile
+
+    items = []
+    for doc in docs:
+        profile = profiles.get(doc["target_user_id"], {})
+        items.append({
+            "id": str(doc["_id"]),
+            "target_user_id": doc["target_user_id"],
+            "username": profile.get("username"),
+            "organization_name": profile.get("organization_name"),
+            "profile_image": profile.get("profile_image"),
+            "notes": doc.get("notes"),
+            "tags": doc.get("tags", []),
+            "created_at": doc["created_at"],
+            "updated_at": doc.get("updated_at")
+        })
+    return items, next_cursor
+
+async def connection_status(db, user_id: str, other_id: str) -> dict:
+    """Whether each user has saved the other, answered from the unique index"""
+    owners = set()
+    async for doc in db.connections.find(
+        {"$or": [
+            {"owner_id": user_id, "target_user_id": other_id},
+            {"owner_id": other_id, "target_user_id": user_id}
+        ]},
+        {"owner_id": 1}
+    ):
+        owners.add(doc["owner_id"])
+    return {
+        "connected": user_id in owners,
+        "connected_back": other_id in owners,
+        "mutual": user_id in owners and other_id in owners
+    }
+
+async def delete_connection(db, owner_id: str, target_user_id: str) -> bool:
+    result = await db.connections.delete_one({"owner_id": owner_id, "target_user_id": target_user_id})
+    return result.deleted_count > 0
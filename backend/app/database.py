@@ -1,6 +1,8 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 from app.config import settings
+from app.search import TEXT_INDEX_KEYS, TEXT_INDEX_NAME, TEXT_INDEX_WEIGHTS, backfill_full_names
+from app.geo import POINT_FIELD, backfill_locations
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,6 +27,12 @@ async def connect_to_mongo():
         # Create indexes for better performance
         await create_indexes()
         
+        # Search matches the owner's name, copied onto each profile
+        await backfill_full_names(db.database)
+        
+        # Nearby search needs each profile's location geocoded
+        await backfill_locations(db.database)
+        
     except Exception as e:
         logger.error(f"Error connecting to MongoDB: {e}")
         raise
@@ -41,14 +49,38 @@ async def create_indexes():
         # Users collection indexes
         await db.database.users.create_index("email", unique=True)
         await db.database.users.create_index("phone_number", unique=True)
+        await db.database.users.create_index([("created_at", -1), ("_id", -1)])
         
         # Profile collection indexes
         await db.database.profiles.create_index("username", unique=True)
         await db.database.profiles.create_index("user_id", unique=True)
+        await db.database.profiles.create_index(
+            TEXT_INDEX_KEYS, weights=TEXT_INDEX_WEIGHTS, name=TEXT_INDEX_NAME
+        )
+        await db.database.profiles.create_index([(POINT_FIELD, "2dsphere")])
         
         # Links collection indexes
         await db.database.links.create_index("user_id", unique=True)
         
+        # Analytics events collection indexes
+        await db.database.events.create_index([("user_id", 1), ("occurred_at", -1), ("_id", -1)])
+        await db.database.event_rollups.create_index(
+            [("user_id", 1), ("granularity", 1), ("bucket_start", 1), ("event_type", 1), ("link_field", 1)],
+            unique=True
+        )
+        await db.database.visitor_sketches.create_index(
+            [("user_id", 1), ("day", 1), ("event_type", 1), ("link_field", 1)],
+            unique=True
+        )
+        
+        # Connections collection indexes
+        await db.database.connections.create_index(
+            [("owner_id", 1), ("target_user_id", 1)],
+            unique=True
+        )
+        await db.database.connections.create_index([("owner_id", 1), ("created_at", -1), ("_id", -1)])
+        await db.database.connections.create_index([("target_user_id", 1), ("owner_id", 1)])
+        
         logger.info("Database indexes created successfully")
     except Exception as e:
         logger.error(f"Error creating indexes: {e}")
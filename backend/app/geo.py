@@ -0,0 +1,82 @@
+from typing import List, Optional
+from pymongo import UpdateOne
+from app.config import settings
+from geo import DEFAULT_K, DEFAULT_RADIUS_KM, configure, get_gazetteer, location_fields
+
+# Nearby people on Mongo: the geocoded coordinates are stored on each profile
+# with a GeoJSON point beside them, and a 2dsphere index on the point lets
+# $geoNear return the nearest profiles already sorted by distance. Unresolved
+# locations store a null point, which the index skips.
+
+configure(settings.GAZETTEER_PATH)
+
+POINT_FIELD = "location_point"
+
+RESULT_PROJECTION = {
+    "_id": 0,
+    "user_id": 1,
+    "username": 1,
+    "full_name": 1,
+    "organization_name": 1,
+    "location": 1,
+    "profile_image": 1,
+    "profile_url": 1,
+    "geohash": 1,
+    "distance_km": 1
+}
+
+BACKFILL_BATCH = 1000
+
+def point(latitude: Optional[float], longitude: Optional[float]) -> Optional[dict]:
+    if latitude is None or longitude is None:
+        return None
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+def location_doc(location: Optional[str]) -> dict:
+    """latitude/longitude/geohash and the GeoJSON point for a free-text location"""
+    fields = location_fields(location, get_gazetteer())
+    return {**fields, POINT_FIELD: point(fields["latitude"], fields["longitude"])}
+
+async def backfill_locations(db) -> int:
+    """Geocode profiles saved before locations were geocoded"""
+    updated = 0
+    batch = []
+    async for profile in db.profiles.find({"geohash": {"$exists": False}}, {"location": 1}):
+        batch.append(UpdateOne({"_id": profile["_id"]}, {"$set": location_doc(profile.get("location"))}))
+        if len(batch) >= BACKFILL_BATCH:
+            await db.profiles.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await db.profiles.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
+
+async def nearest_profiles(
+    db,
+    latitude: float,
+    longitude: float,
+    k: int = DEFAULT_K,
+    radius_km: float = DEFAULT_RADIUS_KM,
+    exclude_user_id: Optional[str] = None
+) -> List[dict]:
+    """The k profiles nearest a point within radius_km, closest first"""
+    geo_near = {
+        "near": point(latitude, longitude),
+        "key": POINT_FIELD,
+        "distanceField": "distance_km",
+        "distanceMultiplier": 0.001,
+        "maxDistance": radius_km * 1000,
+        "spherical": True
+    }
+    if exclude_user_id is not None:
+        geo_near["query"] = {"user_id": {"$ne": exclude_user_id}}
+    pipeline = [
+        {"$geoNear": geo_near},
+        {"$limit": k},
+        {"$project": RESULT_PROJECTION}
+    ]
+    results = await db.profiles.aggregate(pipeline).to_list(length=k)
+    for result in results:
+        result["distance_km"] = round(result["distance_km"], 1)
+    return results
@@ -0,0 +1,7 @@
+from app.config import settings
+from images import ImageStore, VariantPipeline
+
+# Shared by the upload/serving routes and the profile route, which moves
+# inline data URIs into the store
+image_store = ImageStore(settings.IMAGE_STORE_PATH, settings.IMAGE_MAX_BYTES)
+image_pipeline = VariantPipeline(image_store, max_workers=settings.IMAGE_WORKERS)
@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import List
+from pymongo import UpdateOne
+from insights import assemble_insights, rollup_counts
+
+# Mongo side of the insights rollups: one document per (user, granularity,
+# bucket, event type, link field) whose count is bumped with $inc upserts.
+
+def _naive_utc(moment: datetime) -> datetime:
+    # Motor returns naive UTC datetimes, so store them that way
+    return moment.replace(tzinfo=None)
+
+async def write_rollups(db, rows: List[tuple]) -> None:
+    """Apply rollup increments for a flushed batch with one bulk_write"""
+    counts = rollup_counts(rows)
+    if not counts:
+        return
+    await db.event_rollups.bulk_write([
+        UpdateOne(
+            {
+                "user_id": user_id,
+                "granularity": granularity,
+                "bucket_start": _naive_utc(start),
+                "event_type": event_type,
+                "link_field": link_field
+            },
+            {"$inc": {"count": count}},
+            upsert=True
+        )
+        for (user_id, granularity, start, event_type, link_field), count in counts.items()
+    ], ordered=False)
+
+async def query_insights(db, user_id: str, granularity: str, start: datetime, end: datetime) -> dict:
+    """Read rollups for a user over [start, end) through the compound index"""
+    cursor = db.event_rollups.find(
+        {
+            "user_id": user_id,
+            "granularity": granularity,
+            "bucket_start": {"$gte": _naive_utc(start), "$lt": _naive_utc(end)}
+        },
+        {"_id": 0, "bucket_start": 1, "event_type": 1, "link_field": 1, "count": 1}
+    )
+    rows = [
+        (doc["bucket_start"], doc["event_type"], doc["link_field"], doc["count"])
+        async for doc in cursor
+    ]
+    return assemble_insights(rows, granularity, start, end)
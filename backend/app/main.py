@@ -1,9 +1,17 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from app.database import connect_to_mongo, close_mongo_connection
-from app.routes import auth, links, profile, user
+from app.database import connect_to_mongo, close_mongo_connection, get_database
+from app.routes import auth, links, profile, profiles, user, connections, bulk, admin, analytics, insights, images, search, nearby, vcard, qr
 from app.config import settings
+from app.card_cache import profile_cache
+from app.auth import hash_pool, token_cache
+from app.analytics import event_buffer, start_flusher, stop_flusher
+from app.images import image_pipeline
+from app.usernames import load_username_index, start_username_refresher, stop_username_refresher, username_index
+from app.signup_filter import signup_filter, warm_signup_filter
+from app.static_cards import card_publisher, start_card_publisher
+from app.qr import qr_cache
 import logging
 
 # Configure logging
@@ -33,19 +41,41 @@ app.add_middleware(
 async def startup_event():
     """Connect to database on startup"""
     await connect_to_mongo()
+    await load_username_index(get_database())
+    start_username_refresher()
+    await warm_signup_filter(get_database())
+    start_flusher()
+    start_card_publisher()
     logger.info("Application started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database connection on shutdown"""
+    await stop_flusher()
+    await stop_username_refresher()
+    signup_filter.save()
     await close_mongo_connection()
+    hash_pool.shutdown()
+    image_pipeline.shutdown()
+    card_publisher.shutdown()
     logger.info("Application shutdown successfully")
 
 # Include routers
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(links.router, prefix="/api/v1")
 app.include_router(profile.router, prefix="/api/v1")
+app.include_router(profiles.router, prefix="/api/v1")
+app.include_router(search.router, prefix="/api/v1")
+app.include_router(nearby.router, prefix="/api/v1")
 app.include_router(user.router, prefix="/api/v1")
+app.include_router(connections.router, prefix="/api/v1")
+app.include_router(bulk.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
+app.include_router(analytics.router, prefix="/api/v1")
+app.include_router(insights.router, prefix="/api/v1")
+app.include_router(images.router, prefix="/api/v1")
+app.include_router(vcard.router, prefix="/api/v1")
+app.include_router(qr.router, prefix="/api/v1")
 
 # Root endpoint
 @app.get("/")
@@ -67,6 +97,23 @@ async def health_check():
         "message": "API is running successfully"
     }
 
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """Cache, hashing pool, analytics buffer and image worker counters"""
+    return {
+        "profile_cache": profile_cache.stats(),
+        "hash_pool": hash_pool.metrics(),
+        "token_cache": token_cache.stats(),
+        "analytics": event_buffer.metrics(),
+        "images": image_pipeline.metrics(),
+        "usernames": username_index.stats(),
+        "signup_filter": signup_filter.stats(),
+        "static_cards": card_publisher.metrics(),
+        "qr_cache": qr_cache.stats(),
+        "success": True
+    }
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -71,6 +71,22 @@ class LinksCreate(BaseModel):
     github: Optional[str] = None
     discord: Optional[str] = None
 
+class LinksPatch(BaseModel):
+    """Partial links update: only fields present in the body are written"""
+    website: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    whatsapp: Optional[str] = None
+    instagram: Optional[str] = None
+    twitter: Optional[str] = None
+    linkedin: Optional[str] = None
+    facebook: Optional[str] = None
+    youtube: Optional[str] = None
+    tiktok: Optional[str] = None
+    github: Optional[str] = None
+    discord: Optional[str] = None
+    version: Optional[int] = None
+
 class LinksResponse(BaseModel):
     id: str = Field(alias="_id")
     user_id: str
@@ -88,6 +104,7 @@ class LinksResponse(BaseModel):
     discord: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+    version: int = 1
 
     class Config:
         allow_population_by_field_name = True
@@ -115,6 +132,27 @@ class ProfileCreate(BaseModel):
             raise ValueError('Bio cannot exceed 150 words')
         return v
 
+class ProfilePatch(BaseModel):
+    """Partial profile update: only fields present in the body are written"""
+    username: Optional[str] = Field(None, min_length=3, max_length=30)
+    organization_name: Optional[str] = Field(None, min_length=2, max_length=100)
+    bio: Optional[str] = Field(None, min_length=10, max_length=150)
+    location: Optional[str] = Field(None, min_length=2, max_length=100)
+    profile_image: Optional[str] = None
+    version: Optional[int] = None
+
+    @validator('username')
+    def validate_username(cls, v):
+        if not v.replace('_', '').replace('-', '').isalnum():
+            raise ValueError('Username can only contain letters, numbers, underscores, and hyphens')
+        return v.lower()
+
+    @validator('bio')
+    def validate_bio_word_count(cls, v):
+        if len(v.split()) > 150:
+            raise ValueError('Bio cannot exceed 150 words')
+        return v
+
 class ProfileResponse(BaseModel):
     id: str = Field(alias="_id")
     user_id: str
@@ -126,6 +164,7 @@ class ProfileResponse(BaseModel):
     profile_url: str
     created_at: datetime
     updated_at: datetime
+    version: int = 1
 
     class Config:
         allow_population_by_field_name = True
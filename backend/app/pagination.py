@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query, status
+from app.config import settings
+from utils import decode_cursor, encode_cursor, page_size
+
+# Keyset pagination for the Mongo list endpoints, using the same signed
+# cursors as utils.py. Pages are ordered by (sort field, _id) descending and
+# resume with a range condition, never skip().
+
+class PageParams:
+    """?limit=&cursor= query parameters shared by list routes"""
+
+    def __init__(self, limit: Optional[str] = Query(None), cursor: Optional[str] = Query(None)):
+        try:
+            self.limit = page_size(limit)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        self.cursor = cursor
+
+def keyset_filter(cursor: Optional[str], scope: str, sort_field: str = "created_at") -> dict:
+    """Filter selecting documents after the cursor; raises ValueError if invalid"""
+    if not cursor:
+        return {}
+    sort_value, doc_id = decode_cursor(cursor, settings.SECRET_KEY, scope)
+    try:
+        sort_value = datetime.fromisoformat(sort_value)
+        doc_id = ObjectId(doc_id)
+    except (TypeError, ValueError, InvalidId):
+        raise ValueError("Invalid cursor")
+    return {"$or": [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, "_id": {"$lt": doc_id}}
+    ]}
+
+async def keyset_find(
+    collection,
+    query: dict,
+    page: PageParams,
+    scope: str,
+    sort_field: str = "created_at",
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page (limit + 1 documents to detect more) and the next cursor"""
+    after = keyset_filter(page.cursor, scope, sort_field)
+    if after:
+        query = {"$and": [query, after]}
+    docs = await collection.find(query, projection).sort(
+        [(sort_field, -1), ("_id", -1)]
+    ).limit(page.limit + 1).to_list(length=page.limit + 1)
+
+    items = docs[:page.limit]
+    next_cursor = None
+    if len(docs) > page.limit and items:
+        last = items[-1]
+        next_cursor = encode_cursor(
+            (last[sort_field].isoformat(), str(last["_id"])), settings.SECRET_KEY, scope
+        )
+    return items, next_cursor
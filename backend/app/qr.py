@@ -0,0 +1,35 @@
+import asyncio
+from typing import List, Tuple
+from app.config import settings
+from qr import QrCache, profile_link, render_roster
+
+# QR codes for the Mongo app: the same encoder and disk cache as the SQLite
+# app. Rendering is CPU work, so it runs off the event loop.
+
+qr_cache = QrCache(settings.QR_CACHE_PATH, settings.QR_CACHE_MAX_BYTES)
+
+# Organization names match case-insensitively, like the SQLite COLLATE NOCASE
+ORGANIZATION_COLLATION = {"locale": "en", "strength": 2}
+
+async def render_profile_code(username: str, fmt: str, size: int, level: str, border: int) -> Tuple[bytes, str]:
+    """(bytes, key) for a username's profile URL"""
+    return await asyncio.to_thread(
+        qr_cache.get_or_render, profile_link(f"tapzx.app/{username}"), fmt, size, level, border
+    )
+
+async def render_organization(db, organization: str, fmt: str, size: int, level: str,
+                              border: int) -> List[Tuple[str, bytes]]:
+    """Codes for every profile in an organization, ordered by username"""
+    members = []
+    cursor = db.profiles.find(
+        {"organization_name": organization},
+        {"username": 1, "profile_url": 1, "_id": 0},
+        collation=ORGANIZATION_COLLATION
+    ).sort("username", 1)
+    async for profile in cursor:
+        members.append((profile["username"], profile.get("profile_url") or f"tapzx.app/{profile['username']}"))
+    if not members:
+        return []
+    return await asyncio.to_thread(
+        render_roster, members, qr_cache, fmt, size, level, border, settings.QR_WORKERS
+    )
@@ -0,0 +1,195 @@
+from typing import List
+from bson import ObjectId
+
+# Joined read paths for the card endpoints: each lookup fetches the user,
+# profile and links documents in a single $lookup aggregation and projects
+# only the fields the response models use.
+
+USER_PROJECTION = {
+    "_id": {"$toString": "$_id"},
+    "full_name": 1,
+    "email": 1,
+    "phone_number": 1,
+    "created_at": 1,
+    "is_profile_complete": 1
+}
+
+PROFILE_PROJECTION = {
+    "_id": {"$toString": "$_id"},
+    "user_id": 1,
+    "username": 1,
+    "organization_name": 1,
+    "bio": 1,
+    "location": 1,
+    "profile_image": 1,
+    "profile_url": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+
+LINKS_PROJECTION = {
+    "_id": {"$toString": "$_id"},
+    "user_id": 1,
+    "website": 1,
+    "email": 1,
+    "phone": 1,
+    "whatsapp": 1,
+    "instagram": 1,
+    "twitter": 1,
+    "linkedin": 1,
+    "facebook": 1,
+    "youtube": 1,
+    "tiktok": 1,
+    "github": 1,
+    "discord": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+
+def _lookup_by_user_id(collection: str, as_field: str, projection: dict, user_id_expr) -> dict:
+    """$lookup stage joining a per-user collection on its string user_id"""
+    return {
+        "$lookup": {
+            "from": collection,
+            "let": {"uid": user_id_expr},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$uid"]}}},
+                {"$limit": 1},
+                {"$project": projection}
+            ],
+            "as": as_field
+        }
+    }
+
+def _first(docs):
+    return docs[0] if docs else None
+
+def _card_pipeline(match: dict, limit: int) -> list:
+    """Profile-rooted pipeline joining the user and links documents"""
+    return [
+        {"$match": match},
+        {"$limit": limit},
+        {
+            "$lookup": {
+                "from": "users",
+                "let": {"uid": {"$convert": {"input": "$user_id", "to": "objectId", "onError": None}}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$uid"]}}},
+                    {"$limit": 1},
+                    {"$project": USER_PROJECTION}
+                ],
+                "as": "user"
+            }
+        },
+        _lookup_by_user_id("links", "links", LINKS_PROJECTION, "$user_id"),
+        {"$project": {**PROFILE_PROJECTION, "user": 1, "links": 1}}
+    ]
+
+def _card(doc: dict) -> dict:
+    return {
+        "user": _first(doc.pop("user")),
+        "links": _first(doc.pop("links")),
+        "profile": doc
+    }
+
+async def fetch_card_by_username(db, username: str):
+    """Fetch profile, user and links for a username in one round trip.
+
+    Returns None when no profile exists; "user" is None when the profile
+    points at a missing user.
+    """
+    docs = await db.profiles.aggregate(_card_pipeline({"username": username}, 1)).to_list(length=1)
+    if not docs:
+        return None
+    return _card(docs[0])
+
+async def fetch_cards(db, usernames: List[str] = (), user_ids: List[str] = ()) -> List[dict]:
+    """Fetch many cards with a single $in aggregation over usernames and/or user ids"""
+    clauses = []
+    if usernames:
+        clauses.append({"username": {"$in": list(usernames)}})
+    if user_ids:
+        clauses.append({"user_id": {"$in": list(user_ids)}})
+    if not clauses:
+        return []
+    limit = len(usernames) + len(user_ids)
+    match = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    docs = await db.profiles.aggregate(_card_pipeline(match, limit)).to_list(length=limit)
+    return [_card(doc) for doc in docs]
+
+async def fetch_complete_user(db, user_id: str):
+    """Fetch user, profile and links for a user id in one round trip"""
+    pipeline = [
+        {"$match": {"_id": ObjectId(user_id)}},
+        {"$limit": 1},
+        _lookup_by_user_id("profiles", "profile", PROFILE_PROJECTION, {"$toString": "$_id"}),
+        _lookup_by_user_id("links", "links", LINKS_PROJECTION, {"$toString": "$_id"}),
+        {"$project": {**USER_PROJECTION, "profile": 1, "links": 1}}
+    ]
+    docs = await db.users.aggregate(pipeline).to_list(length=1)
+    if not docs:
+        return None
+    doc = docs[0]
+    return {
+        "profile": _first(doc.pop("profile")),
+        "links": _first(doc.pop("links")),
+        "user": doc
+    }
+
+# Validators for conditional GETs: version counters and updated_at only
+
+VERSION_PROJECTION = {"_id": 0, "version": 1, "updated_at": 1}
+
+def _state(doc):
+    if not doc:
+        return None
+    return (doc.get("version", 0), doc.get("updated_at"))
+
+def _versions(user_id: str, user, profile, links) -> dict:
+    return {
+        "user_id": user_id,
+        "user": (bool(user.get("is_profile_complete", False)), None) if user else None,
+        "profile": _state(profile),
+        "links": _state(links)
+    }
+
+async def fetch_versions_by_user_id(db, user_id: str):
+    """Version/updated_at of a user's profile and links, or None if no user"""
+    pipeline = [
+        {"$match": {"_id": ObjectId(user_id)}},
+        {"$limit": 1},
+        _lookup_by_user_id("profiles", "profile", VERSION_PROJECTION, {"$toString": "$_id"}),
+        _lookup_by_user_id("links", "links", VERSION_PROJECTION, {"$toString": "$_id"}),
+        {"$project": {"_id": 0, "is_profile_complete": 1, "profile": 1, "links": 1}}
+    ]
+    docs = await db.users.aggregate(pipeline).to_list(length=1)
+    if not docs:
+        return None
+    doc = docs[0]
+    return _versions(user_id, doc, _first(doc["profile"]), _first(doc["links"]))
+
+async def fetch_versions_by_username(db, username: str):
+    """Version/updated_at of the documents behind a username's card, or None"""
+    pipeline = [
+        {"$match": {"username": username}},
+        {"$limit": 1},
+        {
+            "$lookup": {
+                "from": "users",
+                "let": {"uid": {"$convert": {"input": "$user_id", "to": "objectId", "onError": None}}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$uid"]}}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 0, "is_profile_complete": 1}}
+                ],
+                "as": "user"
+            }
+        },
+        _lookup_by_user_id("links", "links", VERSION_PROJECTION, "$user_id"),
+        {"$project": {"_id": 0, "user_id": 1, "version": 1, "updated_at": 1, "user": 1, "links": 1}}
+    ]
+    docs = await db.profiles.aggregate(pipeline).to_list(length=1)
+    if not docs:
+        return None
+    doc = docs[0]
+    return _versions(doc["user_id"], _first(doc["user"]), doc, _first(doc["links"]))
@@ -0,0 +1,263 @@
+from datetime import datetime
+from typing import Callable, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.database import get_database
+from app.queries import (
+    fetch_card_by_username,
+    fetch_cards,
+    fetch_complete_user,
+    fetch_versions_by_user_id,
+    fetch_versions_by_username
+)
+from repositories import (
+    USER_FIELDS,
+    CardRepository,
+    DuplicateError,
+    LinksRepository,
+    NotFoundError,
+    ProfileRepository,
+    Repositories,
+    UserRepository
+)
+
+# Mongo implementations of the repository interfaces in repositories.py.
+# Methods are coroutines; the database is looked up per call, so the
+# module-level instance can be created before the client connects.
+
+def _object_id(user_id: str) -> Optional[ObjectId]:
+    return ObjectId(user_id) if ObjectId.is_valid(user_id) else None
+
+def _user_record(doc: Optional[dict]) -> Optional[dict]:
+    if not doc:
+        return None
+    user = {
+        **doc,
+        "id": str(doc["_id"]),
+        "password_hash": doc.get("hashed_password"),
+        "is_profile_complete": doc.get("is_profile_complete", False)
+    }
+    return {field: user.get(field) for field in USER_FIELDS}
+
+def _duplicate_field(error: DuplicateKeyError) -> Optional[str]:
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    return next(iter(key_pattern), None)
+
+class _MongoRepository:
+    def __init__(self, get_db: Callable = get_database):
+        self.get_db = get_db
+
+class MongoUserRepository(_MongoRepository, UserRepository):
+    REGISTERED_FIELDS = ("email", "phone_number")
+
+    async def get(self, user_id: str):
+        object_id = _object_id(user_id)
+        if object_id is None:
+            return None
+        return _user_record(await self.get_db().users.find_one({"_id": object_id}))
+
+    async def get_by_email(self, email: str):
+        return _user_record(await self.get_db().users.find_one({"email": email}))
+
+    async def exists(self, user_id: str) -> bool:
+        object_id = _object_id(user_id)
+        return object_id is not None and await self.get_db().users.find_one({"_id": object_id}, {"_id": 1}) is not None
+
+    async def is_registered(self, field: str, value: str) -> bool:
+        if field not in self.REGISTERED_FIELDS:
+            raise ValueError(f"Unknown field {field}")
+        return await self.get_db().users.find_one({field: value}, {"_id": 1}) is not None
+
+    async def create(self, full_name: str, email: str, phone_number: str, password_hash: str) -> str:
+        try:
+            result = await self.get_db().users.insert_one({
+                "full_name": full_name,
+                "email": email,
+                "phone_number": phone_number,
+                "hashed_password": password_hash,
+                "created_at": datetime.utcnow(),
+                "is_profile_complete": False
+            })
+        except DuplicateKeyError as e:
+            field = _duplicate_field(e)
+            if field not in self.REGISTERED_FIELDS:
+                raise
+            raise DuplicateError(field)
+        return str(result.inserted_id)
+
+    async def delete(self, user_id: str) -> bool:
+        db = self.get_db()
+        await db.connections.delete_many({"$or": [{"owner_id": user_id}, {"target_user_id": user_id}]})
+        await db.events.delete_many({"user_id": user_id})
+        await db.event_rollups.delete_many({"user_id": user_id})
+        await db.visitor_sketches.delete_many({"user_id": user_id})
+        await db.links.delete_one({"user_id": user_id})
+        await db.profiles.delete_one({"user_id": user_id})
+        object_id = _object_id(user_id)
+        if object_id is None:
+            return False
+        result = await db.users.delete_one({"_id": object_id})
+        return result.deleted_count > 0
+
+class MongoProfileRepository(_MongoRepository, ProfileRepository):
+    async def get(self, user_id: str):
+        return await self.get_db().profiles.find_one({"user_id": user_id})
+
+    async def get_by_username(self, username: str):
+        return await self.get_db().profiles.find_one({"username": username})
+
+    async def save(self, user_id: str, values: dict) -> bool:
+        object_id = _object_id(user_id)
+        if object_id is None:
+            raise NotFoundError(f"User {user_id} not found")
+        db = self.get_db()
+        now = datetime.utcnow()
+        # One upsert; the unique username index rejects names owned by another user
+        try:
+            result = await db.profiles.update_one(
+                {"user_id": user_id},
+                {
+                    "$set": {**values, "user_id": user_id, "updated_at": now},
+                    "$inc": {"version": 1},
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+        except DuplicateKeyError as e:
+            if _duplicate_field(e) != "username":
+                raise
+            raise DuplicateError("username")
+        user = await db.users.update_one({"_id": object_id}, {"$set": {"is_profile_complete": True}})
+        if user.matched_count == 0:
+            # No such user; don't leave the profile this call created behind
+            if result.upserted_id is not None:
+                await db.profiles.delete_one({"_id": result.upserted_id})
+            raise NotFoundError(f"User {user_id} not found")
+        return result.upserted_id is not None
+
+    async def patch(self, user_id: str, changes: dict, expected_version: Optional[int] = None) -> Optional[int]:
+        if "username" in changes:
+            changes = {**changes, "profile_url": f"tapzx.app/{changes['username']}"}
+        query = {"user_id": user_id}
+        if expected_version is not None:
+            query["version"] = expected_version
+        try:
+            updated = await self.get_db().profiles.find_one_and_update(
+                query,
+                {"$set": {**changes, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+                projection={"version": 1},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError as e:
+            if _duplicate_field(e) != "username":
+                raise
+            raise DuplicateError("username")
+        return updated["version"] if updated else None
+
+    async def version(self, user_id: str) -> Optional[int]:
+        doc = await self.get_db().profiles.find_one({"user_id": user_id}, {"version": 1})
+        return doc.get("version", 0) if doc else None
+
+    async def set_image(self, user_id: str, url: str) -> bool:
+        result = await self.get_db().profiles.update_one(
+            {"user_id": user_id},
+            {"$set": {"profile_image": url, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
+        )
+        return result.matched_count > 0
+
+    async def delete(self, user_id: str) -> bool:
+        db = self.get_db()
+        result = await db.profiles.delete_one({"user_id": user_id})
+        if result.deleted_count == 0:
+            return False
+        object_id = _object_id(user_id)
+        if object_id is not None:
+            await db.users.update_one({"_id": object_id}, {"$set": {"is_profile_complete": False}})
+        return True
+
+class MongoLinksRepository(_MongoRepository, LinksRepository):
+    async def get(self, user_id: str):
+        return await self.get_db().links.find_one({"user_id": user_id})
+
+    async def save(self, user_id: str, values: dict) -> bool:
+        now = datetime.utcnow()
+        # One upsert; $inc starts version at 1 on insert
+        update = {
+            "$set": {**values, "user_id": user_id, "updated_at": now},
+            "$inc": {"version": 1},
+            "$setOnInsert": {"created_at": now}
+        }
+        links = self.get_db().links
+        try:
+            result = await links.update_one({"user_id": user_id}, update, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent first save inserted the document; update it instead
+            result = await links.update_one({"user_id": user_id}, update, upsert=True)
+        return result.upserted_id is not None
+
+    async def patch(self, user_id: str, changes: dict, expected_version: Optional[int] = None) -> Optional[int]:
+        # Without a version the write creates the document if needed
+        query = {"user_id": user_id}
+        if expected_version is not None:
+            query["version"] = expected_version
+        now = datetime.utcnow()
+        update = {
+            "$set": {**changes, "updated_at": now},
+            "$inc": {"version": 1},
+            "$setOnInsert": {"created_at": now}
+        }
+        links = self.get_db().links
+        try:
+            updated = await links.find_one_and_update(
+                query,
+                update,
+                projection={"version": 1},
+                upsert=expected_version is None,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            if expected_version is not None:
+                raise
+            # Lost the race to create the document; it exists now
+            updated = await links.find_one_and_update(
+                query,
+                update,
+                projection={"version": 1},
+                return_document=ReturnDocument.AFTER
+            )
+        return updated["version"] if updated else None
+
+    async def version(self, user_id: str) -> Optional[int]:
+        doc = await self.get_db().links.find_one({"user_id": user_id}, {"version": 1})
+        return doc.get("version", 0) if doc else None
+
+    async def delete(self, user_id: str) -> bool:
+        result = await self.get_db().links.delete_one({"user_id": user_id})
+        return result.deleted_count > 0
+
+class MongoCardRepository(_MongoRepository, CardRepository):
+    async def by_username(self, username: str):
+        return await fetch_card_by_username(self.get_db(), username)
+
+    async def many(self, usernames=(), user_ids=()):
+        return await fetch_cards(self.get_db(), usernames, user_ids)
+
+    async def complete_user(self, user_id: str):
+        return await fetch_complete_user(self.get_db(), user_id)
+
+    async def versions_by_user_id(self, user_id: str):
+        return await fetch_versions_by_user_id(self.get_db(), user_id)
+
+    async def versions_by_username(self, username: str):
+        return await fetch_versions_by_username(self.get_db(), username)
+
+def mongo_repositories(get_db: Callable = get_database) -> Repositories:
+    return Repositories(
+        MongoUserRepository(get_db),
+        MongoProfileRepository(get_db),
+        MongoLinksRepository(get_db),
+        MongoCardRepository(get_db)
+    )
+
+repositories = mongo_repositories()
@@ -0,0 +1,85 @@
+import re
+import tempfile
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from app.database import get_database
+from app.pagination import PageParams, keyset_find
+from app.qr import render_organization
+from app.routes.bulk import require_admin
+from qr import QrError, parse_params, write_roster_zip
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+USER_LIST_PROJECTION = {
+    "full_name": 1,
+    "email": 1,
+    "phone_number": 1,
+    "is_profile_complete": 1,
+    "created_at": 1
+}
+
+@router.get("/users", response_model=dict)
+async def list_users(page: PageParams = Depends()):
+    """List users newest first, one keyset page at a time"""
+    db = get_database()
+    try:
+        users, next_cursor = await keyset_find(
+            db.users, {}, page, "admin:users", projection=USER_LIST_PROJECTION
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    usernames = {}
+    user_ids = [str(user["_id"]) for user in users]
+    if user_ids:
+        async for profile in db.profiles.find({"user_id": {"$in": user_ids}}, {"user_id": 1, "username": 1}):
+            usernames[profile["user_id"]] = profile["username"]
+    
+    for user in users:
+        user["_id"] = str(user["_id"])
+        user["username"] = usernames.get(user["_id"])
+    
+    return {
+        "users": users,
+        "next_cursor": next_cursor,
+        "success": True
+    }
+
+@router.get("/qr/roster")
+async def qr_roster(
+    organization: str = Query(..., min_length=1),
+    format: str = Query("svg"),
+    size: Optional[str] = Query(None),
+    ecc: Optional[str] = Query(None),
+    border: Optional[str] = Query(None)
+):
+    """QR codes for every profile in an organization, as a ZIP of <username>.<format>"""
+    try:
+        fmt, size, level, border = parse_params(format, size, ecc, border)
+    except QrError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    codes = await render_organization(get_database(), organization.strip(), fmt, size, level, border)
+    if not codes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profiles in this organization"
+        )
+    
+    # Large rosters spill to disk instead of growing the worker's memory
+    archive = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    write_roster_zip(archive, codes, fmt)
+    archive.seek(0)
+    slug = re.sub(r"[^a-z0-9]+", "-", organization.lower()).strip("-") or "organization"
+    return StreamingResponse(
+        archive,
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=tapzx-qr-{slug}.zip"}
+    )
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Body, status
+from fastapi.responses import JSONResponse
+from analytics import normalize_payload
+from app.analytics import enqueue
+
+router = APIRouter(prefix="/events", tags=["Analytics"])
+
+@router.post("/", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_events(payload: dict = Body(...)):
+    """Record view, scan and link-click events (buffered, written in batches)"""
+    events, errors = normalize_payload(payload)
+    if not events:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "No valid events", "errors": errors, "success": False}
+        )
+    
+    enqueue(events)
+    
+    return {
+        "accepted": len(events),
+        "rejected": errors,
+        "success": True
+    }
@@ -5,53 +5,50 @@ from app.models import UserCreate, UserLogin, Token, UserResponse, MessageRespon
 from app.auth import (
     authenticate_user, 
     create_access_token, 
-    get_password_hash, 
+    get_password_hash_async, 
     get_current_active_user,
     security
 )
-from app.database import get_database
+from app.repositories import repositories
+from app.signup_filter import signup_filter
 from app.config import settings
-from datetime import datetime
-from bson import ObjectId
+from bloom import DUPLICATE_MESSAGES
+from repositories import DuplicateError
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/signup", response_model=dict)
 async def signup(user: UserCreate):
     """Create a new user account"""
-    db = get_database()
-    
-    # Check if user already exists
-    existing_user = await db.users.find_one({"email": user.email})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+    # Check if user already exists; only possible hits in the filter need a query
+    email_hit, phone_hit = signup_filter.check(user.email, user.phone_number)
+    if email_hit:
+        if await repositories.users.is_registered("email", user.email):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
     
     # Check if phone number already exists
-    existing_phone = await db.users.find_one({"phone_number": user.phone_number})
-    if existing_phone:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Phone number already registered"
-        )
+    if phone_hit:
+        if await repositories.users.is_registered("phone_number", user.phone_number):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Phone number already registered"
+            )
     
     # Hash password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     
-    # Create user document
-    user_doc = {
-        "full_name": user.full_name,
-        "email": user.email,
-        "phone_number": user.phone_number,
-        "hashed_password": hashed_password,
-        "created_at": datetime.utcnow(),
-        "is_profile_complete": False
-    }
-    
-    # Insert user into database
-    result = await db.users.insert_one(user_doc)
+    # Insert user into database; the unique indexes catch anything the filter missed
+    try:
+        user_id = await repositories.users.create(user.full_name, user.email, user.phone_number, hashed_password)
+    except DuplicateError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=DUPLICATE_MESSAGES[e.field]
+        )
+    signup_filter.add(user.email, user.phone_number)
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -61,7 +58,7 @@ async def signup(user: UserCreate):
     
     return {
         "message": "User created successfully",
-        "user_id": str(result.inserted_id),
+        "user_id": user_id,
         "access_token": access_token,
         "token_type": "bearer",
         "success": True
@@ -85,10 +82,10 @@ async def signin(user_credentials: UserLogin):
     
     return {
         "message": "Login successful",
-        "user_id": str(user["_id"]),
+        "user_id": user["id"],
         "access_token": access_token,
         "token_type": "bearer",
-        "is_profile_complete": user.get("is_profile_complete", False),
+        "is_profile_complete": user["is_profile_complete"],
         "success": True
     }
 
@@ -96,7 +93,7 @@ async def signin(user_credentials: UserLogin):
 async def get_current_user_info(current_user: dict = Depends(get_current_active_user)):
     """Get current user information"""
     return UserResponse(
-        _id=str(current_user["_id"]),
+        _id=current_user["id"],
         full_name=current_user["full_name"],
         email=current_user["email"],
         phone_number=current_user["phone_number"],
@@ -111,7 +108,7 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         current_user = await get_current_active_user(current_user=credentials)
         return {
             "valid": True,
-            "user_id": str(current_user["_id"]),
+            "user_id": current_user["id"],
             "email": current_user["email"],
             "is_profile_complete": current_user.get("is_profile_complete", False)
         }
@@ -0,0 +1,97 @@
+import csv
+import hmac
+import io
+import json
+import tempfile
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from app.bulk import import_records, export_rows
+from app.config import settings
+from app.database import get_database
+from app.usernames import load_username_index
+from app.signup_filter import sync_signup_filter
+from app.static_cards import card_publisher
+from bulk import DEFAULT_CHUNK_SIZE, EXPORT_FIELDS, FORMATS, parse_records
+
+router = APIRouter(prefix="/admin/bulk", tags=["Admin"])
+
+async def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Allow the request only with the configured admin API key"""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled"
+        )
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, settings.ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin key"
+        )
+
+def _resolve_format(fmt: Optional[str], content_type: str) -> str:
+    if not fmt:
+        fmt = "csv" if "csv" in content_type else "ndjson"
+    if fmt not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be ndjson or csv"
+        )
+    return fmt
+
+@router.post("/import", response_model=dict, dependencies=[Depends(require_admin)])
+async def bulk_import(
+    request: Request,
+    format: Optional[str] = Query(None),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=5000)
+):
+    """Import users, profiles and links from an NDJSON or CSV body"""
+    fmt = _resolve_format(format, request.headers.get("content-type", ""))
+    db = get_database()
+
+    # Spool the body (to disk past 8 MB) so large files never sit in memory
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        summary = await import_records(db, parse_records(text, fmt), chunk_size)
+        text.detach()
+
+    for user_id in summary.pop("user_ids"):
+        card_publisher.submit(user_id)
+    await load_username_index(db)
+    await sync_signup_filter(db)
+
+    return {
+        "message": f"Imported {summary['imported']} users",
+        **summary,
+        "success": summary["failed"] == 0
+    }
+
+async def _ndjson(rows):
+    async for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+async def _csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    async for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+async def bulk_export(format: str = Query("ndjson")):
+    """Stream every user with profile and links as NDJSON or CSV"""
+    fmt = _resolve_format(format, "")
+    rows = export_rows(get_database())
+    body = _csv(rows) if fmt == "csv" else _ndjson(rows)
+    return StreamingResponse(
+        body,
+        media_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=tapzx-users.{fmt}"}
+    )
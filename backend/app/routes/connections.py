@@ -0,0 +1,105 @@
+from typing import Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from app.auth import get_current_active_user
+from app.connections import connection_status, delete_connection, list_connections, save_connections
+from app.database import get_database
+from app.pagination import PageParams
+from connections import MAX_SYNC_ITEMS
+
+router = APIRouter(prefix="/connections", tags=["Connections"])
+
+@router.post("/", response_model=dict)
+async def save_connection(
+    data: dict = Body(...),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Save (or update notes/tags of) a connection to another user"""
+    result = (await save_connections(get_database(), current_user["id"], [data]))[0]
+    if result["status"] == "error":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND if result["error"] == "Target user not found" else status.HTTP_400_BAD_REQUEST,
+            detail=result["error"]
+        )
+    
+    return {
+        "message": "Connection saved successfully",
+        "target_user_id": result["target_user_id"],
+        "success": True
+    }
+
+@router.post("/sync", response_model=dict)
+async def sync_connections(
+    data: dict = Body(...),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Apply a device's offline queue of scans; safe to retry"""
+    scans = data.get("scans")
+    if not isinstance(scans, list) or not scans:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="scans must be a non-empty list"
+        )
+    if len(scans) > MAX_SYNC_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_SYNC_ITEMS} scans per sync"
+        )
+    
+    results = await save_connections(get_database(), current_user["id"], scans)
+    
+    return {
+        "saved": sum(1 for r in results if r["status"] == "saved"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "results": results,
+        "success": True
+    }
+
+@router.get("/", response_model=dict)
+async def get_connections(
+    page: PageParams = Depends(),
+    tag: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """List the current user's connections newest first, one page at a time"""
+    try:
+        items, next_cursor = await list_connections(
+            get_database(), current_user["id"], page, tag
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {
+        "connections": items,
+        "next_cursor": next_cursor,
+        "success": True
+    }
+
+@router.get("/status/{other_id}", response_model=dict)
+async def get_connection_status(
+    other_id: str,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Whether the current user and another user have saved each other"""
+    result = await connection_status(get_database(), current_user["id"], other_id)
+    return {**result, "success": True}
+
+@router.delete("/{target_user_id}", response_model=dict)
+async def remove_connection(
+    target_user_id: str,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Delete a saved connection"""
+    deleted = await delete_connection(get_database(), current_user["id"], target_user_id)
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Connection not found"
+        )
+    
+    return {
+        "message": "Connection deleted successfully",
+        "success": True
+    }
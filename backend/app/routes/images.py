@@ -0,0 +1,94 @@
+import asyncio
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile, status
+from fastapi.responses import Response, StreamingResponse
+from app.auth import get_current_active_user
+from app.card_cache import invalidate_user
+from app.repositories import repositories
+from app.images import image_store, image_pipeline
+from conditional import _etag_matches
+from images import ImageError, image_url, iter_file, parse_range, variant_urls
+
+router = APIRouter(tags=["Images"])
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.post("/profile/image", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def upload_profile_image(
+    image: UploadFile = File(...),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Store a profile image and point the user's profile at it"""
+    try:
+        digest, fmt = await asyncio.to_thread(image_store.put_stream, image.file)
+    except ImageError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    image_pipeline.submit(digest)
+    
+    user_id = current_user["id"]
+    url = image_url(digest)
+    if await repositories.profiles.set_image(user_id, url):
+        await invalidate_user(user_id)
+    
+    return {
+        "image": {
+            "id": digest,
+            "format": fmt,
+            "url": url,
+            "variants": variant_urls(digest)
+        },
+        "success": True
+    }
+
+@router.get("/images/{digest}")
+async def serve_image(
+    digest: str,
+    size: Optional[str] = Query(None),
+    accept: str = Header(""),
+    if_none_match: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range")
+):
+    """Stream an image or one of its variants with ETag and Range support"""
+    resolved = image_store.resolve(digest, size, webp="image/webp" in accept)
+    if not resolved:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    path, media_type, etag = resolved
+    
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept"
+    }
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    file_size = os.path.getsize(path)
+    try:
+        byte_range = parse_range(range_header, file_size)
+    except ImageError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+    
+    if byte_range is None:
+        headers["Content-Length"] = str(file_size)
+        return StreamingResponse(iter_file(path), media_type=media_type, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(path, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers
+    )
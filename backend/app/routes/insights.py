@@ -0,0 +1,102 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.auth import get_current_active_user
+from app.database import get_database
+from app.insights import query_insights
+from app.pagination import PageParams, keyset_find
+from app.sketches import query_unique
+from insights import resolve_range
+from sketches import resolve_days
+
+router = APIRouter(prefix="/insights", tags=["Insights"])
+
+def _require_owner(current_user: dict, user_id: str) -> None:
+    if current_user["id"] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to view these insights"
+        )
+
+@router.get("/{user_id}", response_model=dict)
+async def get_insights(
+    user_id: str,
+    granularity: str = Query("day"),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get view/scan/link-click counts in hourly or daily buckets"""
+    _require_owner(current_user, user_id)
+    
+    try:
+        granularity, start_dt, end_dt = resolve_range(granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    data = await query_insights(get_database(), user_id, granularity, start_dt, end_dt)
+    
+    return {
+        "insights": data,
+        "success": True
+    }
+
+@router.get("/{user_id}/unique", response_model=dict)
+async def get_unique_visitors(
+    user_id: str,
+    period: Optional[str] = Query(None),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get approximate unique viewers, scanners and link clickers over a day range"""
+    _require_owner(current_user, user_id)
+    
+    try:
+        first, last = resolve_days(period, start, end)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    data = await query_unique(get_database(), user_id, first, last)
+    
+    return {
+        "visitors": data,
+        "success": True
+    }
+
+@router.get("/{user_id}/events", response_model=dict)
+async def list_events(
+    user_id: str,
+    page: PageParams = Depends(),
+    type: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """List raw events newest first, one keyset page at a time"""
+    _require_owner(current_user, user_id)
+    
+    query = {"user_id": user_id}
+    if type:
+        query["event_type"] = type
+    try:
+        docs, next_cursor = await keyset_find(
+            get_database().events, query, page, f"events:{user_id}", sort_field="occurred_at"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    
+    return {
+        "events": docs,
+        "next_cursor": next_cursor,
+        "success": True
+    }
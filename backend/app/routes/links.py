@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.models import LinksCreate, LinksResponse, MessageResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from app.models import LinksCreate, LinksPatch, LinksResponse, MessageResponse
 from app.auth import get_current_active_user
-from app.database import get_database
-from datetime import datetime
+from app.card_cache import conditional_response, serialize, invalidate_user
+from app.repositories import repositories
+from cache import links_user_id_key, user_tag
+from conditional import LINKS
 from bson import ObjectId
 
 router = APIRouter(prefix="/links", tags=["Links"])
@@ -13,12 +15,9 @@ async def create_or_update_links(
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create or update user links"""
-    db = get_database()
-    user_id = str(current_user["_id"])
+    user_id = current_user["id"]
     
-    # Prepare links document
-    links_doc = {
-        "user_id": user_id,
+    created = await repositories.links.save(user_id, {
         "website": links_data.website,
         "email": links_data.email,
         "phone": links_data.phone,
@@ -30,38 +29,58 @@ async def create_or_update_links(
         "youtube": links_data.youtube,
         "tiktok": links_data.tiktok,
         "github": links_data.github,
-        "discord": links_data.discord,
-        "updated_at": datetime.utcnow()
+        "discord": links_data.discord
+    })
+    message = "Links created successfully" if created else "Links updated successfully"
+    
+    await invalidate_user(user_id)
+    
+    return {
+        "message": message,
+        "success": True
     }
+
+@router.patch("/", response_model=dict)
+async def patch_links(
+    links_data: LinksPatch,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Update only the links present in the body; a stale version gets 409"""
+    user_id = current_user["id"]
     
-    # Check if links already exist for this user
-    existing_links = await db.links.find_one({"user_id": user_id})
+    changes = links_data.dict(exclude_unset=True)
+    expected_version = changes.pop("version", None)
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
+        )
     
-    if existing_links:
-        # Update existing links
-        await db.links.update_one(
-            {"user_id": user_id},
-            {"$set": links_doc}
+    # One conditional write; without a version it creates the document if needed
+    version = await repositories.links.patch(user_id, changes, expected_version)
+    if version is None:
+        if await repositories.links.version(user_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Links not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Links were changed by another request"
         )
-        message = "Links updated successfully"
-    else:
-        # Create new links
-        links_doc["created_at"] = datetime.utcnow()
-        result = await db.links.insert_one(links_doc)
-        message = "Links created successfully"
+    
+    await invalidate_user(user_id)
     
     return {
-        "message": message,
+        "message": "Links updated successfully",
+        "version": version,
         "success": True
     }
 
 @router.get("/", response_model=LinksResponse)
 async def get_user_links(current_user: dict = Depends(get_current_active_user)):
     """Get current user's links"""
-    db = get_database()
-    user_id = str(current_user["_id"])
-    
-    links = await db.links.find_one({"user_id": user_id})
+    links = await repositories.links.get(current_user["id"])
     if not links:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -71,10 +90,8 @@ async def get_user_links(current_user: dict = Depends(get_current_active_user)):
     return LinksResponse(**links)
 
 @router.get("/{user_id}", response_model=LinksResponse)
-async def get_links_by_user_id(user_id: str):
+async def get_links_by_user_id(user_id: str, request: Request):
     """Get links by user ID (public endpoint)"""
-    db = get_database()
-    
     # Validate ObjectId
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -82,23 +99,29 @@ async def get_links_by_user_id(user_id: str):
             detail="Invalid user ID"
         )
     
-    links = await db.links.find_one({"user_id": user_id})
-    if not links:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Links not found"
-        )
+    async def load():
+        links = await repositories.links.get(user_id)
+        if not links:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Links not found"
+            )
+        
+        return serialize(LinksResponse(**links)), status.HTTP_200_OK, [user_tag(user_id)]
     
-    return LinksResponse(**links)
+    return await conditional_response(
+        request, links_user_id_key(user_id), load,
+        LINKS, "private", lambda: repositories.cards.versions_by_user_id(user_id)
+    )
 
 @router.delete("/", response_model=MessageResponse)
 async def delete_user_links(current_user: dict = Depends(get_current_active_user)):
     """Delete current user's links"""
-    db = get_database()
-    user_id = str(current_user["_id"])
+    user_id = current_user["id"]
     
-    result = await db.links.delete_one({"user_id": user_id})
-    if result.deleted_count == 0:
+    deleted = await repositories.links.delete(user_id)
+    await invalidate_user(user_id)
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Links not found"
@@ -0,0 +1,68 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from app.database import get_database
+from app.geo import nearest_profiles
+from geo import get_gazetteer, parse_nearby_params, parse_point
+
+router = APIRouter(prefix="/nearby", tags=["Nearby"])
+
+@router.get("", response_model=dict)
+async def nearby_people(
+    lat: Optional[str] = Query(None),
+    lon: Optional[str] = Query(None),
+    username: Optional[str] = Query(None),
+    location: Optional[str] = Query(None),
+    k: Optional[str] = Query(None),
+    radius_km: Optional[str] = Query(None),
+    user_id: Optional[str] = Query(None)
+):
+    """Profiles nearest a point: lat/lon, a username's location, or a place name (public)"""
+    db = get_database()
+    try:
+        k, radius_km = parse_nearby_params(k, radius_km)
+        if lat is not None or lon is not None:
+            latitude, longitude = parse_point(lat, lon)
+        elif username or location:
+            latitude = longitude = None
+        else:
+            raise ValueError("lat and lon, username or location is required")
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    if latitude is None and username:
+        profile = await db.profiles.find_one(
+            {"username": username.strip().lower()},
+            {"user_id": 1, "latitude": 1, "longitude": 1}
+        )
+        if not profile:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        if profile.get("latitude") is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile location is not known"
+            )
+        latitude, longitude = profile["latitude"], profile["longitude"]
+        if user_id is None:
+            user_id = profile["user_id"]
+    elif latitude is None:
+        place = get_gazetteer().geocode(location)
+        if place is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Location not recognized"
+            )
+        latitude, longitude = place.latitude, place.longitude
+
+    results = await nearest_profiles(db, latitude, longitude, k, radius_km, user_id)
+
+    return {
+        "results": results,
+        "center": {"latitude": latitude, "longitude": longitude},
+        "success": True
+    }
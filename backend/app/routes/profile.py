@@ -1,8 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.models import ProfileCreate, ProfileResponse, MessageResponse
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from app.models import ProfileCreate, ProfilePatch, ProfileResponse, MessageResponse
 from app.auth import get_current_active_user
-from app.database import get_database
-from datetime import datetime
+from app.card_cache import (
+    conditional_response,
+    serialize,
+    invalidate_user
+)
+from app.images import image_store, image_pipeline
+from app.usernames import username_index
+from app.geo import location_doc
+from app.repositories import repositories
+from cache import profile_user_id_key, profile_username_key, user_tag
+from conditional import PROFILE
+from images import ImageError, store_profile_image
+from repositories import DuplicateError, NotFoundError
 from bson import ObjectId
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
@@ -13,70 +25,121 @@ async def create_or_update_profile(
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create or update user profile"""
-    db = get_database()
-    user_id = str(current_user["_id"])
-    
-    # Check if username is already taken by another user
-    existing_profile = await db.profiles.find_one({
-        "username": profile_data.username,
-        "user_id": {"$ne": user_id}
-    })
-    if existing_profile:
+    user_id = current_user["id"]
+    
+    # Inline data URIs go to the blob store; only the URL is kept
+    try:
+        profile_image = store_profile_image(image_store, image_pipeline, profile_data.profile_image)
+    except ImageError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
+            detail=str(e)
         )
     
     # Generate profile URL
     profile_url = f"tapzx.app/{profile_data.username}"
     
-    # Prepare profile document
-    profile_doc = {
-        "user_id": user_id,
-        "username": profile_data.username,
-        "organization_name": profile_data.organization_name,
-        "bio": profile_data.bio,
-        "location": profile_data.location,
-        "profile_image": profile_data.profile_image,
+    # One upsert that also marks the user complete; taken usernames are rejected
+    try:
+        created = await repositories.profiles.save(user_id, {
+            "username": profile_data.username,
+            "full_name": current_user["full_name"],
+            "organization_name": profile_data.organization_name,
+            "bio": profile_data.bio,
+            "location": profile_data.location,
+            "profile_image": profile_image,
+            "profile_url": profile_url,
+            **location_doc(profile_data.location)
+        })
+    except DuplicateError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken"
+        )
+    except NotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    message = "Profile created successfully" if created else "Profile updated successfully"
+    
+    await invalidate_user(user_id)
+    username_index.set(user_id, profile_data.username)
+    
+    return {
+        "message": message,
         "profile_url": profile_url,
-        "updated_at": datetime.utcnow()
+        "success": True
     }
+
+@router.patch("/", response_model=dict)
+async def patch_profile(
+    profile_data: ProfilePatch,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Update only the profile fields present in the body; a stale version gets 409"""
+    user_id = current_user["id"]
     
-    # Check if profile already exists for this user
-    existing_user_profile = await db.profiles.find_one({"user_id": user_id})
-    
-    if existing_user_profile:
-        # Update existing profile
-        await db.profiles.update_one(
-            {"user_id": user_id},
-            {"$set": profile_doc}
+    changes = profile_data.dict(exclude_unset=True)
+    expected_version = changes.pop("version", None)
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
         )
-        message = "Profile updated successfully"
-    else:
-        # Create new profile
-        profile_doc["created_at"] = datetime.utcnow()
-        await db.profiles.insert_one(profile_doc)
-        message = "Profile created successfully"
-    
-    # Update user's profile completion status
-    await db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": {"is_profile_complete": True}}
-    )
+    for field, value in changes.items():
+        if value is None and field != "profile_image":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{field} cannot be empty"
+            )
+    
+    if "profile_image" in changes:
+        try:
+            changes["profile_image"] = store_profile_image(image_store, image_pipeline, changes["profile_image"])
+        except ImageError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    if "location" in changes:
+        changes.update(location_doc(changes["location"]))
+    
+    # One conditional write; the unique username index rejects taken names
+    try:
+        version = await repositories.profiles.patch(
+            user_id, {**changes, "full_name": current_user["full_name"]}, expected_version
+        )
+    except DuplicateError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken"
+        )
+    if version is None:
+        if await repositories.profiles.version(user_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profile was changed by another request"
+        )
+    
+    await invalidate_user(user_id)
+    if "username" in changes:
+        username_index.set(user_id, changes["username"])
     
     return {
-        "message": message,
-        "profile_url": profile_url,
+        "message": "Profile updated successfully",
+        "version": version,
         "success": True
     }
 
 @router.get("/", response_model=ProfileResponse)
 async def get_user_profile(current_user: dict = Depends(get_current_active_user)):
     """Get current user's profile"""
-    db = get_database()
-    user_id = str(current_user["_id"])
-    
-    profile = await db.profiles.find_one({"user_id": user_id})
+    profile = await repositories.profiles.get(current_user["id"])
     if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -86,24 +149,28 @@ async def get_user_profile(current_user: dict = Depends(get_current_active_user)
     return ProfileResponse(**profile)
 
 @router.get("/username/{username}", response_model=ProfileResponse)
-async def get_profile_by_username(username: str):
+async def get_profile_by_username(username: str, request: Request):
     """Get profile by username (public endpoint)"""
-    db = get_database()
-    
-    profile = await db.profiles.find_one({"username": username.lower()})
-    if not profile:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Profile not found"
-        )
-    
-    return ProfileResponse(**profile)
+    username = username.lower()
+    
+    async def load():
+        profile = await repositories.profiles.get_by_username(username)
+        if not profile:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        
+        return serialize(ProfileResponse(**profile)), status.HTTP_200_OK, [user_tag(profile["user_id"])]
+    
+    return await conditional_response(
+        request, profile_username_key(username), load,
+        PROFILE, "public", lambda: repositories.cards.versions_by_username(username)
+    )
 
 @router.get("/{user_id}", response_model=ProfileResponse)
-async def get_profile_by_user_id(user_id: str):
+async def get_profile_by_user_id(user_id: str, request: Request):
     """Get profile by user ID (public endpoint)"""
-    db = get_database()
-    
     # Validate ObjectId
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -111,45 +178,45 @@ async def get_profile_by_user_id(user_id: str):
             detail="Invalid user ID"
         )
     
-    profile = await db.profiles.find_one({"user_id": user_id})
-    if not profile:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Profile not found"
-        )
-    
-    return ProfileResponse(**profile)
+    async def load():
+        profile = await repositories.profiles.get(user_id)
+        if not profile:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        
+        return serialize(ProfileResponse(**profile)), status.HTTP_200_OK, [user_tag(user_id)]
+    
+    return await conditional_response(
+        request, profile_user_id_key(user_id), load,
+        PROFILE, "private", lambda: repositories.cards.versions_by_user_id(user_id)
+    )
 
 @router.delete("/", response_model=MessageResponse)
 async def delete_user_profile(current_user: dict = Depends(get_current_active_user)):
     """Delete current user's profile"""
-    db = get_database()
-    user_id = str(current_user["_id"])
+    user_id = current_user["id"]
     
-    result = await db.profiles.delete_one({"user_id": user_id})
-    if result.deleted_count == 0:
+    # Also clears the user's profile completion status
+    if not await repositories.profiles.delete(user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found"
         )
     
-    # Update user's profile completion status
-    await db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": {"is_profile_complete": False}}
-    )
+    await invalidate_user(user_id)
+    username_index.discard_user(user_id)
     
     return MessageResponse(message="Profile deleted successfully")
 
 @router.get("/check-username/{username}", response_model=dict)
-async def check_username_availability(username: str):
-    """Check if username is available"""
-    db = get_database()
-    
-    existing_profile = await db.profiles.find_one({"username": username.lower()})
+async def check_username_availability(username: str, user_id: Optional[str] = Query(None)):
+    """Check if username is available, suggesting free alternatives when it is not"""
+    # A user's own current username counts as available to them
+    result = username_index.check(username.lower(), user_id=user_id)
     
     return {
-        "username": username.lower(),
-        "available": existing_profile is None,
+        **result,
         "success": True
-    }
\ No newline at end of file
+    }
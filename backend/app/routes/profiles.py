@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Body, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from bson import ObjectId
+from app.config import settings
+from app.models import CompleteUserProfile, LinksResponse, ProfileResponse, UserResponse
+from app.repositories import repositories
+from utils import parse_batch_lookup
+
+router = APIRouter(prefix="/profiles", tags=["Profile"])
+
+@router.post("/batch", response_model=dict)
+async def get_profiles_batch(data: dict = Body(...)):
+    """Resolve many usernames and/or user ids to public cards in one query"""
+    try:
+        usernames, user_ids = parse_batch_lookup(data, settings.PROFILE_BATCH_MAX, id_type=str)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    invalid = [user_id for user_id in user_ids if not ObjectId.is_valid(user_id)]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid user ID: {invalid[0]}"
+        )
+    
+    cards = await repositories.cards.many(usernames, user_ids)
+    
+    by_username = {}
+    by_user_id = {}
+    for card in cards:
+        if not card["user"]:
+            continue
+        body = jsonable_encoder(CompleteUserProfile(
+            user=UserResponse(**card["user"]),
+            links=LinksResponse(**card["links"]) if card["links"] else None,
+            profile=ProfileResponse(**card["profile"])
+        ))
+        by_username[card["profile"]["username"]] = body
+        by_user_id[card["profile"]["user_id"]] = body
+    
+    return {
+        "profiles": {
+            "by_username": {u: by_username[u] for u in usernames if u in by_username},
+            "by_user_id": {i: by_user_id[i] for i in user_ids if i in by_user_id}
+        },
+        "not_found": {
+            "usernames": [u for u in usernames if u not in by_username],
+            "user_ids": [i for i in user_ids if i not in by_user_id]
+        },
+        "success": True
+    }
@@ -0,0 +1,44 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import Response
+from app.qr import render_profile_code
+from app.repositories import repositories
+from conditional import _etag_matches
+from qr import CONTENT_TYPES, QrError, parse_params
+
+router = APIRouter(prefix="/qr", tags=["QR"])
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+@router.get("/{username}.{fmt}")
+async def get_qr_code(
+    username: str,
+    fmt: str,
+    request: Request,
+    size: Optional[str] = Query(None),
+    ecc: Optional[str] = Query(None),
+    border: Optional[str] = Query(None)
+):
+    """A profile's QR code as SVG or PNG (public)"""
+    try:
+        fmt, size, level, border = parse_params(fmt, size, ecc, border)
+    except QrError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    username = username.strip().lower()
+    # Checked in the database: the username index can lag other workers' writes
+    if not await repositories.profiles.get_by_username(username):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    data, key = await render_profile_code(username, fmt, size, level, border)
+    headers = {"ETag": f'"{key}"', "Cache-Control": IMMUTABLE}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, key):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=data, media_type=CONTENT_TYPES[fmt], headers=headers)
@@ -0,0 +1,24 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.database import get_database
+from app.pagination import PageParams
+from app.search import search_profiles
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+@router.get("", response_model=dict)
+async def search_people(q: Optional[str] = Query(None), page: PageParams = Depends()):
+    """Search profiles by name, username, organization, location and bio (public)"""
+    try:
+        results, next_cursor = await search_profiles(get_database(), q, page)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {
+        "results": results,
+        "next_cursor": next_cursor,
+        "success": True
+    }
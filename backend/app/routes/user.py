@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from app.models import CompleteUserProfile, UserResponse, LinksResponse, ProfileResponse
 from app.auth import get_current_active_user
-from app.database import get_database
+from app.usernames import username_index
+from app.repositories import repositories
+from app.card_cache import (
+    conditional_response,
+    serialize,
+    invalidate_user
+)
+from cache import card_username_key, card_user_id_key, user_tag
+from conditional import CARD
 from bson import ObjectId
 
 router = APIRouter(prefix="/user", tags=["User"])
@@ -9,12 +17,11 @@ router = APIRouter(prefix="/user", tags=["User"])
 @router.get("/complete-profile", response_model=CompleteUserProfile)
 async def get_complete_user_profile(current_user: dict = Depends(get_current_active_user)):
     """Get complete user profile with links and profile data"""
-    db = get_database()
-    user_id = str(current_user["_id"])
+    user_id = current_user["id"]
     
     # Get user data
     user_response = UserResponse(
-        _id=str(current_user["_id"]),
+        _id=current_user["id"],
         full_name=current_user["full_name"],
         email=current_user["email"],
         phone_number=current_user["phone_number"],
@@ -22,13 +29,10 @@ async def get_complete_user_profile(current_user: dict = Depends(get_current_act
         is_profile_complete=current_user.get("is_profile_complete", False)
     )
     
-    # Get links data
-    links_data = await db.links.find_one({"user_id": user_id})
-    links_response = LinksResponse(**links_data) if links_data else None
-    
-    # Get profile data
-    profile_data = await db.profiles.find_one({"user_id": user_id})
-    profile_response = ProfileResponse(**profile_data) if profile_data else None
+    # Get links and profile data in one round trip
+    data = await repositories.cards.complete_user(user_id)
+    links_response = LinksResponse(**data["links"]) if data and data["links"] else None
+    profile_response = ProfileResponse(**data["profile"]) if data and data["profile"] else None
     
     return CompleteUserProfile(
         user=user_response,
@@ -37,10 +41,8 @@ async def get_complete_user_profile(current_user: dict = Depends(get_current_act
     )
 
 @router.get("/public/{user_id}", response_model=CompleteUserProfile)
-async def get_public_user_profile(user_id: str):
+async def get_public_user_profile(user_id: str, request: Request):
     """Get public user profile by user ID"""
-    db = get_database()
-    
     # Validate ObjectId
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -48,97 +50,97 @@ async def get_public_user_profile(user_id: str):
             detail="Invalid user ID"
         )
     
-    # Get user data
-    user_data = await db.users.find_one({"_id": ObjectId(user_id)})
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+    async def load():
+        # Get user, links and profile data in one round trip
+        data = await repositories.cards.complete_user(user_id)
+        if not data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        user_data = data["user"]
+        user_response = UserResponse(
+            _id=user_data["_id"],
+            full_name=user_data["full_name"],
+            email=user_data["email"],
+            phone_number=user_data["phone_number"],
+            created_at=user_data["created_at"],
+            is_profile_complete=user_data.get("is_profile_complete", False)
         )
-    
-    user_response = UserResponse(
-        _id=str(user_data["_id"]),
-        full_name=user_data["full_name"],
-        email=user_data["email"],
-        phone_number=user_data["phone_number"],
-        created_at=user_data["created_at"],
-        is_profile_complete=user_data.get("is_profile_complete", False)
-    )
-    
-    # Get links data
-    links_data = await db.links.find_one({"user_id": user_id})
-    links_response = LinksResponse(**links_data) if links_data else None
-    
-    # Get profile data
-    profile_data = await db.profiles.find_one({"user_id": user_id})
-    profile_response = ProfileResponse(**profile_data) if profile_data else None
-    
-    return CompleteUserProfile(
-        user=user_response,
-        links=links_response,
-        profile=profile_response
+        
+        links_response = LinksResponse(**data["links"]) if data["links"] else None
+        profile_response = ProfileResponse(**data["profile"]) if data["profile"] else None
+        
+        body = serialize(CompleteUserProfile(
+            user=user_response,
+            links=links_response,
+            profile=profile_response
+        ))
+        return body, status.HTTP_200_OK, [user_tag(user_id)]
+    
+    return await conditional_response(
+        request, card_user_id_key(user_id), load,
+        CARD, "private", lambda: repositories.cards.versions_by_user_id(user_id)
     )
 
 @router.get("/public/username/{username}", response_model=CompleteUserProfile)
-async def get_public_user_profile_by_username(username: str):
+async def get_public_user_profile_by_username(username: str, request: Request):
     """Get public user profile by username"""
-    db = get_database()
-    
-    # Get profile data first
-    profile_data = await db.profiles.find_one({"username": username.lower()})
-    if not profile_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Profile not found"
+    username = username.lower()
+    
+    async def load():
+        # Get profile, user and links data in one round trip
+        card = await repositories.cards.by_username(username)
+        if not card:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        
+        user_data = card["user"]
+        if not user_data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        user_response = UserResponse(
+            _id=user_data["_id"],
+            full_name=user_data["full_name"],
+            email=user_data["email"],
+            phone_number=user_data["phone_number"],
+            created_at=user_data["created_at"],
+            is_profile_complete=user_data.get("is_profile_complete", False)
         )
-    
-    user_id = profile_data["user_id"]
-    
-    # Get user data
-    user_data = await db.users.find_one({"_id": ObjectId(user_id)})
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    user_response = UserResponse(
-        _id=str(user_data["_id"]),
-        full_name=user_data["full_name"],
-        email=user_data["email"],
-        phone_number=user_data["phone_number"],
-        created_at=user_data["created_at"],
-        is_profile_complete=user_data.get("is_profile_complete", False)
-    )
-    
-    # Get links data
-    links_data = await db.links.find_one({"user_id": user_id})
-    links_response = LinksResponse(**links_data) if links_data else None
-    
-    profile_response = ProfileResponse(**profile_data)
-    
-    return CompleteUserProfile(
-        user=user_response,
-        links=links_response,
-        profile=profile_response
+        
+        links_response = LinksResponse(**card["links"]) if card["links"] else None
+        profile_response = ProfileResponse(**card["profile"])
+        
+        body = serialize(CompleteUserProfile(
+            user=user_response,
+            links=links_response,
+            profile=profile_response
+        ))
+        return body, status.HTTP_200_OK, [user_tag(user_data["_id"])]
+    
+    return await conditional_response(
+        request, card_username_key(username), load,
+        CARD, "public", lambda: repositories.cards.versions_by_username(username)
     )
 
 @router.delete("/account", response_model=dict)
 async def delete_user_account(current_user: dict = Depends(get_current_active_user)):
     """Delete user account and all associated data"""
-    db = get_database()
-    user_id = str(current_user["_id"])
-    
-    # Delete user's links
-    await db.links.delete_one({"user_id": user_id})
+    user_id = current_user["id"]
     
-    # Delete user's profile
-    await db.profiles.delete_one({"user_id": user_id})
+    # Connections, events, links and profile go with the account
+    deleted = await repositories.users.delete(user_id)
+    username_index.discard_user(user_id)
     
-    # Delete user account
-    result = await db.users.delete_one({"_id": ObjectId(user_id)})
+    await invalidate_user(user_id)
     
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
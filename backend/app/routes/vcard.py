@@ -0,0 +1,71 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from app.auth import get_current_active_user
+from app.config import settings
+from app.card_cache import profile_cache
+from app.database import get_database
+from app.repositories import repositories
+from app.vcard import iter_connection_vcards, render_vcard
+from cache import user_tag, vcard_username_key
+from vcard import PHOTO_MODES
+
+router = APIRouter(tags=["vCard"])
+
+VCARD_MEDIA_TYPE = "text/vcard; charset=utf-8"
+
+def _photo_mode(photo: str) -> str:
+    if photo not in PHOTO_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"photo must be one of {', '.join(PHOTO_MODES)}"
+        )
+    return photo
+
+@router.get("/card/{username}.vcf")
+async def get_vcard(username: str, request: Request, photo: str = Query("embed")):
+    """Download a profile as a vCard 4.0 contact (public)"""
+    username = username.lower()
+    photo = _photo_mode(photo)
+    # Photo URLs (linked, or embeds too large to inline) carry the base URL;
+    # the request's Host is client controlled, so only a configured one is cached
+    base_url = settings.PUBLIC_BASE_URL or str(request.base_url)
+    
+    async def load():
+        card = await repositories.cards.by_username(username)
+        if not card or not card["user"]:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        body = (await render_vcard(card, photo, base_url)).encode("utf-8")
+        return body, status.HTTP_200_OK, [user_tag(card["profile"]["user_id"])]
+    
+    if settings.PUBLIC_BASE_URL or photo == "none":
+        body, status_code = await profile_cache.aget_or_load(vcard_username_key(username, photo), load)
+    else:
+        body, status_code, _ = await load()
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type=VCARD_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={username}.vcf"}
+    )
+
+@router.get("/connections/contacts.vcf")
+async def export_connection_vcards(
+    request: Request,
+    photo: str = Query("link"),
+    tag: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Stream the current user's connections as one multi-contact .vcf"""
+    photo = _photo_mode(photo)
+    cards = iter_connection_vcards(
+        get_database(), current_user["id"], photo, settings.PUBLIC_BASE_URL or str(request.base_url), tag
+    )
+    return StreamingResponse(
+        cards,
+        media_type=VCARD_MEDIA_TYPE,
+        headers={"Content-Disposition": "attachment; filename=tapzx-connections.vcf"}
+    )
@@ -0,0 +1,88 @@
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from app.config import settings
+from app.pagination import PageParams
+from search import COLUMN_WEIGHTS, query_terms
+from utils import decode_cursor, encode_cursor
+
+# People search on Mongo: one weighted text index over the profile fields and
+# the owner's full name, which is copied onto the profile document because a
+# text index cannot span collections. Text indexes match whole (stemmed)
+# words, so unlike the SQLite FTS5 index there is no prefix matching, and
+# terms are ORed with documents matching more of them ranked first.
+
+TEXT_INDEX_NAME = "profiles_text"
+
+TEXT_INDEX_KEYS = [(field, "text") for field, _ in COLUMN_WEIGHTS]
+TEXT_INDEX_WEIGHTS = {field: int(weight) for field, weight in COLUMN_WEIGHTS}
+
+RESULT_PROJECTION = {
+    "_id": 1,
+    "user_id": 1,
+    "username": 1,
+    "full_name": 1,
+    "organization_name": 1,
+    "location": 1,
+    "profile_image": 1,
+    "profile_url": 1
+}
+
+BACKFILL_BATCH = 1000
+
+async def backfill_full_names(db) -> int:
+    """Copy full_name onto profiles saved before it was denormalized"""
+    updated = 0
+    batch = []
+    async for profile in db.profiles.find({"full_name": {"$exists": False}}, {"user_id": 1}):
+        if not ObjectId.is_valid(profile["user_id"]):
+            continue
+        user = await db.users.find_one({"_id": ObjectId(profile["user_id"])}, {"full_name": 1})
+        if user:
+            batch.append(UpdateOne({"_id": profile["_id"]}, {"$set": {"full_name": user["full_name"]}}))
+        if len(batch) >= BACKFILL_BATCH:
+            await db.profiles.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await db.profiles.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
+
+async def search_profiles(db, q: Optional[str], page: PageParams) -> Tuple[List[dict], Optional[str]]:
+    """One page of profiles matching q, best text score first, plus the next cursor.
+
+    Raises ValueError for an unusable query or cursor.
+    """
+    terms = query_terms(q)
+    scope = "search:" + " ".join(terms)
+    pipeline = [
+        {"$match": {"$text": {"$search": " ".join(terms)}}},
+        {"$project": {**RESULT_PROJECTION, "score": {"$meta": "textScore"}}}
+    ]
+    if page.cursor:
+        score, doc_id = decode_cursor(page.cursor, settings.SECRET_KEY, scope)
+        try:
+            doc_id = ObjectId(doc_id)
+        except (TypeError, InvalidId):
+            raise ValueError("Invalid cursor")
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "_id": {"$lt": doc_id}}
+        ]}})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": page.limit + 1}
+    ]
+    docs = await db.profiles.aggregate(pipeline).to_list(length=page.limit + 1)
+
+    items = docs[:page.limit]
+    next_cursor = None
+    if len(docs) > page.limit and items:
+        last = items[-1]
+        next_cursor = encode_cursor((last["score"], str(last["_id"])), settings.SECRET_KEY, scope)
+    for doc in items:
+        del doc["_id"]
+        del doc["score"]
+    return items, next_cursor
@@ -0,0 +1,27 @@
+from bson import ObjectId
+from app.config import settings
+from bloom import SignupFilter
+
+# Registered emails/phones, so most signups skip the uniqueness lookups
+signup_filter = SignupFilter(settings.SIGNUP_FILTER_PATH, capacity=settings.SIGNUP_FILTER_CAPACITY)
+
+USER_FIELDS = {"email": 1, "phone_number": 1}
+
+async def _rows(cursor):
+    return [(doc["_id"], doc.get("email"), doc.get("phone_number")) async for doc in cursor]
+
+async def sync_signup_filter(db) -> None:
+    """Fold in users created since the filter's watermark, rebuilding when needed"""
+    if signup_filter.watermark is None or signup_filter.needs_rebuild():
+        total = await db.users.count_documents({})
+        rows = await _rows(db.users.find({}, USER_FIELDS).sort("_id", 1))
+        signup_filter.rebuild(rows, total)
+    else:
+        rows = await _rows(db.users.find({"_id": {"$gt": signup_filter.watermark}}, USER_FIELDS).sort("_id", 1))
+        signup_filter.add_rows(rows)
+
+async def warm_signup_filter(db) -> None:
+    """Load the persisted filter, catch it up and write it back"""
+    signup_filter.load(watermark_type=ObjectId)
+    await sync_signup_filter(db)
+    signup_filter.save()
@@ -0,0 +1,53 @@
+from datetime import date
+from typing import List
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+from sketches import HyperLogLog, assemble_unique, sketch_updates
+
+# Mongo side of the unique-visitor sketches. Several API workers may flush at
+# once, so each sketch document carries a version and is replaced only if it
+# has not changed since it was read.
+
+MAX_ATTEMPTS = 5
+
+async def _fold(db, key: tuple, visitors: set) -> None:
+    user_id, day, event_type, link_field = key
+    query = {"user_id": user_id, "day": day, "event_type": event_type, "link_field": link_field}
+    for _ in range(MAX_ATTEMPTS):
+        doc = await db.visitor_sketches.find_one(query, {"sketch": 1, "version": 1})
+        sketch = HyperLogLog.from_bytes(bytes(doc["sketch"]) if doc else None)
+        for visitor_id in visitors:
+            sketch.add(visitor_id)
+        data = Binary(sketch.to_bytes())
+
+        if doc is None:
+            try:
+                await db.visitor_sketches.insert_one({**query, "sketch": data, "version": 1})
+                return
+            except DuplicateKeyError:
+                continue
+
+        result = await db.visitor_sketches.update_one(
+            {"_id": doc["_id"], "version": doc["version"]},
+            {"$set": {"sketch": data}, "$inc": {"version": 1}}
+        )
+        if result.matched_count:
+            return
+    raise RuntimeError(f"Sketch update kept conflicting for {key}")
+
+async def write_sketches(db, rows: List[tuple]) -> None:
+    """Fold a flushed batch's visitor ids into the stored daily sketches"""
+    for key, visitors in sketch_updates(rows).items():
+        await _fold(db, key, visitors)
+
+async def query_unique(db, user_id: str, first: date, last: date) -> dict:
+    """Merge a user's daily sketches over [first, last] into unique counts"""
+    cursor = db.visitor_sketches.find(
+        {"user_id": user_id, "day": {"$gte": first.isoformat(), "$lte": last.isoformat()}},
+        {"_id": 0, "event_type": 1, "link_field": 1, "sketch": 1}
+    )
+    rows = [
+        (doc["event_type"], doc["link_field"], bytes(doc["sketch"]))
+        async for doc in cursor
+    ]
+    return assemble_unique(rows, first, last)
@@ -0,0 +1,32 @@
+import asyncio
+from typing import Optional
+from app.config import settings
+from app.database import get_database
+from app.queries import fetch_cards
+from static_cards import StaticCardPublisher, StaticCardWriter
+
+# Static card pages for the Mongo app: the same writer and background
+# publisher as the SQLite app. Publisher threads load cards by scheduling the
+# Motor query on the application's event loop.
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Seconds a publisher thread waits for its card query
+LOAD_TIMEOUT = 30
+
+def _load_card(user_id: str) -> Optional[dict]:
+    future = asyncio.run_coroutine_threadsafe(fetch_cards(get_database(), user_ids=[user_id]), _loop)
+    cards = future.result(timeout=LOAD_TIMEOUT)
+    return cards[0] if cards else None
+
+card_publisher = StaticCardPublisher(
+    StaticCardWriter(settings.STATIC_CARDS_PATH, settings.STATIC_CARDS_TEMPLATE or None)
+    if settings.STATIC_CARDS_PATH else None,
+    _load_card,
+    max_workers=settings.STATIC_CARDS_WORKERS
+)
+
+def start_card_publisher() -> None:
+    """Remember the running loop so publisher threads can query Mongo"""
+    global _loop
+    _loop = asyncio.get_running_loop()
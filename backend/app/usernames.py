@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from typing import Optional
+from app.config import settings
+from app.database import get_database
+from usernames import UsernameIndex
+
+logger = logging.getLogger(__name__)
+
+# Taken usernames, so availability checks skip the database
+username_index = UsernameIndex(refresh_interval=settings.USERNAME_INDEX_REFRESH)
+
+_task: Optional[asyncio.Task] = None
+
+async def load_username_index(db) -> None:
+    """Warm or refresh the index from profiles.username"""
+    since = username_index.begin_load()
+    rows = []
+    try:
+        async for profile in db.profiles.find({}, {"username": 1, "user_id": 1, "_id": 0}):
+            rows.append((profile["username"], profile["user_id"]))
+    except BaseException:
+        username_index.cancel_load()
+        raise
+    username_index.load(rows, since)
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(username_index.refresh_interval)
+        try:
+            await load_username_index(get_database())
+        except Exception:
+            logger.exception("Failed to refresh the username index")
+
+def start_username_refresher() -> None:
+    """Reload the index every USERNAME_INDEX_REFRESH seconds in the background"""
+    global _task
+    if username_index.refresh_interval:
+        _task = asyncio.create_task(_refresh_loop())
+
+async def stop_username_refresher() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
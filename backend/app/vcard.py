@@ -0,0 +1,50 @@
+import asyncio
+from typing import AsyncIterator, Optional
+from app.images import image_store
+from app.queries import fetch_cards
+from vcard import BULK_CHUNK_SIZE, build_vcard, card_photo
+
+# vCards on Mongo: the same builder as the SQLite app over the $lookup card
+# documents, with connections streamed one keyset page at a time.
+
+async def render_vcard(card: dict, photo: str, base_url: str, categories=()) -> str:
+    # Embedding reads the thumbnail from disk, so build off the event loop
+    photo_uri = await asyncio.to_thread(
+        card_photo, card["profile"].get("profile_image"), image_store, photo, base_url
+    )
+    return build_vcard(card, photo_uri, categories)
+
+async def iter_connection_vcards(
+    db,
+    owner_id: str,
+    photo: str = "link",
+    base_url: str = "",
+    tag: Optional[str] = None,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> AsyncIterator[str]:
+    """Yield one vCard per connection, newest first, one page per round trip"""
+    query = {"owner_id": owner_id}
+    if tag:
+        query["tags"] = tag
+    after = None
+    while True:
+        page_query = query
+        if after:
+            created_at, doc_id = after
+            page_query = {"$and": [query, {"$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": doc_id}}
+            ]}]}
+        docs = await db.connections.find(
+            page_query, {"target_user_id": 1, "tags": 1, "created_at": 1}
+        ).sort([("created_at", -1), ("_id", -1)]).limit(chunk_size).to_list(length=chunk_size)
+        if not docs:
+            return
+
+        cards = await fetch_cards(db, user_ids=[doc["target_user_id"] for doc in docs])
+        by_user_id = {card["profile"]["user_id"]: card for card in cards if card["user"]}
+        for doc in docs:
+            card = by_user_id.get(doc["target_user_id"])
+            if card:
+                yield await render_vcard(card, photo, base_url, doc.get("tags", []))
+        after = (docs[-1]["created_at"], docs[-1]["_id"])
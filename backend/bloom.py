@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import struct
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Signup uniqueness front: a Bloom filter over every registered email and
+# phone number. A miss means "definitely new" and signup skips its lookups;
+# a hit may be a false positive and falls back to the indexed query. The
+# UNIQUE constraints stay authoritative, so a filter that is behind (another
+# worker's signups, a stale file) only costs a duplicate-key error that is
+# reported with the usual 400 message.
+
+# Users the filter is sized for before it is rebuilt larger
+DEFAULT_CAPACITY = 500000
+DEFAULT_ERROR_RATE = 0.01
+
+# File layout: magic, version, bit count, hash count, item count, capacity,
+# watermark length, then the watermark (last user id folded in) and the bits
+_MAGIC = b'TZBF'
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('>4sBQBQQH')
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+def normalize_phone(phone):
+    # Coarser than the stored value on purpose: extra hits only cost a query
+    return re.sub(r'[^\d+]', '', phone or '')
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE, num_bits=None, num_hashes=None):
+        self.capacity = max(1, int(capacity))
+        if num_bits is None:
+            num_bits = int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        if num_hashes is None:
+            num_hashes = max(1, round(num_bits / self.capacity * math.log(2)))
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = num_hashes
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def is_saturated(self):
+        """Past capacity the false positive rate climbs; time to rebuild larger"""
+        return self.count > self.capacity
+
+class SignupFilter:
+    """Thread-safe Bloom filter of registered emails and phone numbers.
+
+    ``capacity`` counts users (two keys each). ``watermark`` is the largest
+    user id already folded in, so a filter loaded from disk only needs the
+    users created after it was saved.
+    """
+
+    def __init__(self, path=None, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.path = path
+        self.error_rate = error_rate
+        self._filter = BloomFilter(2 * capacity, error_rate)
+        self.watermark = None
+        self._lock = threading.Lock()
+
+        # Counters
+        self.definitely_new = 0
+        self.possible_hits = 0
+        self.rebuilds = 0
+
+    def add(self, email, phone_number):
+        with self._lock:
+            self._add(email, phone_number)
+
+    def _add(self, email, phone_number):
+        self._filter.add('email:' + normalize_email(email))
+        self._filter.add('phone:' + normalize_phone(phone_number))
+
+    def add_rows(self, rows):
+        """Fold in (user_id, email, phone_number) rows ordered by user id.
+
+        Only rows read from the database advance the watermark; users added
+        one by one at signup are read again on the next catch-up, so signups
+        made by other workers in between are never skipped.
+        """
+        for user_id, email, phone_number in rows:
+            with self._lock:
+                self._add(email, phone_number)
+                self.watermark = user_id
+
+    def rebuild(self, rows, total):
+        """Start over sized for ``total`` users, then fold in every row"""
+        # Two keys per user, with room to double before the next rebuild
+        capacity = max(self._filter.capacity, 4 * total)
+        with self._lock:
+            self._filter = BloomFilter(capacity, self.error_rate)
+            self.watermark = None
+            self.rebuilds += 1
+        self.add_rows(rows)
+
+    def needs_rebuild(self):
+        return self._filter.is_saturated()
+
+    def check(self, email, phone_number):
+        """Return (email_may_exist, phone_may_exist); False means definitely new"""
+        with self._lock:
+            email_hit = 'email:' + normalize_email(email) in self._filter
+            phone_hit = 'phone:' + normalize_phone(phone_number) in self._filter
+            if email_hit or phone_hit:
+                self.possible_hits += 1
+            else:
+                self.definitely_new += 1
+        return email_hit, phone_hit
+
+    def to_bytes(self):
+        with self._lock:
+            watermark = str(self.watermark if self.watermark is not None else '').encode('utf-8')
+            header = _HEADER.pack(
+                _MAGIC, _FORMAT_VERSION, self._filter.num_bits, self._filter.num_hashes,
+                self._filter.count, self._filter.capacity, len(watermark)
+            )
+            return header + watermark + bytes(self._filter.bits)
+
+    def load_bytes(self, data, watermark_type=int):
+        magic, version, num_bits, num_hashes, count, capacity, mark_length = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError("Unsupported signup filter format")
+        offset = _HEADER.size
+        watermark = data[offset:offset + mark_length].decode('utf-8')
+        bits = data[offset + mark_length:]
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError("Truncated signup filter")
+        bloom = BloomFilter(capacity, self.error_rate, num_bits=num_bits, num_hashes=num_hashes)
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        with self._lock:
+            self._filter = bloom
+            self.watermark = watermark_type(watermark) if watermark else None
+
+    def save(self):
+        """Write the filter to ``path`` atomically"""
+        if not self.path:
+            return
+        data = self.to_bytes()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.bloom-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def load(self, watermark_type=int):
+        """Load ``path`` if it exists and is readable; returns whether it did"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                self.load_bytes(f.read(), watermark_type)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning("Ignoring signup filter at %s: %s", self.path, e)
+            return False
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "keys": self._filter.count,
+                "capacity": self._filter.capacity,
+                "definitely_new": self.definitely_new,
+                "possible_hits": self.possible_hits,
+                "rebuilds": self.rebuilds
+            }
+
+USERS_SQL = 'SELECT id, email, phone_number FROM users'
+
+def sync_signup_filter(conn, signup_filter):
+    """Fold in users created since the filter's watermark, rebuilding when needed.
+
+    At startup this either catches a persisted filter up or builds one from
+    scratch; it is cheap to call again after bulk imports.
+    """
+    if signup_filter.watermark is None or signup_filter.needs_rebuild():
+        total = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+        signup_filter.rebuild(conn.execute(USERS_SQL + ' ORDER BY id'), total)
+    else:
+        signup_filter.add_rows(conn.execute(
+            USERS_SQL + ' WHERE id > ? ORDER BY id', (signup_filter.watermark,)
+        ))
+
+# Signup's 400 message for each UNIQUE column
+DUPLICATE_MESSAGES = {
+    'email': "Email already registered",
+    'phone_number': "Phone number already registered"
+}
+
+def duplicate_field(error):
+    """Which UNIQUE column (users.email, users.phone_number or
+    profiles.username) an IntegrityError violated, or None"""
+    message = str(error)
+    if 'users.email' in message:
+        return 'email'
+    if 'users.phone_number' in message:
+        return 'phone_number'
+    if 'profiles.username' in message:
+        return 'username'
+    return None
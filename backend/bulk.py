@@ -0,0 +1,480 @@
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import islice
+from geo import LOCATION_FIELDS, get_gazetteer, location_fields
+from hashing import HashingPool, HashingPoolSaturated
+from queries import LINK_FIELDS
+from utils import (
+    decode_cursor, keyset_condition, keyset_page, keyset_params,
+    validate_email, validate_phone, validate_username
+)
+
+# Bulk onboarding: records are parsed incrementally from NDJSON or CSV,
+# validated with the same rules as signup/profile save and written in
+# chunks, each in its own transaction, so memory stays flat regardless of
+# file size.
+
+PROFILE_FIELDS = ('username', 'organization_name', 'bio', 'location', 'profile_image')
+
+EXPORT_FIELDS = (
+    ('user_id', 'full_name', 'email', 'phone_number', 'created_at')
+    + PROFILE_FIELDS + ('profile_url',)
+    + tuple(f'link_{field}' for field in LINK_FIELDS)
+)
+
+FORMATS = ('ndjson', 'csv')
+
+DEFAULT_CHUNK_SIZE = 500
+
+def parse_records(text_stream, fmt):
+    """Yield (line_number, record) pairs from an NDJSON or CSV text stream.
+
+    Malformed NDJSON lines are yielded as (line_number, ValueError) so the
+    caller can report them alongside validation errors.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield reader.line_num, {k: v for k, v in record.items() if k is not None}
+        return
+
+    for line_number, line in enumerate(text_stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, ValueError("Invalid JSON")
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError("Each line must be a JSON object")
+            continue
+        yield line_number, record
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def normalize_record(raw):
+    """Validate one import record, returning (record, None) or (None, error)"""
+    if isinstance(raw, Exception):
+        return None, str(raw)
+
+    for field in ('full_name', 'email', 'phone_number'):
+        if not _clean(raw.get(field)):
+            return None, f"{field} is required"
+
+    full_name = _clean(raw['full_name'])
+    email = _clean(raw['email']).lower()
+    phone_number = _clean(raw['phone_number'])
+    password = raw.get('password') or None
+    password_hash = _clean(raw.get('password_hash'))
+
+    if len(full_name) < 2:
+        return None, "Full name must be at least 2 characters"
+    if not validate_email(email):
+        return None, "Invalid email format"
+    if not validate_phone(phone_number):
+        return None, "Invalid phone number format"
+    if not password and not password_hash:
+        return None, "password or password_hash is required"
+    if password and len(password) < 8:
+        return None, "Password must be at least 8 characters"
+
+    profile = None
+    username = _clean(raw.get('username'))
+    if username:
+        username = username.lower()
+        organization_name = _clean(raw.get('organization_name'))
+        bio = _clean(raw.get('bio'))
+        location = _clean(raw.get('location'))
+        if not validate_username(username):
+            return None, "Username must be 3-30 characters and contain only letters, numbers, underscore, and hyphen"
+        if not organization_name or len(organization_name) < 2:
+            return None, "Organization name must be at least 2 characters"
+        if not bio:
+            return None, "bio is required"
+        if len(bio.split()) > 150:
+            return None, "Bio cannot exceed 150 words"
+        if not location or len(location) < 2:
+            return None, "Location must be at least 2 characters"
+        profile = {
+            "username": username,
+            "organization_name": organization_name,
+            "bio": bio,
+            "location": location,
+            "profile_image": _clean(raw.get('profile_image')),
+            "profile_url": f"tapzx.app/{username}",
+            **location_fields(location, get_gazetteer())
+        }
+
+    nested_links = raw.get('links') if isinstance(raw.get('links'), dict) else {}
+    links = {
+        field: _clean(nested_links.get(field, raw.get(f'link_{field}')))
+        for field in LINK_FIELDS
+    }
+    if not any(links.values()):
+        links = None
+
+    return {
+        "user": {
+            "full_name": full_name,
+            "email": email,
+            "phone_number": phone_number
+        },
+        "password": password,
+        "password_hash": password_hash,
+        "profile": profile,
+        "links": links
+    }, None
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def hash_passwords(passwords, hash_fn, pool):
+    """Hash a batch of passwords on the shared HashingPool.
+
+    At most ``pool.max_workers`` hashes from the batch are queued at a time so
+    interactive signins keep the rest of the queue; when the pool is saturated
+    the batch waits for its own work to finish before submitting more.
+    """
+    results = [None] * len(passwords)
+    pending = {}
+    items = iter(enumerate(passwords))
+    item = next(items, None)
+    while item is not None or pending:
+        while item is not None and len(pending) < pool.max_workers:
+            try:
+                future = pool.submit(hash_fn, item[1])
+            except HashingPoolSaturated:
+                break
+            pending[future] = item[0]
+            item = next(items, None)
+        if not pending:
+            # Saturated by other callers and nothing of ours to wait on
+            time.sleep(0.05)
+            continue
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+    return results
+
+def validate_chunk(normalized, taken_emails, taken_phones, taken_usernames):
+    """Drop rows that failed validation or collide with existing or earlier rows.
+
+    ``normalized`` holds (line_number, record, error) triples. Returns
+    (valid, errors) where valid holds (line_number, record) pairs; the taken_*
+    sets are updated in place with the accepted rows.
+    """
+    valid = []
+    errors = []
+    for line_number, record, error in normalized:
+        if error:
+            errors.append({"line": line_number, "error": error})
+            continue
+        user = record['user']
+        if user['email'] in taken_emails:
+            errors.append({"line": line_number, "error": "Email already registered"})
+            continue
+        if user['phone_number'] in taken_phones:
+            errors.append({"line": line_number, "error": "Phone number already registered"})
+            continue
+        if record['profile'] and record['profile']['username'] in taken_usernames:
+            errors.append({"line": line_number, "error": "Username already taken"})
+            continue
+        taken_emails.add(user['email'])
+        taken_phones.add(user['phone_number'])
+        if record['profile']:
+            taken_usernames.add(record['profile']['username'])
+        valid.append((line_number, record))
+    return valid, errors
+
+def normalize_chunk(chunk):
+    """Normalize (line_number, raw) pairs into (line_number, record, error) triples"""
+    return [(line_number,) + normalize_record(raw) for line_number, raw in chunk]
+
+def _placeholders(count):
+    return ', '.join('?' * count)
+
+def _existing(conn, chunk_records):
+    """Emails, phone numbers and usernames in the chunk that are already taken"""
+    emails = [r['user']['email'] for r in chunk_records]
+    phones = [r['user']['phone_number'] for r in chunk_records]
+    usernames = [r['profile']['username'] for r in chunk_records if r['profile']]
+
+    taken_emails = set()
+    taken_phones = set()
+    taken_usernames = set()
+    if emails:
+        for row in conn.execute(
+            f'SELECT email, phone_number FROM users WHERE email IN ({_placeholders(len(emails))}) '
+            f'OR phone_number IN ({_placeholders(len(phones))})',
+            emails + phones
+        ):
+            taken_emails.add(row[0])
+            taken_phones.add(row[1])
+    if usernames:
+        for row in conn.execute(
+            f'SELECT username FROM profiles WHERE username IN ({_placeholders(len(usernames))})',
+            usernames
+        ):
+            taken_usernames.add(row[0])
+    return taken_emails, taken_phones, taken_usernames
+
+USER_INSERT_SQL = '''
+    INSERT INTO users (full_name, email, phone_number, password, is_profile_complete)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+PROFILE_INSERT_SQL = f'''
+    INSERT INTO profiles (user_id, {', '.join(PROFILE_FIELDS)}, profile_url, {', '.join(LOCATION_FIELDS)})
+    VALUES ({_placeholders(len(PROFILE_FIELDS) + len(LOCATION_FIELDS) + 2)})
+'''
+
+LINKS_INSERT_SQL = f'''
+    INSERT INTO links (user_id, {', '.join(LINK_FIELDS)})
+    VALUES ({_placeholders(len(LINK_FIELDS) + 1)})
+'''
+
+def _user_row(record):
+    user = record['user']
+    return (user['full_name'], user['email'], user['phone_number'],
+            record['password_hash'], record['profile'] is not None)
+
+def _profile_row(user_id, profile):
+    return ((user_id,) + tuple(profile[f] for f in PROFILE_FIELDS) + (profile['profile_url'],)
+            + tuple(profile[f] for f in LOCATION_FIELDS))
+
+def _links_row(user_id, links):
+    return (user_id,) + tuple(links[f] for f in LINK_FIELDS)
+
+def _insert_batch(conn, records):
+    """Insert users, then their profiles and links, with executemany"""
+    conn.executemany(USER_INSERT_SQL, [_user_row(r) for r in records])
+    emails = [r['user']['email'] for r in records]
+    ids = dict(conn.execute(
+        f'SELECT email, id FROM users WHERE email IN ({_placeholders(len(emails))})',
+        emails
+    ).fetchall())
+    conn.executemany(PROFILE_INSERT_SQL, [
+        _profile_row(ids[r['user']['email']], r['profile']) for r in records if r['profile']
+    ])
+    conn.executemany(LINKS_INSERT_SQL, [
+        _links_row(ids[r['user']['email']], r['links']) for r in records if r['links']
+    ])
+    return [ids[email] for email in emails]
+
+def import_chunk(conn, chunk, hash_fn, hash_pool):
+    """Validate and insert one chunk in a single transaction.
+
+    Returns (imported_user_ids, errors). If the batch insert hits a
+    constraint (e.g. a concurrent signup took an email), the chunk is retried
+    row by row so only the offending rows are reported.
+    """
+    normalized = normalize_chunk(chunk)
+    taken = _existing(conn, [rec for _, rec, _ in normalized if rec])
+    valid, errors = validate_chunk(normalized, *taken)
+
+    needs_hash = [rec for _, rec in valid if not rec['password_hash']]
+    if needs_hash:
+        for rec, hashed in zip(needs_hash, hash_passwords([r['password'] for r in needs_hash], hash_fn, hash_pool)):
+            rec['password_hash'] = hashed
+
+    if not valid:
+        return [], errors
+
+    records = [rec for _, rec in valid]
+    try:
+        conn.execute('BEGIN')
+        user_ids = _insert_batch(conn, records)
+        conn.commit()
+        return user_ids, errors
+    except sqlite3.IntegrityError:
+        conn.rollback()
+
+    user_ids = []
+    conn.execute('BEGIN')
+    for line_number, record in valid:
+        conn.execute('SAVEPOINT bulk_row')
+        try:
+            user_ids.extend(_insert_batch(conn, [record]))
+            conn.execute('RELEASE SAVEPOINT bulk_row')
+        except sqlite3.IntegrityError as e:
+            conn.execute('ROLLBACK TO SAVEPOINT bulk_row')
+            conn.execute('RELEASE SAVEPOINT bulk_row')
+            errors.append({"line": line_number, "error": f"Conflicts with existing data: {e}"})
+    conn.commit()
+    errors.sort(key=lambda e: e['line'])
+    return user_ids, errors
+
+def import_records(get_connection, records, hash_fn, hash_pool, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import (line_number, record) pairs chunk by chunk.
+
+    Passwords are hashed on hash_pool, the same HashingPool signins use.
+    A connection is checked out per chunk so a long import never pins one.
+    Returns a summary with the imported count and per-row errors.
+    """
+    imported = 0
+    errors = []
+    user_ids = []
+    for chunk in chunked(records, chunk_size):
+        conn = get_connection()
+        try:
+            ids, chunk_errors = import_chunk(conn, chunk, hash_fn, hash_pool)
+        finally:
+            conn.close()
+        imported += len(ids)
+        user_ids.extend(ids)
+        errors.extend(chunk_errors)
+    return {
+        "imported": imported,
+        "failed": len(errors),
+        "errors": errors,
+        "user_ids": user_ids
+    }
+
+EXPORT_SQL = f'''
+    SELECT u.id AS user_id, u.full_name, u.email, u.phone_number, u.created_at,
+           {', '.join(f'p.{f}' for f in PROFILE_FIELDS)}, p.profile_url,
+           {', '.join(f'l.{f} AS link_{f}' for f in LINK_FIELDS)}
+    FROM users u
+    LEFT JOIN profiles p ON p.user_id = u.id
+    LEFT JOIN links l ON l.user_id = u.id
+    WHERE u.id > ?
+    ORDER BY u.id
+    LIMIT ?
+'''
+
+def export_rows(get_connection, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield export rows using keyset pages so no page holds a long read"""
+    last_id = 0
+    while True:
+        conn = get_connection()
+        try:
+            rows = conn.execute(EXPORT_SQL, (last_id, chunk_size)).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        for row in rows:
+            yield {field: row[field] for field in EXPORT_FIELDS}
+        last_id = rows[-1]['user_id']
+
+USERS_CREATED_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at, id)
+'''
+
+LIST_USERS_SQL = '''
+    SELECT u.id, u.full_name, u.email, u.phone_number, u.is_profile_complete, u.created_at,
+           p.username
+    FROM users u
+    LEFT JOIN profiles p ON p.user_id = u.id
+'''
+
+def list_users(conn, limit, secret, cursor=None):
+    """One page of users for the admin console, newest first, plus the next cursor"""
+    sql = LIST_USERS_SQL
+    params = []
+    if cursor:
+        created_at, user_id = decode_cursor(cursor, secret, 'admin:users')
+        sql += ' WHERE ' + keyset_condition('u.created_at', 'u.id')
+        params.extend(keyset_params(created_at, user_id))
+    sql += ' ORDER BY u.created_at DESC, u.id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    page, next_cursor = keyset_page(
+        rows, limit, lambda row: (row['created_at'], row['id']), secret, 'admin:users'
+    )
+    return [dict(row) for row in page], next_cursor
+
+def export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+def serialize_export(rows, fmt):
+    """Stream export rows as NDJSON or CSV text"""
+    return export_csv(rows) if fmt == 'csv' else export_ndjson(rows)
+
+def main(argv=None):
+    """Command line entry point: python bulk.py import|export ..."""
+    from werkzeug.security import generate_password_hash
+    from config import Config
+    from database import database
+
+    parser = argparse.ArgumentParser(description="Bulk import/export Tapzx users, profiles and links")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = sub.add_parser('import', help="Import users from NDJSON or CSV")
+    import_parser.add_argument('path', help="Input file, or - for stdin")
+    import_parser.add_argument('--format', choices=FORMATS)
+    import_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    export_parser = sub.add_parser('export', help="Export users as NDJSON or CSV")
+    export_parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    export_parser.add_argument('--output', default='-', help="Output file, or - for stdout")
+    export_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    args = parser.parse_args(argv)
+    database.init_database()
+
+    if args.command == 'import':
+        fmt = args.format or ('csv' if args.path.endswith('.csv') else 'ndjson')
+        stream = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+        hash_pool = HashingPool(
+            max_workers=Config.HASH_POOL_WORKERS,
+            max_queue=Config.HASH_POOL_QUEUE,
+            kind=Config.HASH_POOL_KIND
+        )
+        try:
+            summary = import_records(
+                database.get_connection,
+                parse_records(stream, fmt),
+                generate_password_hash,
+                hash_pool,
+                chunk_size=args.chunk_size
+            )
+        finally:
+            hash_pool.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+        summary.pop('user_ids')
+        print(json.dumps(summary, indent=2))
+        return 1 if summary['failed'] else 0
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        for text in serialize_export(export_rows(database.get_connection, args.chunk_size), args.format):
+            out.write(text)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,525 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache whose entries also expire after a TTL.
+
+    Entries can carry tags (e.g. "user:42") so every cached representation of
+    a user's card can be dropped at once when that user saves or deletes data.
+    ``generation`` counts invalidations; a value computed from a read that
+    started before an invalidation can be stored conditionally with it.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, key):
+        """Drop a key and its tag references (lock must be held)"""
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def get(self, key):
+        """Return the cached value or None on a miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, tags=(), ttl=None, generation=None):
+        """Store a value, evicting the least recently used entries when full.
+
+        With ``generation`` (read before computing the value) nothing is stored
+        if an invalidation has happened since, so a stale value never lands
+        after the write that made it stale.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tags = frozenset(tags)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._remove(key)
+            self._data[key] = (value, expires_at, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def delete(self, key):
+        """Remove a single key"""
+        with self._lock:
+            self.generation += 1
+            if self._remove(key):
+                self.invalidations += 1
+                return True
+            return False
+
+    def invalidate_tag(self, tag):
+        """Remove every entry carrying the tag, returning how many were dropped"""
+        with self._lock:
+            self.generation += 1
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self):
+        """Return size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+class MemoryBackend:
+    """In-process stand-in for the shared Redis store.
+
+    Implements the same small surface as RedisBackend (values with TTL, tag
+    sets, SET NX locks and pub/sub) so a single worker or the test suite can
+    run without a Redis server. Values are bounded like TTLCache: past
+    max_entries the least recently used key is evicted, and tag sets only
+    keep members that are still stored.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max(1, int(max_entries))
+        self._values = OrderedDict()
+        self._tags = {}
+        self._key_tags = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        """Drop a value and its tag memberships (lock must be held)"""
+        self._values.pop(key, None)
+        for tag_key in self._key_tags.pop(key, ()):
+            members = self._tags.get(tag_key)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._tags[tag_key]
+
+    def _store(self, key, value, expires_at):
+        self._values[key] = (value, expires_at)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_entries:
+            self._remove(next(iter(self._values)))
+
+    def _live(self, key, now):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            self._remove(key)
+            return None
+        self._values.move_to_end(key)
+        return entry[0]
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.monotonic())
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._store(key, value, time.monotonic() + ttl)
+
+    def add(self, key, value, ttl):
+        """Set only when the key is absent (SET NX); returns True on success"""
+        with self._lock:
+            now = time.monotonic()
+            if self._live(key, now) is not None:
+                return False
+            self._store(key, value, now + ttl)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+                for member in self._tags.pop(key, ()):
+                    tags = self._key_tags.get(member)
+                    if tags is not None:
+                        tags.discard(key)
+                        if not tags:
+                            del self._key_tags[member]
+
+    def tag(self, tag_key, key, ttl):
+        with self._lock:
+            # Tagging an evicted or expired key would leave a member nothing removes
+            if self._live(key, time.monotonic()) is None:
+                return
+            self._tags.setdefault(tag_key, set()).add(key)
+            self._key_tags.setdefault(key, set()).add(tag_key)
+
+    def tag_members(self, tag_key):
+        with self._lock:
+            return list(self._tags.get(tag_key, ()))
+
+    def publish(self, channel, message):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+class RedisBackend:
+    """Shared store speaking the Redis protocol (redis-py or fakeredis client)"""
+
+    def __init__(self, client):
+        self.client = client
+        self._pubsub_threads = []
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    def add(self, key, value, ttl):
+        return bool(self.client.set(key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def tag(self, tag_key, key, ttl):
+        pipe = self.client.pipeline()
+        pipe.sadd(tag_key, key)
+        # Keep the tag set alive at least as long as its members
+        pipe.expire(tag_key, max(1, int(ttl) * 2))
+        pipe.execute()
+
+    def tag_members(self, tag_key):
+        return [m.decode() if isinstance(m, bytes) else m for m in self.client.smembers(tag_key)]
+
+    def publish(self, channel, message):
+        self.client.publish(channel, message)
+
+    def subscribe(self, channel, callback):
+        def handler(message):
+            data = message.get('data')
+            callback(data.decode() if isinstance(data, bytes) else data)
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{channel: handler})
+        self._pubsub_threads.append(pubsub.run_in_thread(sleep_time=1.0, daemon=True))
+
+def create_backend(url, max_entries=4096):
+    """Build a shared cache backend from a URL.
+
+    ``memory://`` gives the in-process stand-in (holding at most max_entries
+    keys), ``fakeredis://`` a fakeredis client and
+    ``redis://``/``rediss://``/``unix://`` a real Redis server.
+    """
+    if not url or url.startswith('memory://'):
+        return MemoryBackend(max_entries)
+    if url.startswith('fakeredis://'):
+        try:
+            import fakeredis
+        except ImportError:
+            raise RuntimeError("fakeredis is required for CACHE_URL=fakeredis://")
+        return RedisBackend(fakeredis.FakeRedis())
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("The redis package is required for CACHE_URL=" + url)
+    return RedisBackend(redis.Redis.from_url(url))
+
+class _Flight:
+    """A single in-flight load that concurrent callers wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class CardCache:
+    """Two-tier cache for serialized card responses.
+
+    Reads go to a per-worker TTLCache first and then to the shared backend.
+    Invalidations remove the tag from both tiers and are published so every
+    other worker drops its local copies too. Loads are single-flight per key
+    within a worker, and a short SET NX lock in the shared backend keeps
+    workers from all rebuilding the same viral card at once.
+    """
+
+    CHANNEL = 'tapzx:cache:invalidate'
+
+    def __init__(self, backend, max_entries=1024, local_ttl=60.0, shared_ttl=300.0,
+                 prefix='tapzx:', lock_ttl=5.0, lock_wait=1.0):
+        self.backend = backend
+        self.local = TTLCache(max_entries=max_entries, ttl=local_ttl)
+        self.shared_ttl = shared_ttl
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+
+        self._flights = {}
+        self._async_flights = {}
+        self._flights_lock = threading.Lock()
+        self._listeners = []
+
+        # Counters
+        self.shared_hits = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.published = 0
+        self.received = 0
+
+        self.backend.subscribe(self.prefix + self.CHANNEL, self._on_invalidate)
+
+    def _on_invalidate(self, message):
+        self.received += 1
+        self._drop_local(**json.loads(message))
+
+    def _drop_local(self, tag, keys):
+        self.local.invalidate_tag(tag)
+        for key in keys:
+            self.local.delete(key)
+        for listener in self._listeners:
+            listener(tag)
+
+    def add_invalidation_listener(self, callback):
+        """Call callback(tag) whenever a tag is invalidated by any worker"""
+        self._listeners.append(callback)
+
+    def _shared_key(self, key):
+        return self.prefix + key
+
+    def _tag_key(self, tag):
+        return self.prefix + 'tag:' + tag
+
+    def get(self, key):
+        """Return cached bytes from the local or shared tier, or None"""
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        value = self.backend.get(self._shared_key(key))
+        if value is None:
+            return None
+        self.shared_hits += 1
+        # Invalidation messages list the affected keys, so this untagged
+        # local copy is still dropped when its owner saves
+        self.local.set(key, value)
+        return value
+
+    def set(self, key, value, tags=()):
+        """Store bytes in both tiers"""
+        self.local.set(key, value, tags=tags)
+        shared_key = self._shared_key(key)
+        self.backend.set(shared_key, value, self.shared_ttl)
+        for tag in tags:
+            self.backend.tag(self._tag_key(tag), shared_key, self.shared_ttl)
+
+    def invalidate_tag(self, tag):
+        """Drop a tag everywhere and tell the other workers to do the same"""
+        tag_key = self._tag_key(tag)
+        shared_keys = self.backend.tag_members(tag_key)
+        self.backend.delete(*shared_keys, tag_key)
+        keys = [k[len(self.prefix):] for k in shared_keys if k.startswith(self.prefix)]
+        self._drop_local(tag, keys)
+        self.backend.publish(
+            self.prefix + self.CHANNEL,
+            json.dumps({"tag": tag, "keys": keys})
+        )
+        self.published += 1
+
+    def _load(self, key, loader):
+        """Run the loader behind the shared lock and store a 200 result"""
+        lock_key = self._shared_key('lock:' + key)
+        locked = self.backend.add(lock_key, b'1', self.lock_ttl)
+        if not locked:
+            # Another worker is loading this key; give it a moment to finish
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(0.02)
+                value = self.get(key)
+                if value is not None:
+                    return value, 200
+        try:
+            self.loads += 1
+            body, status, tags = loader()
+            if status == 200:
+                self.set(key, body, tags)
+            return body, status
+        finally:
+            if locked:
+                self.backend.delete(lock_key)
+
+    def get_or_load(self, key, loader):
+        """Return (body, status) for a key, calling loader() at most once per worker.
+
+        ``loader`` returns ``(body, status, tags)``; only 200 bodies are cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, 200
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            self.coalesced += 1
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._load(key, loader)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    async def aget_or_load(self, key, loader):
+        """Async variant of get_or_load for the FastAPI routes.
+
+        ``loader`` is a coroutine function; shared-tier calls run in a worker
+        thread so a slow Redis round trip never blocks the event loop.
+        """
+        value = self.local.get(key)
+        if value is not None:
+            return value, 200
+        value = await asyncio.to_thread(self.get, key)
+        if value is not None:
+            return value, 200
+
+        future = self._async_flights.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_flights[key] = future
+        lock_key = self._shared_key('lock:' + key)
+        try:
+            locked = await asyncio.to_thread(self.backend.add, lock_key, b'1', self.lock_ttl)
+            if not locked:
+                deadline = time.monotonic() + self.lock_wait
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(0.02)
+                    value = await asyncio.to_thread(self.get, key)
+                    if value is not None:
+                        future.set_result((value, 200))
+                        return value, 200
+            try:
+                self.loads += 1
+                body, status, tags = await loader()
+                if status == 200:
+                    await asyncio.to_thread(self.set, key, body, tags)
+            finally:
+                if locked:
+                    await asyncio.to_thread(self.backend.delete, lock_key)
+            future.set_result((body, status))
+            return body, status
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                # Mark retrieved so an unawaited failure does not warn
+                future.exception()
+            raise
+        finally:
+            self._async_flights.pop(key, None)
+
+    def stats(self):
+        """Return local tier counters plus shared/single-flight counters"""
+        stats = self.local.stats()
+        stats.update({
+            "backend": type(self.backend).__name__,
+            "shared_hits": self.shared_hits,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "invalidations_published": self.published,
+            "invalidations_received": self.received
+        })
+        return stats
+
+def card_username_key(username):
+    """Cache key for a public card looked up by username"""
+    return f"card:username:{username}"
+
+def card_user_id_key(user_id):
+    """Cache key for a card looked up by user id"""
+    return f"card:user_id:{user_id}"
+
+def profile_user_id_key(user_id):
+    """Cache key for a profile looked up by user id"""
+    return f"profile:user_id:{user_id}"
+
+def profile_username_key(username):
+    """Cache key for a profile looked up by username"""
+    return f"profile:username:{username}"
+
+def links_user_id_key(user_id):
+    """Cache key for a user's links"""
+    return f"links:user_id:{user_id}"
+
+def vcard_username_key(username, variant):
+    """Cache key for a vCard looked up by username, per photo variant"""
+    return f"vcard:username:{username}:{variant}"
+
+def user_tag(user_id):
+    """Tag shared by every cached entry that belongs to a user"""
+    return f"user:{user_id}"
@@ -0,0 +1,84 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+# HTTP conditional GET for the profile, links and card endpoints. Validators
+# come from the rows' version counters and updated_at columns, which one small
+# indexed query (or the validator cache) yields without loading the card, so
+# an unchanged card is answered with 304 before any JSON is built.
+
+# Cache-Control per route: owner-facing responses include contact details and
+# must not sit in shared caches; public cards may be reused briefly
+CACHE_CONTROL = {
+    'private': 'private, no-cache',
+    'public': 'public, max-age=30, stale-while-revalidate=60'
+}
+
+# Which parts of a user's data each response depends on
+PROFILE = ('profile',)
+LINKS = ('links',)
+CARD = ('user', 'profile', 'links')
+
+def _as_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def make_validators(versions, parts):
+    """Build (etag, last_modified) from a versions row, or None if nothing exists.
+
+    ``versions`` maps each part to (version, updated_at) or None when that
+    row is missing. The ETag is strong: any write bumps a version.
+    """
+    present = [part for part in parts if versions.get(part) is not None]
+    if not present:
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    modified = []
+    for part in parts:
+        state = versions.get(part)
+        digest.update(f"{part}={state!r};".encode('utf-8'))
+        if state is not None and state[1] is not None:
+            modified.append(_as_datetime(state[1]))
+    etag = digest.hexdigest()
+    return etag, max(modified) if modified else None
+
+def _etag_matches(header, etag):
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+def not_modified(if_none_match, if_modified_since, etag, last_modified):
+    """Evaluate request preconditions; If-None-Match wins over If-Modified-Since"""
+    if if_none_match:
+        return _etag_matches(if_none_match, etag)
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def validator_headers(etag, last_modified, policy):
+    """Response headers carrying the validators and the route's cache policy"""
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': CACHE_CONTROL[policy]
+    }
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(last_modified.replace(microsecond=0), usegmt=True)
+    return headers
@@ -7,6 +7,66 @@ class Config:
     # SQLite settings
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'tapzx.db')
     
+    # SQLite connection pool settings
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5.0))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 16384))
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 268435456))
+    
+    # Public profile card cache settings
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 4096))
+    PROFILE_CACHE_TTL = float(os.getenv('PROFILE_CACHE_TTL', 60.0))
+    
+    # Shared cache backend (memory://, fakeredis:// or redis://host:6379/0)
+    CACHE_URL = os.getenv('CACHE_URL', 'memory://')
+    CACHE_SHARED_TTL = float(os.getenv('CACHE_SHARED_TTL', 300.0))
+    
+    # Password hashing pool (thread or process workers)
+    HASH_POOL_WORKERS = int(os.getenv('HASH_POOL_WORKERS', 2))
+    HASH_POOL_QUEUE = int(os.getenv('HASH_POOL_QUEUE', 16))
+    HASH_POOL_KIND = os.getenv('HASH_POOL_KIND', 'thread')
+    
+    # Largest number of profiles one batch lookup may request
+    PROFILE_BATCH_MAX = int(os.getenv('PROFILE_BATCH_MAX', 200))
+    
+    # In-memory username index: seconds between reloads (0 disables)
+    USERNAME_INDEX_REFRESH = float(os.getenv('USERNAME_INDEX_REFRESH', 300.0))
+    
+    # Signup Bloom filter over registered emails and phone numbers
+    SIGNUP_FILTER_PATH = os.getenv('SIGNUP_FILTER_PATH', 'signup_filter.bloom')
+    SIGNUP_FILTER_CAPACITY = int(os.getenv('SIGNUP_FILTER_CAPACITY', 500000))
+    
+    # Offline gazetteer for geocoding profile locations (empty uses data/gazetteer.csv)
+    GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', '')
+    
+    # Static card pages (HTML + JSON per username); disabled when empty
+    STATIC_CARDS_PATH = os.getenv('STATIC_CARDS_PATH', '')
+    STATIC_CARDS_TEMPLATE = os.getenv('STATIC_CARDS_TEMPLATE', '')
+    STATIC_CARDS_WORKERS = int(os.getenv('STATIC_CARDS_WORKERS', 1))
+    
+    # Rendered QR codes (disk cache, least recently used evicted past the byte budget)
+    QR_CACHE_PATH = os.getenv('QR_CACHE_PATH', 'qr_cache')
+    QR_CACHE_MAX_BYTES = int(os.getenv('QR_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    QR_WORKERS = int(os.getenv('QR_WORKERS', 0))
+    
+    # Analytics ingestion (ring buffer flushed in batches)
+    ANALYTICS_BUFFER_SIZE = int(os.getenv('ANALYTICS_BUFFER_SIZE', 100000))
+    ANALYTICS_BATCH_SIZE = int(os.getenv('ANALYTICS_BATCH_SIZE', 500))
+    ANALYTICS_FLUSH_INTERVAL = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', 2.0))
+    
+    # Profile image blob store and variant rendering workers
+    IMAGE_STORE_PATH = os.getenv('IMAGE_STORE_PATH', 'media')
+    IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', 5 * 1024 * 1024))
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+    
+    # Public origin for absolute URLs in responses (e.g. https://api.tapzx.app);
+    # when empty the request's host is used and vCards with linked photos are not cached
+    PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', '')
+    
+    # Admin API (bulk import/export); disabled when empty
+    ADMIN_API_KEY = os.getenv('ADMIN_API_KEY', '')
+    
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
@@ -0,0 +1,239 @@
+import json
+from datetime import datetime, timezone
+from analytics import MAX_CLOCK_SKEW_SECONDS, TIMESTAMP_FORMAT, parse_timestamp
+from utils import decode_cursor, keyset_condition, keyset_page, keyset_params, validate_username
+
+# Contacts saved by scanning or tapping someone's card. Rows are keyed by
+# (owner_id, target_user_id) and listed newest first through the
+# (owner_id, created_at, id) index, so a page of a 10k-contact list is a
+# bounded index range scan rather than a filter over the whole table.
+
+MAX_NOTES_LENGTH = 1000
+MAX_TAGS = 20
+MAX_TAG_LENGTH = 32
+MAX_SYNC_ITEMS = 500
+
+CONNECTIONS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS connections (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        owner_id INTEGER NOT NULL,
+        target_user_id INTEGER NOT NULL,
+        notes TEXT,
+        tags TEXT NOT NULL DEFAULT '[]',
+        created_at TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (owner_id) REFERENCES users (id),
+        FOREIGN KEY (target_user_id) REFERENCES users (id),
+        UNIQUE(owner_id, target_user_id)
+    )
+'''
+
+CONNECTIONS_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS idx_connections_owner_created ON connections (owner_id, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_connections_target_owner ON connections (target_user_id, owner_id)'
+)
+
+def _normalize_tags(tags):
+    if tags is None:
+        return []
+    if not isinstance(tags, list):
+        raise ValueError("tags must be a list of strings")
+    cleaned = []
+    for tag in tags:
+        tag = str(tag).strip()
+        if not tag:
+            continue
+        if len(tag) > MAX_TAG_LENGTH:
+            raise ValueError(f"Tags cannot exceed {MAX_TAG_LENGTH} characters")
+        if tag not in cleaned:
+            cleaned.append(tag)
+    if len(cleaned) > MAX_TAGS:
+        raise ValueError(f"At most {MAX_TAGS} tags per connection")
+    return cleaned
+
+def normalize_connection(raw, id_type=int):
+    """Validate one connection or queued scan, returning (item, None) or (None, error).
+
+    The target is given as ``target_user_id`` or ``target_username``;
+    ``scanned_at`` (ISO 8601 or epoch) lets offline scans keep their time.
+    """
+    if not isinstance(raw, dict):
+        return None, "Connection must be an object"
+
+    target_user_id = raw.get('target_user_id')
+    target_username = raw.get('target_username')
+    if target_user_id is not None:
+        try:
+            target_user_id = id_type(target_user_id)
+        except (TypeError, ValueError):
+            return None, "Invalid target_user_id"
+        target_username = None
+    elif target_username:
+        target_username = str(target_username).strip().lower()
+        if not validate_username(target_username):
+            return None, "Invalid target_username"
+    else:
+        return None, "target_user_id or target_username is required"
+
+    notes = raw.get('notes')
+    if notes is not None:
+        notes = str(notes).strip()
+        if len(notes) > MAX_NOTES_LENGTH:
+            return None, f"Notes cannot exceed {MAX_NOTES_LENGTH} characters"
+
+    try:
+        tags = _normalize_tags(raw.get('tags'))
+    except ValueError as e:
+        return None, str(e)
+
+    try:
+        created_at = parse_timestamp(raw.get('scanned_at'))
+    except (ValueError, OverflowError, OSError):
+        return None, "Invalid scanned_at"
+    if (created_at - datetime.now(timezone.utc)).total_seconds() > MAX_CLOCK_SKEW_SECONDS:
+        return None, "scanned_at is in the future"
+
+    return {
+        "target_user_id": target_user_id,
+        "target_username": target_username,
+        "notes": notes,
+        "tags": tags,
+        "created_at": created_at
+    }, None
+
+def _resolve_targets(conn, items):
+    """Fill in target_user_id for username targets with one IN query"""
+    usernames = list({item['target_username'] for item in items if item['target_username']})
+    user_ids = {}
+    if usernames:
+        rows = conn.execute(
+            f"SELECT username, user_id FROM profiles WHERE username IN ({', '.join('?' * len(usernames))})",
+            usernames
+        ).fetchall()
+        user_ids = {row[0]: row[1] for row in rows}
+
+    ids = list({item['target_user_id'] for item in items if item['target_user_id'] is not None})
+    existing = set()
+    if ids:
+        rows = conn.execute(
+            f"SELECT id FROM users WHERE id IN ({', '.join('?' * len(ids))})",
+            ids
+        ).fetchall()
+        existing = {row[0] for row in rows}
+    existing.update(user_ids.values())
+
+    for item in items:
+        if item['target_username']:
+            item['target_user_id'] = user_ids.get(item['target_username'])
+    return existing
+
+UPSERT_SQL = '''
+    INSERT INTO connections (owner_id, target_user_id, notes, tags, created_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (owner_id, target_user_id) DO UPDATE SET
+        notes = COALESCE(excluded.notes, connections.notes),
+        tags = CASE WHEN excluded.tags = '[]' THEN connections.tags ELSE excluded.tags END,
+        created_at = MIN(connections.created_at, excluded.created_at),
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+def save_connections(conn, owner_id, raw_items):
+    """Validate and upsert a batch of connections in one transaction.
+
+    Re-sending a scan is harmless: the pair stays unique, the earliest scan
+    time wins and notes/tags are only overwritten when provided. Returns a
+    per-item list of {"index", "status", "target_user_id"|"error"}.
+    """
+    results = []
+    valid = []
+    for index, raw in enumerate(raw_items):
+        item, error = normalize_connection(raw)
+        if error:
+            results.append({"index": index, "status": "error", "error": error})
+        else:
+            valid.append((index, item))
+
+    existing = _resolve_targets(conn, [item for _, item in valid])
+    rows = []
+    for index, item in valid:
+        target = item['target_user_id']
+        if target is None or target not in existing:
+            results.append({"index": index, "status": "error", "error": "Target user not found"})
+        elif target == owner_id:
+            results.append({"index": index, "status": "error", "error": "Cannot connect to yourself"})
+        else:
+            rows.append((
+                owner_id, target, item['notes'], json.dumps(item['tags']),
+                item['created_at'].strftime(TIMESTAMP_FORMAT)
+            ))
+            results.append({"index": index, "status": "saved", "target_user_id": target})
+
+    conn.executemany(UPSERT_SQL, rows)
+    conn.commit()
+    results.sort(key=lambda result: result['index'])
+    return results
+
+LIST_SQL = '''
+    SELECT c.id, c.target_user_id, c.notes, c.tags, c.created_at, c.updated_at,
+           p.username, p.organization_name, p.profile_image
+    FROM connections c
+    LEFT JOIN profiles p ON p.user_id = c.target_user_id
+    WHERE c.owner_id = ?
+'''
+
+def cursor_scope(owner_id):
+    """Cursors are only valid for the owner's list they came from"""
+    return f"connections:{owner_id}"
+
+def list_connections(conn, owner_id, limit, secret, cursor=None, tag=None):
+    """One page of a user's connections, newest first, plus the next cursor"""
+    sql = LIST_SQL
+    params = [owner_id]
+    if cursor:
+        created_at, row_id = decode_cursor(cursor, secret, cursor_scope(owner_id))
+        sql += ' AND ' + keyset_condition('c.created_at', 'c.id')
+        params.extend(keyset_params(created_at, row_id))
+    if tag:
+        sql += ' AND EXISTS (SELECT 1 FROM json_each(c.tags) WHERE json_each.value = ?)'
+        params.append(tag)
+    sql += ' ORDER BY c.created_at DESC, c.id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    page, next_cursor = keyset_page(
+        rows, limit, lambda row: (row['created_at'], row['id']),
+        secret, cursor_scope(owner_id)
+    )
+    items = [{
+        "id": row['id'],
+        "target_user_id": row['target_user_id'],
+        "username": row['username'],
+        "organization_name": row['organization_name'],
+        "profile_image": row['profile_image'],
+        "notes": row['notes'],
+        "tags": json.loads(row['tags']),
+        "created_at": row['created_at'],
+        "updated_at": row['updated_at']
+    } for row in page]
+    return items, next_cursor
+
+def connection_status(conn, user_id, other_id):
+    """Whether each user has saved the other, answered from the unique index"""
+    rows = conn.execute('''
+        SELECT owner_id FROM connections
+        WHERE (owner_id = ? AND target_user_id = ?) OR (owner_id = ? AND target_user_id = ?)
+    ''', (user_id, other_id, other_id, user_id)).fetchall()
+    owners = {row[0] for row in rows}
+    return {
+        "connected": user_id in owners,
+        "connected_back": other_id in owners,
+        "mutual": user_id in owners and other_id in owners
+    }
+
+def delete_connection(conn, owner_id, target_user_id):
+    cursor = conn.execute(
+        'DELETE FROM connections WHERE owner_id = ? AND target_user_id = ?',
+        (owner_id, target_user_id)
+    )
+    conn.commit()
+    return cursor.rowcount > 0
@@ -1,16 +1,32 @@
-import sqlite3
-import os
 from config import Config
+from pool import get_pool
+import analytics
+import insights
+import sketches
+import connections
+import bulk
+import search
+import geo
+from utils import ensure_column
+from repositories import sqlite_repositories
 
 class Database:
     def __init__(self):
         self.db_path = Config.DATABASE_PATH
+        self.pool = get_pool(
+            self.db_path,
+            max_size=Config.DB_POOL_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            busy_timeout_ms=Config.DB_BUSY_TIMEOUT_MS,
+            cache_size_kb=Config.DB_CACHE_SIZE_KB,
+            mmap_size=Config.DB_MMAP_SIZE
+        )
+        geo.configure(Config.GAZETTEER_PATH)
+        self.repositories = sqlite_repositories(self.get_connection)
     
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Get a pooled database connection (close() returns it to the pool)"""
+        return self.pool.acquire()
     
     def init_database(self):
         """Initialize database with tables"""
@@ -48,6 +64,7 @@ class Database:
                 discord TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                version INTEGER NOT NULL DEFAULT 1,
                 FOREIGN KEY (user_id) REFERENCES users (id),
                 UNIQUE(user_id)
             )
@@ -66,43 +83,42 @@ class Database:
                 profile_url TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                version INTEGER NOT NULL DEFAULT 1,
+                latitude REAL,
+                longitude REAL,
+                geohash TEXT,
                 FOREIGN KEY (user_id) REFERENCES users (id),
                 UNIQUE(user_id)
             )
         ''')
         
+        # Keyset index for the admin user listing
+        conn.execute(bulk.USERS_CREATED_INDEX_SQL)
+        
+        # Version counters (bumped on every write) for databases created before them
+        ensure_column(conn, 'links', 'version', 'INTEGER NOT NULL DEFAULT 1')
+        ensure_column(conn, 'profiles', 'version', 'INTEGER NOT NULL DEFAULT 1')
+        
+        # Create append-only analytics events table
+        conn.execute(analytics.EVENTS_TABLE_SQL)
+        conn.execute(analytics.EVENTS_INDEX_SQL)
+        conn.execute(insights.ROLLUPS_TABLE_SQL)
+        conn.execute(sketches.SKETCHES_TABLE_SQL)
+        
+        # Create connections (saved contacts) table
+        conn.execute(connections.CONNECTIONS_TABLE_SQL)
+        for index_sql in connections.CONNECTIONS_INDEX_SQL:
+            conn.execute(index_sql)
+        
+        # Full-text people search, kept in sync by triggers
+        search.init_search(conn)
+        
+        # Geocoded profile locations in an R*Tree for nearby search
+        geo.init_geo(conn, geo.get_gazetteer())
+        
         conn.commit()
         conn.close()
         print("SQLite database initialized successfully!")
-    
-    def execute_query(self, query, params=None):
-        """Execute a query and return results"""
-        conn = self.get_connection()
-        try:
-            if params:
-                result = conn.execute(query, params)
-            else:
-                result = conn.execute(query)
-            
-            if query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
-                conn.commit()
-                return result.lastrowid if query.strip().upper().startswith('INSERT') else result.rowcount
-            else:
-                return result.fetchall()
-        finally:
-            conn.close()
-    
-    def execute_single(self, query, params=None):
-        """Execute a query and return single result"""
-        conn = self.get_connection()
-        try:
-            if params:
-                result = conn.execute(query, params).fetchone()
-            else:
-                result = conn.execute(query).fetchone()
-            return result
-        finally:
-            conn.close()
 
 # Global database instance
 database = Database()
\ No newline at end of file
@@ -0,0 +1,369 @@
+import csv
+import math
+import os
+import re
+import sys
+import threading
+import unicodedata
+from collections import namedtuple
+from utils import ensure_column
+
+# Nearby people: free-text profile locations are geocoded to a city
+# centroid against an offline gazetteer when a profile is saved. The
+# coordinates are kept on the profile (plus a geohash for clients) and in an
+# R*Tree, maintained by triggers, so "k nearest to here" is a few bounding-box
+# index probes instead of a scan of every profile.
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.csv')
+
+GEOHASH_PRECISION = 9
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+DEFAULT_K = 20
+MAX_K = 100
+DEFAULT_RADIUS_KM = 500.0
+MAX_RADIUS_KM = 20038.0
+
+# First search radius; it grows 4x per round until k profiles are in range
+INITIAL_RADIUS_KM = 25.0
+
+# Box candidates read per requested result. Boxes are read nearest first by
+# flat-earth distance, which can misorder points slightly against haversine,
+# so some slack past k is kept.
+BOX_CANDIDATES_PER_RESULT = 4
+
+LOCATION_FIELDS = ('latitude', 'longitude', 'geohash')
+
+Place = namedtuple('Place', ['name', 'country', 'latitude', 'longitude', 'population'])
+
+COUNTRY_ALIASES = {
+    'usa': 'US', 'united states': 'US', 'united states of america': 'US', 'america': 'US',
+    'uk': 'GB', 'united kingdom': 'GB', 'england': 'GB', 'scotland': 'GB', 'great britain': 'GB',
+    'uae': 'AE', 'united arab emirates': 'AE', 'india': 'IN', 'canada': 'CA', 'australia': 'AU',
+    'germany': 'DE', 'france': 'FR', 'spain': 'ES', 'italy': 'IT', 'brazil': 'BR', 'mexico': 'MX',
+    'japan': 'JP', 'china': 'CN', 'nigeria': 'NG', 'kenya': 'KE', 'south africa': 'ZA',
+    'pakistan': 'PK', 'bangladesh': 'BD', 'indonesia': 'ID', 'philippines': 'PH',
+    'netherlands': 'NL', 'ireland': 'IE', 'new zealand': 'NZ', 'singapore': 'SG'
+}
+
+def _key(text):
+    """Case- and accent-insensitive lookup key"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', text).strip()
+
+class Gazetteer:
+    """In-memory place names loaded from a CSV or a GeoNames cities dump.
+
+    The CSV has name, country, latitude, longitude, population and
+    pipe-separated alternate_names columns. GeoNames ``cities*.txt`` files
+    (tab-separated, no header) can be used instead for wider coverage.
+    """
+
+    def __init__(self, places=()):
+        self._by_key = {}
+        for place, names in places:
+            self._add(place, names)
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def _add(self, place, names):
+        for name in names:
+            key = _key(name)
+            if key:
+                self._by_key.setdefault(key, []).append(place)
+
+    @classmethod
+    def load(cls, path):
+        if path.endswith('.txt'):
+            return cls(_read_geonames(path))
+        return cls(_read_csv(path))
+
+    def geocode(self, text):
+        """Resolve "City", "City, Country" or "City, Region, Country" to a Place.
+
+        The most populous match wins, preferring one in a named country.
+        Returns None when nothing matches.
+        """
+        parts = [_key(part) for part in (text or '').split(',')]
+        parts = [part for part in parts if part]
+        if not parts:
+            return None
+        country = COUNTRY_ALIASES.get(parts[-1]) or (parts[-1].upper() if len(parts[-1]) == 2 else None)
+        for candidate in [' '.join(parts)] + parts:
+            matches = self._by_key.get(candidate)
+            if not matches:
+                continue
+            in_country = [place for place in matches if place.country == country] if len(parts) > 1 else []
+            return max(in_country or matches, key=lambda place: place.population)
+        return None
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            place = Place(
+                row['name'], row['country'].upper(), float(row['latitude']),
+                float(row['longitude']), int(row.get('population') or 0)
+            )
+            alternates = [name for name in (row.get('alternate_names') or '').split('|') if name]
+            yield place, [place.name] + alternates
+
+def _read_geonames(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            cols = line.rstrip('\n').split('\t')
+            if len(cols) < 15:
+                continue
+            place = Place(cols[1], cols[8].upper(), float(cols[4]), float(cols[5]), int(cols[14] or 0))
+            yield place, [cols[1], cols[2]]
+
+_gazetteers = {}
+_gazetteer_lock = threading.Lock()
+_default_path = DEFAULT_GAZETTEER_PATH
+
+def configure(path):
+    """Choose the gazetteer file used when get_gazetteer() is called without one"""
+    global _default_path
+    _default_path = path or DEFAULT_GAZETTEER_PATH
+
+def get_gazetteer(path=None):
+    """Load a gazetteer once per process and path"""
+    path = path or _default_path
+    with _gazetteer_lock:
+        if path not in _gazetteers:
+            _gazetteers[path] = Gazetteer.load(path)
+        return _gazetteers[path]
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            bounds[0] = mid
+        else:
+            bits <<= 1
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def location_fields(location, gazetteer):
+    """latitude/longitude/geohash for a free-text location (all None if unknown)"""
+    place = gazetteer.geocode(location) if location else None
+    if place is None:
+        return {field: None for field in LOCATION_FIELDS}
+    return {
+        "latitude": place.latitude,
+        "longitude": place.longitude,
+        "geohash": encode_geohash(place.latitude, place.longitude)
+    }
+
+def parse_point(lat, lon):
+    """Validate query-string coordinates; raises ValueError with a client-facing message"""
+    try:
+        latitude, longitude = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise ValueError("lat and lon must be numbers")
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValueError("lat must be within ±90 and lon within ±180")
+    return latitude, longitude
+
+def parse_nearby_params(k=None, radius_km=None):
+    """Validate k and radius_km; raises ValueError with a client-facing message"""
+    try:
+        k = int(k) if k not in (None, '') else DEFAULT_K
+        radius_km = float(radius_km) if radius_km not in (None, '') else DEFAULT_RADIUS_KM
+    except (TypeError, ValueError):
+        raise ValueError("k and radius_km must be numbers")
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValueError(f"radius_km must be between 0 and {MAX_RADIUS_KM:g}")
+    return k, radius_km
+
+LOCATIONS_TABLE_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS profile_locations USING rtree (
+        user_id, min_lat, max_lat, min_lon, max_lon
+    )
+'''
+
+LOCATIONS_TRIGGERS_SQL = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS profile_locations_insert
+    AFTER INSERT ON profiles WHEN new.latitude IS NOT NULL BEGIN
+        INSERT INTO profile_locations VALUES (new.user_id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS profile_locations_update
+    AFTER UPDATE OF user_id, latitude, longitude ON profiles BEGIN
+        DELETE FROM profile_locations WHERE user_id = old.user_id;
+        INSERT INTO profile_locations
+        SELECT new.user_id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS profile_locations_delete AFTER DELETE ON profiles BEGIN
+        DELETE FROM profile_locations WHERE user_id = old.user_id;
+    END
+    '''
+)
+
+def init_geo(conn, gazetteer):
+    """Add the coordinate columns, R*Tree and triggers, geocoding existing profiles once"""
+    ensure_column(conn, 'profiles', 'latitude', 'REAL')
+    ensure_column(conn, 'profiles', 'longitude', 'REAL')
+    ensure_column(conn, 'profiles', 'geohash', 'TEXT')
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profile_locations'"
+    ).fetchone()
+    conn.execute(LOCATIONS_TABLE_SQL)
+    for trigger_sql in LOCATIONS_TRIGGERS_SQL:
+        conn.execute(trigger_sql)
+    if not exists:
+        backfill_locations(conn, gazetteer)
+
+def backfill_locations(conn, gazetteer):
+    """Geocode every profile's location; returns how many resolved"""
+    rows = conn.execute('SELECT user_id, location FROM profiles').fetchall()
+    resolved = 0
+    for user_id, location in rows:
+        fields = location_fields(location, gazetteer)
+        conn.execute(
+            'UPDATE profiles SET latitude = ?, longitude = ?, geohash = ? WHERE user_id = ?',
+            (fields['latitude'], fields['longitude'], fields['geohash'], user_id)
+        )
+        resolved += fields['latitude'] is not None
+    return resolved
+
+def _boxes(latitude, longitude, radius_km):
+    """Bounding boxes covering a circle, split where it crosses the antimeridian"""
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, latitude - dlat), min(90.0, latitude + dlat)
+    cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    if min_lat <= -90 or max_lat >= 90 or cos_lat <= 0.01:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    dlon = radius_km / (KM_PER_DEGREE * cos_lat)
+    if dlon >= 180:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if min_lon < -180:
+        return [(min_lat, max_lat, min_lon + 360, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+BOX_SQL = '''
+    SELECT user_id, min_lat, min_lon FROM profile_locations
+    WHERE min_lat >= :min_lat AND max_lat <= :max_lat AND min_lon >= :min_lon AND max_lon <= :max_lon
+    ORDER BY (min_lat - :lat) * (min_lat - :lat) + (min_lon - :lon) * (min_lon - :lon) * :lon_scale
+    LIMIT :limit
+'''
+
+def _box_params(box, latitude, longitude, limit):
+    """BOX_SQL parameters; the reference longitude is moved by 360 degrees
+    for the far half of a box split at the antimeridian"""
+    min_lat, max_lat, min_lon, max_lon = box
+    if longitude < min_lon:
+        longitude += 360
+    elif longitude > max_lon:
+        longitude -= 360
+    return {
+        "min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon,
+        "lat": latitude, "lon": longitude,
+        "lon_scale": math.cos(math.radians(latitude)) ** 2,
+        "limit": limit
+    }
+
+NEARBY_RESULTS_SQL = '''
+    SELECT p.user_id, p.username, u.full_name, p.organization_name, p.location,
+           p.profile_image, p.profile_url, p.geohash
+    FROM profiles p JOIN users u ON u.id = p.user_id
+    WHERE p.user_id IN ({placeholders})
+'''
+
+def nearest_profiles(conn, latitude, longitude, k=DEFAULT_K, radius_km=DEFAULT_RADIUS_KM, exclude_user_id=None):
+    """The k profiles nearest a point within radius_km, closest first.
+
+    Probes the R*Tree with boxes of growing radius until k profiles fall
+    inside the circle (everything closer than the radius is inside the box)
+    or the radius limit is reached. Each box reads only the nearest
+    k * BOX_CANDIDATES_PER_RESULT rows, so a dense city costs a bounded read.
+    """
+    search_km = min(INITIAL_RADIUS_KM, radius_km)
+    # One extra row in case the excluded user is among the nearest
+    limit = k * BOX_CANDIDATES_PER_RESULT + 1
+    while True:
+        hits = {}
+        for box in _boxes(latitude, longitude, search_km):
+            for user_id, lat, lon in conn.execute(BOX_SQL, _box_params(box, latitude, longitude, limit)):
+                if user_id == exclude_user_id:
+                    continue
+                distance = haversine_km(latitude, longitude, lat, lon)
+                if distance <= search_km:
+                    hits[user_id] = distance
+        if len(hits) >= k or search_km >= radius_km:
+            break
+        search_km = min(search_km * 4, radius_km)
+
+    nearest = sorted(hits.items(), key=lambda hit: (hit[1], hit[0]))[:k]
+    if not nearest:
+        return []
+    user_ids = [user_id for user_id, _ in nearest]
+    rows = conn.execute(
+        NEARBY_RESULTS_SQL.format(placeholders=', '.join('?' * len(user_ids))), user_ids
+    ).fetchall()
+    by_id = {row['user_id']: dict(row) for row in rows}
+    results = []
+    for user_id, distance in nearest:
+        if user_id in by_id:
+            results.append({**by_id[user_id], "distance_km": round(distance, 1)})
+    return results
+
+def main(argv=None):
+    """Command line entry point: python geo.py backfill (re-geocode every profile)"""
+    import argparse
+    from config import Config
+    from database import database
+
+    parser = argparse.ArgumentParser(description="Geocode profile locations for nearby search")
+    parser.add_argument('command', choices=['backfill'])
+    parser.parse_args(argv)
+
+    configure(Config.GAZETTEER_PATH)
+    database.init_database()
+    gazetteer = get_gazetteer()
+    conn = database.get_connection()
+    try:
+        resolved = backfill_locations(conn, gazetteer)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Geocoded {resolved} profile locations")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing pool already has its maximum queued work"""
+    pass
+
+class HashingPool:
+    """Bounded executor for password hashing and verification.
+
+    bcrypt/pbkdf2 take hundreds of milliseconds of CPU, so they run here
+    instead of on the event loop or request threads. At most ``max_workers``
+    hashes run at once and ``max_queue`` more may wait; anything beyond that is
+    rejected with HashingPoolSaturated so callers can answer 429.
+    ``kind="process"`` uses worker processes, in which case the submitted
+    function must be importable at module level.
+    """
+
+    def __init__(self, max_workers=2, max_queue=16, kind='thread'):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.kind = kind
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='password-hash'
+                )
+        return self._executor
+
+    def _done(self, started, future):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+
+    def submit(self, fn, *args):
+        """Queue fn(*args), raising HashingPoolSaturated when the pool is full"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise HashingPoolSaturated("Password hashing capacity exceeded")
+            self._in_flight += 1
+            executor = self._get_executor()
+        started = time.perf_counter()
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(lambda f: self._done(started, f))
+        return future
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and block the calling thread for the result"""
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        """Run fn(*args) on the pool without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def metrics(self):
+        """Return concurrency, queue depth and latency counters"""
+        with self._lock:
+            finished = self._completed + self._failed
+            avg_ms = (self._latency_total / finished * 1000.0) if finished else 0.0
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "latency_avg_ms": round(avg_ms, 3),
+                "latency_max_ms": round(self._latency_max * 1000.0, 3)
+            }
@@ -0,0 +1,360 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Profile images: uploaded bytes are stored once in a content-addressed blob
+# store (sha256 of the original) and profiles only keep the short URL. Resized
+# and WebP variants are rendered in the background; until they exist the
+# original is served in their place.
+
+# name -> longest edge in pixels (None keeps the original size)
+VARIANTS = {
+    'thumb': 128,
+    'medium': 512,
+    'full': None
+}
+
+CONTENT_TYPES = {
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+IMAGE_URL_PREFIX = '/api/images/'
+
+# Anything longer than this in profile_image is inline data, not a reference
+MAX_REFERENCE_LENGTH = 512
+
+CHUNK_SIZE = 64 * 1024
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+_DATA_URI_RE = re.compile(r'^data:image/[a-z0-9.+-]+;base64,', re.IGNORECASE)
+
+class ImageError(ValueError):
+    """Raised for uploads that are not a supported image or are too large"""
+    pass
+
+def sniff_format(data):
+    """Identify the image format from its magic bytes"""
+    if data[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+def is_valid_digest(digest):
+    return bool(_DIGEST_RE.match(digest or ''))
+
+def image_url(digest):
+    return IMAGE_URL_PREFIX + digest
+
+def variant_urls(digest):
+    """URLs for every variant of an image, as returned to clients"""
+    url = image_url(digest)
+    urls = {"original": url}
+    for name in VARIANTS:
+        urls[name] = f"{url}?size={name}"
+    return urls
+
+def decode_data_uri(value):
+    """Return the bytes of a base64 image data URI, or None if value is not one"""
+    if not isinstance(value, str) or not _DATA_URI_RE.match(value):
+        return None
+    try:
+        return base64.b64decode(value.split(',', 1)[1], validate=True)
+    except (binascii.Error, ValueError):
+        raise ImageError("profile_image is not valid base64")
+
+class ImageStore:
+    """Content-addressed blob store on the local filesystem.
+
+    Files live under ``root/ab/cd/<digest>`` with variants next to the original
+    as ``<digest>.<variant>.<format>``. Writes go through a temporary file and
+    an atomic rename, so readers never see a partial image and identical
+    uploads are stored once.
+    """
+
+    def __init__(self, root, max_bytes=5 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _dir(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4])
+
+    def original_path(self, digest):
+        return os.path.join(self._dir(digest), digest)
+
+    def variant_path(self, digest, variant, fmt):
+        return os.path.join(self._dir(digest), f"{digest}.{variant}.{fmt}")
+
+    def exists(self, digest):
+        return is_valid_digest(digest) and os.path.exists(self.original_path(digest))
+
+    def put(self, data):
+        """Store image bytes and return (digest, format)"""
+        if len(data) > self.max_bytes:
+            raise ImageError(f"Image cannot exceed {self.max_bytes // 1024} KB")
+        fmt = sniff_format(data)
+        if fmt is None:
+            raise ImageError("Image must be JPEG, PNG, GIF or WebP")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.original_path(digest)
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+        return digest, fmt
+
+    def put_stream(self, stream):
+        """Store an upload read from a file-like object without exceeding max_bytes"""
+        data = stream.read(self.max_bytes + 1)
+        return self.put(data)
+
+    def _write_atomic(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def resolve(self, digest, variant=None, webp=False):
+        """Pick the file to serve, falling back to the original.
+
+        Returns (path, content_type, etag) or None if the image is unknown.
+        """
+        if not self.exists(digest):
+            return None
+        if variant in VARIANTS:
+            formats = ('webp',) if webp else ()
+            formats += (self.variant_format(digest),)
+            for fmt in formats:
+                path = self.variant_path(digest, variant, fmt)
+                if os.path.exists(path):
+                    return path, CONTENT_TYPES[fmt], f"{digest}-{variant}-{fmt}"
+        path = self.original_path(digest)
+        with open(path, 'rb') as f:
+            fmt = sniff_format(f.read(16))
+        return path, CONTENT_TYPES.get(fmt, 'application/octet-stream'), digest
+
+    def variant_format(self, digest):
+        # Non-WebP variants are JPEG unless the original may carry transparency
+        with open(self.original_path(digest), 'rb') as f:
+            fmt = sniff_format(f.read(16))
+        return 'jpeg' if fmt == 'jpeg' else 'png'
+
+def render_variants(store, digest):
+    """Render every size in VARIANTS as WebP plus JPEG/PNG (requires Pillow)"""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        logger.warning("Pillow is not installed; serving original images only")
+        return False
+
+    fallback = store.variant_format(digest)
+    with Image.open(store.original_path(digest)) as source:
+        source = ImageOps.exif_transpose(source)
+        for variant, edge in VARIANTS.items():
+            image = source.copy()
+            if edge:
+                image.thumbnail((edge, edge))
+            for fmt in ('webp', fallback):
+                path = store.variant_path(digest, variant, fmt)
+                if os.path.exists(path):
+                    continue
+                out = image
+                if fmt == 'jpeg' and out.mode not in ('RGB', 'L'):
+                    out = out.convert('RGB')
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.variant-')
+                os.close(fd)
+                try:
+                    out.save(tmp_path, format=fmt.upper(), quality=82)
+                    os.replace(tmp_path, path)
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.unlink(tmp_path)
+                    raise
+    return True
+
+class VariantPipeline:
+    """Background worker pool that renders image variants after upload.
+
+    Each digest is rendered at most once at a time; requests for a digest that
+    is already queued are ignored.
+    """
+
+    def __init__(self, store, max_workers=2):
+        self.store = store
+        self.max_workers = max(1, int(max_workers))
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.rendered = 0
+        self.failed = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='image-variants'
+            )
+        return self._executor
+
+    def submit(self, digest):
+        with self._lock:
+            if digest in self._pending:
+                return
+            self._pending.add(digest)
+            executor = self._get_executor()
+        executor.submit(self._render, digest)
+
+    def _render(self, digest):
+        try:
+            rendered = render_variants(self.store, digest)
+            failed = False
+        except Exception:
+            logger.exception("Failed to render variants for image %s", digest)
+            rendered, failed = False, True
+        with self._lock:
+            self._pending.discard(digest)
+            if rendered:
+                self.rendered += 1
+            elif failed:
+                self.failed += 1
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "pending": len(self._pending),
+                "rendered": self.rendered,
+                "failed": self.failed
+            }
+
+def store_profile_image(store, pipeline, value):
+    """Normalize an incoming profile_image value to a short reference.
+
+    Inline data URIs from older clients are moved into the blob store and
+    replaced by their URL; other values must be short references.
+    """
+    if not value:
+        return None
+    data = decode_data_uri(value)
+    if data is not None:
+        digest, _ = store.put(data)
+        pipeline.submit(digest)
+        return image_url(digest)
+    if len(value) > MAX_REFERENCE_LENGTH:
+        raise ImageError("profile_image must be an image URL; upload image bytes to /api/profile/image")
+    return value
+
+def parse_range(header, size):
+    """Parse a single-range ``bytes=`` header into inclusive (start, end).
+
+    Returns None when there is no usable range (serve the whole file) and
+    raises ImageError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ImageError("Requested range not satisfiable")
+    return start, end
+
+def iter_file(path, start=0, end=None, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of path from start to end (inclusive) in chunks"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = (end - start + 1) if end is not None else None
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+def migrate_inline_images(conn, store, pipeline=None):
+    """Move data-URI profile images already in SQLite into the blob store"""
+    rows = conn.execute(
+        "SELECT user_id, profile_image FROM profiles WHERE profile_image LIKE 'data:%'"
+    ).fetchall()
+    moved = 0
+    for user_id, value in rows:
+        try:
+            data = decode_data_uri(value)
+            if data is None:
+                continue
+            digest, _ = store.put(data)
+        except ImageError as e:
+            logger.warning("Skipping profile image for user %s: %s", user_id, e)
+            continue
+        conn.execute(
+            'UPDATE profiles SET profile_image = ?, version = version + 1 WHERE user_id = ?',
+            (image_url(digest), user_id)
+        )
+        if pipeline is not None:
+            pipeline.submit(digest)
+        else:
+            render_variants(store, digest)
+        moved += 1
+    conn.commit()
+    return moved
+
+def main(argv=None):
+    """Command line entry point: python images.py migrate"""
+    import argparse
+    from config import Config
+    from database import database
+
+    parser = argparse.ArgumentParser(description="Move inline profile images into the blob store")
+    parser.add_argument('command', choices=['migrate'])
+    parser.parse_args(argv)
+
+    database.init_database()
+    store = ImageStore(Config.IMAGE_STORE_PATH, Config.IMAGE_MAX_BYTES)
+    conn = database.get_connection()
+    try:
+        moved = migrate_inline_images(conn, store)
+    finally:
+        conn.close()
+    print(f"Moved {moved} inline profile images")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
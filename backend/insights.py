@@ -0,0 +1,148 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from analytics import EVENT_TYPES, TIMESTAMP_FORMAT
+from queries import LINK_FIELDS
+
+# Pre-aggregated insights: hourly and daily counters per user, event type and
+# link field, bumped incrementally by each analytics flush. Reading a range
+# costs one row per (bucket, event type, link field) instead of one per event.
+
+GRANULARITIES = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+DEFAULT_RANGE = {
+    'hour': timedelta(hours=48),
+    'day': timedelta(days=30)
+}
+
+MAX_BUCKETS = 24 * 93
+
+ROLLUPS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS event_rollups (
+        user_id INTEGER NOT NULL,
+        granularity TEXT NOT NULL,
+        bucket_start TIMESTAMP NOT NULL,
+        event_type TEXT NOT NULL,
+        link_field TEXT NOT NULL DEFAULT '',
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, granularity, bucket_start, event_type, link_field)
+    ) WITHOUT ROWID
+'''
+
+def bucket_start(moment, granularity):
+    """Floor an aware datetime to the start of its hour or day (UTC)"""
+    moment = moment.astimezone(timezone.utc)
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def rollup_counts(rows):
+    """Aggregate (user_id, event) pairs into per-bucket increments"""
+    counts = Counter()
+    for user_id, event in rows:
+        for granularity in GRANULARITIES:
+            key = (
+                user_id,
+                granularity,
+                bucket_start(event['occurred_at'], granularity),
+                event['type'],
+                event['link_field'] or ''
+            )
+            counts[key] += 1
+    return counts
+
+def write_rollups(conn, rows):
+    """Upsert rollup increments for a flushed batch (same transaction as the events)"""
+    counts = rollup_counts(rows)
+    conn.executemany('''
+        INSERT INTO event_rollups (user_id, granularity, bucket_start, event_type, link_field, count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, granularity, bucket_start, event_type, link_field)
+        DO UPDATE SET count = count + excluded.count
+    ''', [
+        (user_id, granularity, start.strftime(TIMESTAMP_FORMAT), event_type, link_field, count)
+        for (user_id, granularity, start, event_type, link_field), count in counts.items()
+    ])
+
+def _parse_bound(value):
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def resolve_range(granularity, start=None, end=None):
+    """Validate query parameters and return (granularity, start, end) bucket bounds.
+
+    ``end`` is exclusive. Raises ValueError with a client-facing message.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    step = GRANULARITIES[granularity]
+    try:
+        end_dt = _parse_bound(end) or datetime.now(timezone.utc)
+        start_dt = _parse_bound(start) or end_dt - DEFAULT_RANGE[granularity]
+    except ValueError:
+        raise ValueError("start and end must be ISO 8601 timestamps")
+    start_dt = bucket_start(start_dt, granularity)
+    end_dt = bucket_start(end_dt, granularity) + step
+    if start_dt >= end_dt:
+        raise ValueError("start must be before end")
+    if (end_dt - start_dt) / step > MAX_BUCKETS:
+        raise ValueError(f"Range cannot exceed {MAX_BUCKETS} buckets")
+    return granularity, start_dt, end_dt
+
+def assemble_insights(rows, granularity, start, end):
+    """Build the response from (bucket_start, event_type, link_field, count) rows.
+
+    Every bucket in the range is present, zero-filled where nothing happened.
+    """
+    step = GRANULARITIES[granularity]
+    buckets = {}
+    moment = start
+    while moment < end:
+        buckets[moment] = {event_type: 0 for event_type in EVENT_TYPES}
+        moment += step
+
+    totals = {event_type: 0 for event_type in EVENT_TYPES}
+    links = {field: 0 for field in LINK_FIELDS}
+    for bucket, event_type, link_field, count in rows:
+        if isinstance(bucket, str):
+            bucket = datetime.strptime(bucket, TIMESTAMP_FORMAT)
+        bucket = bucket.replace(tzinfo=timezone.utc)
+        if bucket in buckets and event_type in totals:
+            buckets[bucket][event_type] += count
+        if event_type in totals:
+            totals[event_type] += count
+        if event_type == 'link_click' and link_field in links:
+            links[link_field] += count
+
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "buckets": [
+            {"start": moment.isoformat(), **counts}
+            for moment, counts in buckets.items()
+        ],
+        "totals": totals,
+        "links": links
+    }
+
+def query_insights(conn, user_id, granularity, start, end):
+    """Read rollups for a user over [start, end) with one index range scan"""
+    rows = conn.execute('''
+        SELECT bucket_start, event_type, link_field, count
+        FROM event_rollups
+        WHERE user_id = ? AND granularity = ? AND bucket_start >= ? AND bucket_start < ?
+    ''', (
+        user_id, granularity,
+        start.strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT)
+    )).fetchall()
+    return assemble_insights(
+        [(row[0], row[1], row[2], row[3]) for row in rows],
+        granularity, start, end
+    )
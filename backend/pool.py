@@ -0,0 +1,214 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes free within the pool wait time"""
+    pass
+
+class PooledConnection:
+    """sqlite3 connection wrapper whose close() hands the connection back to the pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._depth = 0
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def close(self):
+        """Release the connection back to the pool"""
+        self._pool.release(self)
+
+class ConnectionPool:
+    """Thread-safe SQLite connection pool with per-thread reuse.
+
+    Connections are opened once with WAL journaling and tuned pragmas and are
+    then handed out again instead of being reconnected for every request.  A
+    thread that asks for a connection while it already holds one gets the same
+    connection back, so nested helpers share a single transaction.
+    """
+
+    def __init__(self, db_path, max_size=8, timeout=5.0, busy_timeout_ms=5000,
+                 cache_size_kb=16384, mmap_size=268435456):
+        self.db_path = db_path
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+
+        self._idle = deque()
+        self._created = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._closed = False
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _connect(self):
+        """Open a new connection and apply pragmas"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA cache_size = -{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        return conn
+
+    def acquire(self):
+        """Check out a connection, reusing the one already held by this thread"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            held._depth += 1
+            return held
+
+        started = time.perf_counter()
+        waited = False
+        conn = None
+        with self._cond:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._created < self.max_size:
+                    self._created += 1
+                    break
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available within {self.timeout}s"
+                    )
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_time_total += elapsed
+            self._wait_time_max = max(self._wait_time_max, elapsed)
+
+        pooled = PooledConnection(self, conn)
+        pooled._depth = 1
+        self._local.conn = pooled
+        return pooled
+
+    def release(self, pooled):
+        """Return a connection to the pool once the outermost holder closes it"""
+        if pooled._released:
+            return
+        pooled._depth -= 1
+        if pooled._depth > 0:
+            return
+        pooled._released = True
+        if getattr(self._local, 'conn', None) is pooled:
+            self._local.conn = None
+
+        conn = pooled._conn
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken connection, drop it instead of recycling
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return
+
+        with self._cond:
+            if self._closed:
+                self._created -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def release_thread(self):
+        """Return the calling thread's connection even if a handler forgot to close it"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            held._depth = 1
+            self.release(held)
+
+    def close_all(self):
+        """Close idle connections and stop handing out new ones"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._created -= 1
+            self._cond.notify_all()
+
+    def metrics(self):
+        """Return pool size, wait time and checkout latency counters"""
+        with self._cond:
+            idle = len(self._idle)
+            checkouts = self._checkouts
+            avg_ms = (self._wait_time_total / checkouts * 1000.0) if checkouts else 0.0
+            return {
+                "max_size": self.max_size,
+                "open": self._created,
+                "idle": idle,
+                "in_use": self._created - idle,
+                "checkouts": checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "checkout_latency_avg_ms": round(avg_ms, 3),
+                "checkout_latency_max_ms": round(self._wait_time_max * 1000.0, 3),
+                "wait_timeout_seconds": self.timeout
+            }
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path, **options):
+    """Get (or lazily create) the shared pool for a database file"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path, **options)
+            _pools[db_path] = pool
+        return pool
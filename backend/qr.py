@@ -0,0 +1,647 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+# QR codes for profile URLs, rendered server-side so every client scans the
+# same code. The encoder is pure Python (byte mode, versions 1-40, all four
+# error-correction levels); rendered SVG/PNG bytes are cached on disk under
+# a hash of (content, parameters), so a code is drawn once and then served
+# from the file with immutable cache headers.
+
+FORMATS = ('svg', 'png')
+CONTENT_TYPES = {'svg': 'image/svg+xml', 'png': 'image/png'}
+
+ERROR_CORRECTION_LEVELS = ('L', 'M', 'Q', 'H')
+
+DEFAULT_SIZE = 512
+MIN_SIZE = 64
+MAX_SIZE = 2048
+DEFAULT_ERROR_CORRECTION = 'M'
+DEFAULT_BORDER = 4
+MAX_BORDER = 16
+
+MIN_VERSION = 1
+MAX_VERSION = 40
+
+# Per level (L, M, Q, H), indexed by version: error-correction codewords per
+# block and number of blocks (ISO/IEC 18004 table 9)
+ECC_CODEWORDS_PER_BLOCK = (
+    (None, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28,
+     28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (None, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+     26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    (None, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30,
+     28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (None, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28,
+     30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30)
+)
+
+NUM_ERROR_CORRECTION_BLOCKS = (
+    (None, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8,
+     8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    (None, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+     17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    (None, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20,
+     23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    (None, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25,
+     25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81)
+)
+
+# Two format-information bits per level, as drawn into the symbol
+_FORMAT_BITS = {'L': 1, 'M': 0, 'Q': 3, 'H': 2}
+
+_MASKS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0
+)
+
+class QrError(ValueError):
+    """Raised for content that does not fit a QR code or invalid parameters"""
+    pass
+
+# GF(256) arithmetic for Reed-Solomon, modulo x^8 + x^4 + x^3 + x^2 + 1
+_EXP = [0] * 512
+_LOG = [0] * 256
+_value = 1
+for _i in range(255):
+    _EXP[_i] = _value
+    _LOG[_value] = _i
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+
+def _gf_multiply(x, y):
+    if x == 0 or y == 0:
+        return 0
+    return _EXP[_LOG[x] + _LOG[y]]
+
+def rs_generator(degree):
+    """Coefficients of the Reed-Solomon generator polynomial, highest power first (leading 1 dropped)"""
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = _gf_multiply(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _gf_multiply(root, 0x02)
+    return result
+
+def rs_remainder(data, generator):
+    """Error-correction codewords for data"""
+    result = [0] * len(generator)
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        if factor:
+            for i, coefficient in enumerate(generator):
+                result[i] ^= _gf_multiply(coefficient, factor)
+    return result
+
+def _raw_data_modules(version):
+    """Modules available for data and error correction in a version"""
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        num_align = version // 7 + 2
+        result -= (25 * num_align - 10) * num_align - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+def data_codewords(version, level):
+    index = ERROR_CORRECTION_LEVELS.index(level)
+    return (_raw_data_modules(version) // 8
+            - ECC_CODEWORDS_PER_BLOCK[index][version] * NUM_ERROR_CORRECTION_BLOCKS[index][version])
+
+def alignment_positions(version):
+    """Row/column centres of the alignment patterns"""
+    if version == 1:
+        return []
+    num_align = version // 7 + 2
+    step = 26 if version == 32 else (version * 4 + num_align * 2 + 1) // (num_align * 2 - 2) * 2
+    size = version * 4 + 17
+    positions = [size - 7 - i * step for i in range(num_align - 1)]
+    return [6] + positions[::-1]
+
+def format_bits(level, mask):
+    """15 format-information bits: level and mask with BCH error correction"""
+    data = _FORMAT_BITS[level] << 3 | mask
+    remainder = data
+    for _ in range(10):
+        remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+    return (data << 10 | remainder) ^ 0x5412
+
+def version_bits(version):
+    """18 version-information bits (versions 7 and up)"""
+    remainder = version
+    for _ in range(12):
+        remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+    return version << 12 | remainder
+
+def _bit(value, index):
+    return (value >> index) & 1 != 0
+
+class QrCode:
+    """An encoded symbol: ``modules[y][x]`` is True for dark modules"""
+
+    def __init__(self, version, level, mask, modules):
+        self.version = version
+        self.level = level
+        self.mask = mask
+        self.modules = modules
+
+    @property
+    def size(self):
+        return len(self.modules)
+
+class _Builder:
+    def __init__(self, version, level):
+        self.version = version
+        self.level = level
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.function = [[False] * self.size for _ in range(self.size)]
+
+    def set_function(self, x, y, dark):
+        self.modules[y][x] = dark
+        self.function[y][x] = True
+
+    def draw_function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self.set_function(6, i, i % 2 == 0)
+            self.set_function(i, 6, i % 2 == 0)
+        for x, y in ((3, 3), (size - 4, 3), (3, size - 4)):
+            self.draw_finder(x, y)
+        positions = alignment_positions(self.version)
+        last = len(positions) - 1
+        for i, x in enumerate(positions):
+            for j, y in enumerate(positions):
+                if (i, j) not in ((0, 0), (0, last), (last, 0)):
+                    self.draw_alignment(x, y)
+        # Reserve the format areas now; the real bits go in once a mask is chosen
+        self.draw_format(0)
+        self.draw_version()
+
+    def draw_finder(self, cx, cy):
+        for dy in range(-4, 5):
+            for dx in range(-4, 5):
+                x, y = cx + dx, cy + dy
+                if 0 <= x < self.size and 0 <= y < self.size:
+                    self.set_function(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+
+    def draw_alignment(self, cx, cy):
+        for dy in range(-2, 3):
+            for dx in range(-2, 3):
+                self.set_function(cx + dx, cy + dy, max(abs(dx), abs(dy)) != 1)
+
+    def draw_format(self, mask):
+        bits = format_bits(self.level, mask)
+        size = self.size
+        for i in range(6):
+            self.set_function(8, i, _bit(bits, i))
+        self.set_function(8, 7, _bit(bits, 6))
+        self.set_function(8, 8, _bit(bits, 7))
+        self.set_function(7, 8, _bit(bits, 8))
+        for i in range(9, 15):
+            self.set_function(14 - i, 8, _bit(bits, i))
+        for i in range(8):
+            self.set_function(size - 1 - i, 8, _bit(bits, i))
+        for i in range(8, 15):
+            self.set_function(8, size - 15 + i, _bit(bits, i))
+        self.set_function(8, size - 8, True)
+
+    def draw_version(self):
+        if self.version < 7:
+            return
+        bits = version_bits(self.version)
+        for i in range(18):
+            a = self.size - 11 + i % 3
+            b = i // 3
+            self.set_function(a, b, _bit(bits, i))
+            self.set_function(b, a, _bit(bits, i))
+
+    def place_codewords(self, codewords):
+        size = self.size
+        total_bits = len(codewords) * 8
+        i = 0
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            upward = (right + 1) & 2 == 0
+            for vertical in range(size):
+                y = size - 1 - vertical if upward else vertical
+                for x in (right, right - 1):
+                    if not self.function[y][x] and i < total_bits:
+                        self.modules[y][x] = _bit(codewords[i >> 3], 7 - (i & 7))
+                        i += 1
+            right -= 2
+
+    def apply_mask(self, mask):
+        test = _MASKS[mask]
+        for y in range(self.size):
+            row = self.modules[y]
+            function = self.function[y]
+            for x in range(self.size):
+                if not function[x] and test(x, y):
+                    row[x] = not row[x]
+
+def _interleave(data, version, level):
+    """Split data into blocks, append error correction and interleave"""
+    index = ERROR_CORRECTION_LEVELS.index(level)
+    num_blocks = NUM_ERROR_CORRECTION_BLOCKS[index][version]
+    ecc_length = ECC_CODEWORDS_PER_BLOCK[index][version]
+    raw_codewords = _raw_data_modules(version) // 8
+    num_short = num_blocks - raw_codewords % num_blocks
+    short_length = raw_codewords // num_blocks
+    generator = rs_generator(ecc_length)
+
+    blocks = []
+    offset = 0
+    for i in range(num_blocks):
+        length = short_length - ecc_length + (0 if i < num_short else 1)
+        block = list(data[offset:offset + length])
+        offset += length
+        ecc = rs_remainder(block, generator)
+        if i < num_short:
+            block.append(None)
+        blocks.append(block + ecc)
+
+    result = []
+    for i in range(len(blocks[0])):
+        for block in blocks:
+            if block[i] is not None:
+                result.append(block[i])
+    return result
+
+def _penalty(modules):
+    """ISO/IEC 18004 mask penalty: runs, 2x2 blocks, finder-like patterns and balance"""
+    size = len(modules)
+    score = 0
+    lines = [''.join('1' if dark else '0' for dark in row) for row in modules]
+    columns = [''.join(line[x] for line in lines) for x in range(size)]
+    for line in lines + columns:
+        run_color, run_length = None, 0
+        for ch in line:
+            if ch == run_color:
+                run_length += 1
+            else:
+                if run_length >= 5:
+                    score += run_length - 2
+                run_color, run_length = ch, 1
+        if run_length >= 5:
+            score += run_length - 2
+        padded = '0000' + line + '0000'
+        score += 40 * (padded.count('10111010000') + padded.count('00001011101'))
+    for y in range(size - 1):
+        row, below = modules[y], modules[y + 1]
+        for x in range(size - 1):
+            if row[x] == row[x + 1] == below[x] == below[x + 1]:
+                score += 3
+    dark = sum(line.count('1') for line in lines)
+    total = size * size
+    score += 10 * (abs(dark * 20 - total * 10) // total)
+    return score
+
+def encode(text, level=DEFAULT_ERROR_CORRECTION, min_version=MIN_VERSION):
+    """Encode text (UTF-8, byte mode) in the smallest version that fits"""
+    if level not in ERROR_CORRECTION_LEVELS:
+        raise QrError(f"Error correction must be one of {', '.join(ERROR_CORRECTION_LEVELS)}")
+    data = text.encode('utf-8')
+    for version in range(min_version, MAX_VERSION + 1):
+        count_bits = 8 if version < 10 else 16
+        capacity_bits = data_codewords(version, level) * 8
+        if 4 + count_bits + len(data) * 8 <= capacity_bits and len(data) < (1 << count_bits):
+            break
+    else:
+        raise QrError("Content is too long for a QR code")
+
+    bits = [0, 1, 0, 0]
+    bits += [(len(data) >> i) & 1 for i in reversed(range(count_bits))]
+    for byte in data:
+        bits += [(byte >> i) & 1 for i in reversed(range(8))]
+    bits += [0] * min(4, capacity_bits - len(bits))
+    bits += [0] * (-len(bits) % 8)
+    codewords = [int(''.join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(codewords) < capacity_bits // 8:
+        codewords.append(pad)
+        pad ^= 0xEC ^ 0x11
+
+    builder = _Builder(version, level)
+    builder.draw_function_patterns()
+    builder.place_codewords(_interleave(codewords, version, level))
+
+    best_mask, best_score = 0, None
+    for mask in range(len(_MASKS)):
+        builder.apply_mask(mask)
+        builder.draw_format(mask)
+        score = _penalty(builder.modules)
+        if best_score is None or score < best_score:
+            best_mask, best_score = mask, score
+        builder.apply_mask(mask)  # XOR again to undo
+    builder.apply_mask(best_mask)
+    builder.draw_format(best_mask)
+    return QrCode(version, level, best_mask, builder.modules)
+
+def to_svg(code, size=DEFAULT_SIZE, border=DEFAULT_BORDER):
+    """Render as an SVG with one path of horizontal runs, size pixels square"""
+    dimension = code.size + 2 * border
+    parts = []
+    for y, row in enumerate(code.modules):
+        x = 0
+        while x < code.size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < code.size and row[x]:
+                x += 1
+            parts.append(f"M{start + border},{y + border}h{x - start}v1h-{x - start}z")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {dimension} {dimension}" '
+        f'width="{size}" height="{size}" shape-rendering="crispEdges">'
+        '<rect width="100%" height="100%" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(parts)}"/></svg>\n'
+    ).encode('utf-8')
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+def to_png(code, size=DEFAULT_SIZE, border=DEFAULT_BORDER):
+    """Render as a 1-bit grayscale PNG.
+
+    Modules are whole pixels, so the image is the largest multiple of the
+    symbol width that fits in size (never smaller than one pixel per module).
+    """
+    dimension = code.size + 2 * border
+    scale = max(1, size // dimension)
+    width = dimension * scale
+    light_row = b'\x00' + _pack_row([True] * width)
+    raw = []
+    for _ in range(border * scale):
+        raw.append(light_row)
+    for row in code.modules:
+        pixels = [True] * (border * scale)
+        for dark in row:
+            pixels.extend([not dark] * scale)
+        pixels.extend([True] * (border * scale))
+        raw.extend([b'\x00' + _pack_row(pixels)] * scale)
+    for _ in range(border * scale):
+        raw.append(light_row)
+    header = struct.pack('>IIBBBBB', width, width, 1, 0, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header)
+            + _png_chunk(b'IDAT', zlib.compress(b''.join(raw), 9)) + _png_chunk(b'IEND', b''))
+
+def _pack_row(pixels):
+    bits = ''.join('1' if light else '0' for light in pixels)
+    bits += '0' * (-len(bits) % 8)
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+def parse_params(fmt, size=None, level=None, border=None):
+    """Validate query parameters into (fmt, size, level, border); raises QrError"""
+    if fmt not in FORMATS:
+        raise QrError(f"Format must be one of {', '.join(FORMATS)}")
+    try:
+        size = int(size) if size not in (None, '') else DEFAULT_SIZE
+        border = int(border) if border not in (None, '') else DEFAULT_BORDER
+    except (TypeError, ValueError):
+        raise QrError("size and border must be integers")
+    level = (level or DEFAULT_ERROR_CORRECTION).upper()
+    if level not in ERROR_CORRECTION_LEVELS:
+        raise QrError(f"ecc must be one of {', '.join(ERROR_CORRECTION_LEVELS)}")
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise QrError(f"size must be between {MIN_SIZE} and {MAX_SIZE}")
+    if not 0 <= border <= MAX_BORDER:
+        raise QrError(f"border must be between 0 and {MAX_BORDER}")
+    return fmt, size, level, border
+
+def profile_link(profile_url):
+    """What the code encodes: the profile URL with a scheme so phones open it"""
+    if profile_url.startswith(('http://', 'https://')):
+        return profile_url
+    return 'https://' + profile_url
+
+def render(content, fmt, size=DEFAULT_SIZE, level=DEFAULT_ERROR_CORRECTION, border=DEFAULT_BORDER):
+    code = encode(content, level)
+    return to_svg(code, size, border) if fmt == 'svg' else to_png(code, size, border)
+
+def cache_key(content, fmt, size, level, border):
+    """Content address of one rendering"""
+    return hashlib.sha256(json.dumps([content, fmt, size, level, border]).encode('utf-8')).hexdigest()
+
+class QrCache:
+    """Rendered codes on disk, evicted least recently used past ``max_bytes``.
+
+    Files live under ``root/ab/<key>.<fmt>`` and are written atomically. A
+    hit refreshes the file's mtime, which eviction orders by, so recency is
+    shared by every worker using the same directory and survives restarts.
+    """
+
+    def __init__(self, root, max_bytes=64 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key, fmt):
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    def get(self, key, fmt):
+        path = self.path(key, fmt)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, fmt, data):
+        path = self.path(key, fmt)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.qr-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        with self._lock:
+            if self._total is None:
+                self._total = self._disk_usage()
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        files = []
+        if not os.path.isdir(self.root):
+            return files
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        # Rescan so files written by other workers count, then drop the least
+        # recently used down to 90% of the budget
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._total = total
+
+    def get_or_render(self, content, fmt, size, level, border):
+        """Return (bytes, key), rendering and storing on a miss"""
+        key = cache_key(content, fmt, size, level, border)
+        data = self.get(key, fmt)
+        if data is None:
+            data = render(content, fmt, size, level, border)
+            self.put(key, fmt, data)
+        return data, key
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes": self._total,
+                "max_bytes": self.max_bytes
+            }
+
+ROSTER_SQL = '''
+    SELECT username, profile_url FROM profiles
+    WHERE organization_name = ? COLLATE NOCASE
+    ORDER BY username
+'''
+
+# Below this many uncached codes a roster renders inline, without a pool
+MIN_POOL_RENDERS = 16
+
+def _render_many(jobs):
+    return [render(*job) for job in jobs]
+
+def render_roster(members, cache, fmt, size, level, border, workers=None, chunk_size=32):
+    """Render codes for (username, profile_url) pairs; returns [(username, bytes)].
+
+    Cached codes are read from disk; the rest are rendered across a process
+    pool in chunks and written back to the cache.
+    """
+    results = {}
+    missing = []
+    for username, profile_url in members:
+        content = profile_link(profile_url)
+        key = cache_key(content, fmt, size, level, border)
+        data = cache.get(key, fmt)
+        if data is None:
+            missing.append((username, key, (content, fmt, size, level, border)))
+        else:
+            results[username] = data
+
+    jobs = [job for _, _, job in missing]
+    if len(missing) < MIN_POOL_RENDERS:
+        rendered = _render_many(jobs)
+    else:
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            rendered = [data for chunk in pool.map(_render_many, chunks) for data in chunk]
+    for (username, key, _), data in zip(missing, rendered):
+        cache.put(key, fmt, data)
+        results[username] = data
+    return [(username, results[username]) for username, _ in members]
+
+def write_roster_zip(fileobj, codes, fmt):
+    """Write [(username, bytes)] as <username>.<fmt> entries of a ZIP archive"""
+    # PNG is already deflated; SVG compresses well
+    compression = zipfile.ZIP_DEFLATED if fmt == 'svg' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(fileobj, 'w', compression) as archive:
+        for username, data in codes:
+            archive.writestr(f"{username}.{fmt}", data)
+
+def main(argv=None):
+    """Command line entry point: python qr.py roster "<organization>" --output codes.zip"""
+    import argparse
+    from config import Config
+    from database import database
+
+    parser = argparse.ArgumentParser(description="Render QR codes for an organization's profiles")
+    parser.add_argument('command', choices=['roster'])
+    parser.add_argument('organization')
+    parser.add_argument('--format', choices=FORMATS, default='svg')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE)
+    parser.add_argument('--ecc', choices=ERROR_CORRECTION_LEVELS, default=DEFAULT_ERROR_CORRECTION)
+    parser.add_argument('--border', type=int, default=DEFAULT_BORDER)
+    parser.add_argument('--workers', type=int, default=None, help="Render processes (default: QR_WORKERS or one per CPU)")
+    parser.add_argument('--output', required=True, help="ZIP file to write")
+    args = parser.parse_args(argv)
+
+    try:
+        fmt, size, level, border = parse_params(args.format, args.size, args.ecc, args.border)
+    except QrError as e:
+        parser.error(str(e))
+    database.init_database()
+    conn = database.get_connection()
+    try:
+        members = [tuple(row) for row in conn.execute(ROSTER_SQL, (args.organization,))]
+    finally:
+        conn.close()
+    cache = QrCache(Config.QR_CACHE_PATH, Config.QR_CACHE_MAX_BYTES)
+    codes = render_roster(members, cache, fmt, size, level, border, args.workers or Config.QR_WORKERS)
+    with open(args.output, 'wb') as f:
+        write_roster_zip(f, codes, fmt)
+    print(f"Rendered {len(codes)} QR codes to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
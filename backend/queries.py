@@ -0,0 +1,278 @@
+from geo import LOCATION_FIELDS
+
+# Joined read paths for the card endpoints: each lookup fetches the user,
+# profile and links rows in a single LEFT JOIN and projects only the columns
+# the API responses return. The save paths below are single-statement upserts.
+
+PROFILE_COLUMNS = (
+    'id', 'user_id', 'username', 'organization_name', 'bio', 'location',
+    'profile_image', 'profile_url', 'created_at', 'updated_at'
+)
+
+LINK_FIELDS = (
+    'website', 'email', 'phone', 'whatsapp', 'instagram', 'twitter',
+    'linkedin', 'facebook', 'youtube', 'tiktok', 'github', 'discord'
+)
+
+LINKS_COLUMNS = ('id', 'user_id') + LINK_FIELDS + ('created_at', 'updated_at')
+
+PROFILE_FIELDS = (
+    'username', 'organization_name', 'bio', 'location', 'profile_image', 'profile_url'
+)
+
+USER_COLUMNS = (
+    'id', 'full_name', 'email', 'phone_number', 'is_profile_complete', 'created_at'
+)
+
+PUBLIC_USER_COLUMNS = ('full_name', 'email')
+
+def _select_list(alias, prefix, columns):
+    return ', '.join(f'{alias}.{col} AS {prefix}{col}' for col in columns)
+
+def _split(row, prefix, columns, key_column='id'):
+    """Pull one table's columns back out of a joined row"""
+    if row[f'{prefix}{key_column}'] is None:
+        return None
+    return {col: row[f'{prefix}{col}'] for col in columns}
+
+CARD_SELECT = f'''
+    SELECT {_select_list('p', 'p_', PROFILE_COLUMNS)},
+           u.id AS u_id, {_select_list('u', 'u_', PUBLIC_USER_COLUMNS)},
+           {_select_list('l', 'l_', LINKS_COLUMNS)}
+    FROM profiles p
+    LEFT JOIN users u ON u.id = p.user_id
+    LEFT JOIN links l ON l.user_id = p.user_id
+'''
+
+CARD_BY_USERNAME_SQL = CARD_SELECT + '''
+    WHERE p.username = ?
+'''
+
+COMPLETE_USER_SQL = f'''
+    SELECT {_select_list('u', 'u_', USER_COLUMNS)},
+           {_select_list('p', 'p_', PROFILE_COLUMNS)},
+           {_select_list('l', 'l_', LINKS_COLUMNS)}
+    FROM users u
+    LEFT JOIN profiles p ON p.user_id = u.id
+    LEFT JOIN links l ON l.user_id = u.id
+    WHERE u.id = ?
+'''
+
+def _card(row):
+    return {
+        "profile": _split(row, 'p_', PROFILE_COLUMNS),
+        "user": _split(row, 'u_', PUBLIC_USER_COLUMNS, key_column='id'),
+        "links": _split(row, 'l_', LINKS_COLUMNS)
+    }
+
+def fetch_card_by_username(conn, username):
+    """Fetch profile, public user fields and links for a username in one query.
+
+    Returns None when no profile exists; the "user" entry is None when the
+    profile points at a missing user.
+    """
+    row = conn.execute(CARD_BY_USERNAME_SQL, (username,)).fetchone()
+    if not row:
+        return None
+    return _card(row)
+
+def fetch_cards(conn, usernames=(), user_ids=()):
+    """Fetch many cards with a single IN query over usernames and/or user ids.
+
+    Returns a list of cards (same shape as fetch_card_by_username) for the
+    profiles that exist; callers map them back to what was asked for.
+    """
+    clauses = []
+    params = []
+    if usernames:
+        clauses.append(f"p.username IN ({', '.join('?' * len(usernames))})")
+        params.extend(usernames)
+    if user_ids:
+        clauses.append(f"p.user_id IN ({', '.join('?' * len(user_ids))})")
+        params.extend(user_ids)
+    if not clauses:
+        return []
+    rows = conn.execute(CARD_SELECT + ' WHERE ' + ' OR '.join(clauses), params).fetchall()
+    return [_card(row) for row in rows]
+
+def iter_cards(conn, batch_size=500):
+    """Yield every card in user_id order, one keyset page per query"""
+    after = 0
+    while True:
+        rows = conn.execute(
+            CARD_SELECT + ' WHERE p.user_id > ? ORDER BY p.user_id LIMIT ?', (after, batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield [_card(row) for row in rows]
+        after = rows[-1]['p_user_id']
+
+def fetch_complete_user(conn, user_id):
+    """Fetch user, profile and links for a user id in one query"""
+    row = conn.execute(COMPLETE_USER_SQL, (user_id,)).fetchone()
+    if not row:
+        return None
+    return {
+        "user": _split(row, 'u_', USER_COLUMNS),
+        "profile": _split(row, 'p_', PROFILE_COLUMNS),
+        "links": _split(row, 'l_', LINKS_COLUMNS)
+    }
+
+# Validators for conditional GETs: version counters and updated_at only, so
+# answering "has this card changed?" never reads the card itself
+
+VERSIONS_SELECT = '''
+    SELECT p.user_id AS p_user_id, u.id AS u_id, u.is_profile_complete AS u_state,
+           p.version AS p_version, p.updated_at AS p_updated_at,
+           l.version AS l_version, l.updated_at AS l_updated_at
+'''
+
+VERSIONS_BY_USER_ID_SQL = VERSIONS_SELECT + '''
+    FROM users u
+    LEFT JOIN profiles p ON p.user_id = u.id
+    LEFT JOIN links l ON l.user_id = u.id
+    WHERE u.id = ?
+'''
+
+VERSIONS_BY_USERNAME_SQL = VERSIONS_SELECT + '''
+    FROM profiles p
+    LEFT JOIN users u ON u.id = p.user_id
+    LEFT JOIN links l ON l.user_id = p.user_id
+    WHERE p.username = ?
+'''
+
+def _versions(row):
+    if not row:
+        return None
+    return {
+        "user_id": row['u_id'] if row['u_id'] is not None else row['p_user_id'],
+        "user": (bool(row['u_state']), None) if row['u_id'] is not None else None,
+        "profile": (row['p_version'], row['p_updated_at']) if row['p_version'] is not None else None,
+        "links": (row['l_version'], row['l_updated_at']) if row['l_version'] is not None else None
+    }
+
+def fetch_versions_by_user_id(conn, user_id):
+    """Version/updated_at of a user's profile and links rows, or None if no user"""
+    return _versions(conn.execute(VERSIONS_BY_USER_ID_SQL, (user_id,)).fetchone())
+
+def fetch_versions_by_username(conn, username):
+    """Version/updated_at of the rows behind a username's card, or None if no profile"""
+    return _versions(conn.execute(VERSIONS_BY_USERNAME_SQL, (username,)).fetchone())
+
+def _upsert_sql(table, fields):
+    """INSERT ... ON CONFLICT(user_id) DO UPDATE returning the row's new version.
+
+    A fresh row starts at version 1 and every update bumps it, so version 1
+    means the statement inserted. RETURNING needs SQLite 3.35+.
+    """
+    columns = ', '.join(('user_id',) + fields)
+    placeholders = ', '.join('?' * (len(fields) + 1))
+    updates = ',\n            '.join(f'{field} = excluded.{field}' for field in fields)
+    return f'''
+        INSERT INTO {table} ({columns})
+        VALUES ({placeholders})
+        ON CONFLICT (user_id) DO UPDATE SET
+            {updates},
+            updated_at = CURRENT_TIMESTAMP,
+            version = version + 1
+        RETURNING version
+    '''
+
+UPSERT_LINKS_SQL = _upsert_sql('links', LINK_FIELDS)
+
+UPSERT_PROFILE_SQL = _upsert_sql('profiles', PROFILE_FIELDS + LOCATION_FIELDS)
+
+MARK_PROFILE_COMPLETE_SQL = 'UPDATE users SET is_profile_complete = TRUE WHERE id = ?'
+
+def upsert_links(conn, user_id, values):
+    """Insert or replace a user's links in one statement; True if inserted.
+
+    A missing user fails the foreign key with sqlite3.IntegrityError.
+    """
+    row = conn.execute(
+        UPSERT_LINKS_SQL, (user_id,) + tuple(values.get(field) for field in LINK_FIELDS)
+    ).fetchone()
+    return row[0] == 1
+
+def upsert_profile(conn, user_id, values):
+    """Insert or replace a profile and mark the user complete in one transaction.
+
+    Returns True if the profile was inserted, False if updated, or None if
+    the user does not exist. A username owned by another user raises
+    sqlite3.IntegrityError from the profiles.username UNIQUE constraint.
+    """
+    if conn.execute(MARK_PROFILE_COMPLETE_SQL, (user_id,)).rowcount == 0:
+        return None
+    row = conn.execute(
+        UPSERT_PROFILE_SQL,
+        (user_id,) + tuple(values[field] for field in PROFILE_FIELDS)
+        + tuple(values.get(field) for field in LOCATION_FIELDS)
+    ).fetchone()
+    return row[0] == 1
+
+# Partial updates: only the columns a PATCH sends are written, and an
+# expected version turns the write into a compare-and-set, so an edit is one
+# small statement with no read before it
+
+PATCHABLE_PROFILE_FIELDS = ('username', 'organization_name', 'bio', 'location', 'profile_image')
+
+def _assignments(changes):
+    return ''.join(f'{column} = ?, ' for column in changes)
+
+def fetch_row_version(conn, table, user_id):
+    """Current version of a user's profiles/links row, or None if it does not exist"""
+    row = conn.execute(f'SELECT version FROM {table} WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] if row else None
+
+def patch_links(conn, user_id, changes, expected_version=None):
+    """Write only the given link columns, creating the row if needed.
+
+    With expected_version the row is only updated, never created, so a
+    missing row and a stale version both return None; otherwise the new
+    version is returned. A missing user fails the foreign key with
+    sqlite3.IntegrityError.
+    """
+    columns = [column for column in LINK_FIELDS if column in changes]
+    if expected_version is not None:
+        sql = f'''
+            UPDATE links SET {_assignments(columns)}updated_at = CURRENT_TIMESTAMP,
+            version = version + 1
+            WHERE user_id = ? AND version = ?
+        '''
+        params = [changes[column] for column in columns] + [user_id, expected_version]
+    else:
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns)
+        sql = f'''
+            INSERT INTO links (user_id, {', '.join(columns)})
+            VALUES (?{', ?' * len(columns)})
+            ON CONFLICT (user_id) DO UPDATE SET
+                {updates}, updated_at = CURRENT_TIMESTAMP, version = version + 1
+        '''
+        params = [user_id] + [changes[column] for column in columns]
+    row = conn.execute(sql + ' RETURNING version', params).fetchone()
+    return row[0] if row else None
+
+def patch_profile(conn, user_id, changes, expected_version=None):
+    """Write only the given profile columns (profile_url follows username,
+    and geocoded LOCATION_FIELDS may accompany location).
+
+    Returns the new version, or None when no row matched: either there is no
+    profile or expected_version no longer matches. A username owned by
+    another user raises sqlite3.IntegrityError.
+    """
+    changes = {
+        column: changes[column]
+        for column in PATCHABLE_PROFILE_FIELDS + LOCATION_FIELDS if column in changes
+    }
+    if 'username' in changes:
+        changes['profile_url'] = f"tapzx.app/{changes['username']}"
+    sql = f'''
+        UPDATE profiles SET {_assignments(changes)}updated_at = CURRENT_TIMESTAMP, version = version + 1
+        WHERE user_id = ?
+    '''
+    params = list(changes.values()) + [user_id]
+    if expected_version is not None:
+        sql += ' AND version = ?'
+        params.append(expected_version)
+    row = conn.execute(sql + ' RETURNING version', params).fetchone()
+    return row[0] if row else None
@@ -0,0 +1,368 @@
+import sqlite3
+from abc import ABC, abstractmethod
+import bloom
+import queries
+from utils import dict_from_row
+
+# Data access behind one interface per aggregate, so the Flask (SQLite) and
+# FastAPI (Mongo) apps go through the same operations with the same record
+# shapes. Each store implements the interfaces below: the SQLite classes here
+# on top of queries.py, the Mongo classes in app/repositories.py on top of
+# app/queries.py. Ids are the store's own (int rowids, ObjectId strings).
+#
+# User records are normalized across stores:
+#   {"id", "full_name", "email", "phone_number", "password_hash",
+#    "is_profile_complete", "created_at"}
+# Profile, links and card payloads keep the shapes each app already returns.
+
+USER_FIELDS = (
+    'id', 'full_name', 'email', 'phone_number', 'password_hash', 'is_profile_complete', 'created_at'
+)
+
+class RepositoryError(Exception):
+    """Base class for data-access errors callers are expected to handle"""
+    pass
+
+class DuplicateError(RepositoryError):
+    """A unique field (users.email, users.phone_number, profiles.username) is taken"""
+
+    def __init__(self, field):
+        super().__init__(f"{field} already exists")
+        self.field = field
+
+class NotFoundError(RepositoryError):
+    """A write referenced a user that does not exist"""
+    pass
+
+class UserRepository(ABC):
+    """Accounts and credentials"""
+
+    @abstractmethod
+    def get(self, user_id):
+        """User record, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_by_email(self, email):
+        """User record for a (lowercased) email, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_registered(self, field, value):
+        """Whether an email or phone_number is already in use"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create(self, full_name, email, phone_number, password_hash):
+        """Insert a user and return its id; raises DuplicateError"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Delete a user and everything that references them; False if there was no user"""
+        raise NotImplementedError
+
+class ProfileRepository(ABC):
+    """One profile per user, versioned for optimistic concurrency"""
+
+    @abstractmethod
+    def get(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_by_username(self, username):
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, user_id, values):
+        """Insert or replace a profile and mark the user complete.
+
+        Returns True if inserted, False if updated; raises NotFoundError for
+        an unknown user and DuplicateError for a taken username.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def patch(self, user_id, changes, expected_version=None):
+        """Write only the given fields; the new version, or None when no
+        profile matched (missing, or expected_version is stale)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def version(self, user_id):
+        """Current version, or None if there is no profile"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_image(self, user_id, url):
+        """Point a profile at an image URL; False if there is no profile"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Delete a profile and mark the user incomplete; False if there was none"""
+        raise NotImplementedError
+
+class LinksRepository(ABC):
+    """One links record per user, versioned for optimistic concurrency"""
+
+    @abstractmethod
+    def get(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, user_id, values):
+        """Insert or replace every link field; True if inserted. Raises
+        NotFoundError for an unknown user where the store can tell."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def patch(self, user_id, changes, expected_version=None):
+        """Write only the given fields, creating the record when no version is
+        given; the new version, or None when expected_version is given and
+        the record is missing or stale"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def version(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, user_id):
+        raise NotImplementedError
+
+class CardRepository(ABC):
+    """Joined user + profile + links reads and their version validators"""
+
+    @abstractmethod
+    def by_username(self, username):
+        """{"profile", "user", "links"} for a username, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def many(self, usernames=(), user_ids=()):
+        """Cards for whichever of the usernames/user ids exist, in one query"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete_user(self, user_id):
+        """{"user", "profile", "links"} for a user id, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def versions_by_user_id(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def versions_by_username(self, username):
+        raise NotImplementedError
+
+class Repositories:
+    """The four repositories of one store"""
+
+    def __init__(self, users, profiles, links, cards):
+        self.users = users
+        self.profiles = profiles
+        self.links = links
+        self.cards = cards
+
+# SQLite: every method checks out a pooled connection for one statement or
+# transaction and hands it back before returning
+
+class _SqliteRepository:
+    def __init__(self, get_connection):
+        self.get_connection = get_connection
+
+    def _read(self, fn, *args):
+        conn = self.get_connection()
+        try:
+            return fn(conn, *args)
+        finally:
+            conn.close()
+
+    def _write(self, fn, *args):
+        # The pool rolls back whatever a failed write left open
+        conn = self.get_connection()
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+def _username_conflict(error):
+    """DuplicateError for a profiles.username conflict; anything else is re-raised"""
+    if bloom.duplicate_field(error) != 'username':
+        raise error
+    return DuplicateError('username')
+
+def _missing_user(error, user_id):
+    """NotFoundError for a failed user_id foreign key; anything else is re-raised"""
+    if 'FOREIGN KEY constraint failed' not in str(error):
+        raise error
+    return NotFoundError(f"User {user_id} not found")
+
+def _user_record(row):
+    if not row:
+        return None
+    user = dict(row)
+    user['password_hash'] = user.pop('password')
+    user['is_profile_complete'] = bool(user['is_profile_complete'])
+    return {field: user[field] for field in USER_FIELDS}
+
+class SqliteUserRepository(_SqliteRepository, UserRepository):
+    REGISTERED_FIELDS = ('email', 'phone_number')
+
+    def get(self, user_id):
+        return self._read(lambda conn: _user_record(
+            conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+        ))
+
+    def get_by_email(self, email):
+        return self._read(lambda conn: _user_record(
+            conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+        ))
+
+    def exists(self, user_id):
+        return self._read(lambda conn: conn.execute(
+            'SELECT 1 FROM users WHERE id = ?', (user_id,)
+        ).fetchone() is not None)
+
+    def is_registered(self, field, value):
+        if field not in self.REGISTERED_FIELDS:
+            raise ValueError(f"Unknown field {field}")
+        return self._read(lambda conn: conn.execute(
+            f'SELECT 1 FROM users WHERE {field} = ?', (value,)
+        ).fetchone() is not None)
+
+    def create(self, full_name, email, phone_number, password_hash):
+        def insert(conn):
+            try:
+                return conn.execute(
+                    'INSERT INTO users (full_name, email, phone_number, password) VALUES (?, ?, ?, ?)',
+                    (full_name, email, phone_number, password_hash)
+                ).lastrowid
+            except sqlite3.IntegrityError as e:
+                field = bloom.duplicate_field(e)
+                if field is None:
+                    raise
+                raise DuplicateError(field)
+        return self._write(insert)
+
+    def delete(self, user_id):
+        def delete(conn):
+            conn.execute('DELETE FROM connections WHERE owner_id = ? OR target_user_id = ?', (user_id, user_id))
+            conn.execute('DELETE FROM events WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM event_rollups WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM visitor_sketches WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM links WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM profiles WHERE user_id = ?', (user_id,))
+            return conn.execute('DELETE FROM users WHERE id = ?', (user_id,)).rowcount > 0
+        return self._write(delete)
+
+class SqliteProfileRepository(_SqliteRepository, ProfileRepository):
+    def get(self, user_id):
+        return self._read(lambda conn: dict_from_row(
+            conn.execute('SELECT * FROM profiles WHERE user_id = ?', (user_id,)).fetchone()
+        ))
+
+    def get_by_username(self, username):
+        return self._read(lambda conn: dict_from_row(
+            conn.execute('SELECT * FROM profiles WHERE username = ?', (username,)).fetchone()
+        ))
+
+    def save(self, user_id, values):
+        def save(conn):
+            try:
+                created = queries.upsert_profile(conn, user_id, values)
+            except sqlite3.IntegrityError as e:
+                raise _username_conflict(e)
+            if created is None:
+                raise NotFoundError(f"User {user_id} not found")
+            return created
+        return self._write(save)
+
+    def patch(self, user_id, changes, expected_version=None):
+        def patch(conn):
+            try:
+                return queries.patch_profile(conn, user_id, changes, expected_version)
+            except sqlite3.IntegrityError as e:
+                raise _username_conflict(e)
+        return self._write(patch)
+
+    def version(self, user_id):
+        return self._read(queries.fetch_row_version, 'profiles', user_id)
+
+    def set_image(self, user_id, url):
+        return self._write(lambda conn: conn.execute('''
+            UPDATE profiles SET profile_image = ?, updated_at = CURRENT_TIMESTAMP,
+            version = version + 1
+            WHERE user_id = ?
+        ''', (url, user_id)).rowcount > 0)
+
+    def delete(self, user_id):
+        def delete(conn):
+            if conn.execute('DELETE FROM profiles WHERE user_id = ?', (user_id,)).rowcount == 0:
+                return False
+            conn.execute('UPDATE users SET is_profile_complete = FALSE WHERE id = ?', (user_id,))
+            return True
+        return self._write(delete)
+
+class SqliteLinksRepository(_SqliteRepository, LinksRepository):
+    def get(self, user_id):
+        return self._read(lambda conn: dict_from_row(
+            conn.execute('SELECT * FROM links WHERE user_id = ?', (user_id,)).fetchone()
+        ))
+
+    def save(self, user_id, values):
+        def save(conn):
+            try:
+                return queries.upsert_links(conn, user_id, values)
+            except sqlite3.IntegrityError as e:
+                raise _missing_user(e, user_id)
+        return self._write(save)
+
+    def patch(self, user_id, changes, expected_version=None):
+        def patch(conn):
+            try:
+                return queries.patch_links(conn, user_id, changes, expected_version)
+            except sqlite3.IntegrityError as e:
+                raise _missing_user(e, user_id)
+        return self._write(patch)
+
+    def version(self, user_id):
+        return self._read(queries.fetch_row_version, 'links', user_id)
+
+    def delete(self, user_id):
+        return self._write(lambda conn: conn.execute(
+            'DELETE FROM links WHERE user_id = ?', (user_id,)
+        ).rowcount > 0)
+
+class SqliteCardRepository(_SqliteRepository, CardRepository):
+    def by_username(self, username):
+        return self._read(queries.fetch_card_by_username, username)
+
+    def many(self, usernames=(), user_ids=()):
+        return self._read(queries.fetch_cards, usernames, user_ids)
+
+    def complete_user(self, user_id):
+        return self._read(queries.fetch_complete_user, user_id)
+
+    def versions_by_user_id(self, user_id):
+        return self._read(queries.fetch_versions_by_user_id, user_id)
+
+    def versions_by_username(self, username):
+        return self._read(queries.fetch_versions_by_username, username)
+
+def sqlite_repositories(get_connection):
+    """SQLite repositories sharing a connection source (usually the pool)"""
+    return Repositories(
+        SqliteUserRepository(get_connection),
+        SqliteProfileRepository(get_connection),
+        SqliteLinksRepository(get_connection),
+        SqliteCardRepository(get_connection)
+    )
@@ -0,0 +1,140 @@
+import re
+from utils import decode_cursor, keyset_condition, keyset_page, keyset_params
+
+# People search: an FTS5 index over each profile's username, owner's full
+# name, organization, location and bio, keyed by user_id and kept in step
+# with profiles and users by triggers. Queries match every term as a prefix
+# and rank with bm25, weighting names above organization, location and bio.
+
+# bm25 weights, in column order
+COLUMN_WEIGHTS = (
+    ('username', 10.0),
+    ('full_name', 8.0),
+    ('organization_name', 4.0),
+    ('location', 2.0),
+    ('bio', 1.0)
+)
+
+MAX_TERMS = 8
+MIN_QUERY_LENGTH = 2
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+SEARCH_TABLE_SQL = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS profiles_fts USING fts5 (
+        {', '.join(column for column, _ in COLUMN_WEIGHTS)},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+'''
+
+_INSERT_FROM_PROFILE = '''
+        INSERT INTO profiles_fts (rowid, username, full_name, organization_name, location, bio)
+        SELECT new.user_id, new.username, u.full_name, new.organization_name, new.location, new.bio
+        FROM users u WHERE u.id = new.user_id;
+'''
+
+SEARCH_TRIGGERS_SQL = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS profiles_fts_insert AFTER INSERT ON profiles BEGIN
+        {_INSERT_FROM_PROFILE}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS profiles_fts_update
+    AFTER UPDATE OF user_id, username, organization_name, location, bio ON profiles BEGIN
+        DELETE FROM profiles_fts WHERE rowid = old.user_id;
+        {_INSERT_FROM_PROFILE}
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS profiles_fts_delete AFTER DELETE ON profiles BEGIN
+        DELETE FROM profiles_fts WHERE rowid = old.user_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF full_name ON users BEGIN
+        UPDATE profiles_fts SET full_name = new.full_name WHERE rowid = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        DELETE FROM profiles_fts WHERE rowid = old.id;
+    END
+    '''
+)
+
+REBUILD_SQL = '''
+    INSERT INTO profiles_fts (rowid, username, full_name, organization_name, location, bio)
+    SELECT p.user_id, p.username, u.full_name, p.organization_name, p.location, p.bio
+    FROM profiles p JOIN users u ON u.id = p.user_id
+'''
+
+def init_search(conn):
+    """Create the index and triggers, filling the index when it is new"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profiles_fts'"
+    ).fetchone()
+    conn.execute(SEARCH_TABLE_SQL)
+    for trigger_sql in SEARCH_TRIGGERS_SQL:
+        conn.execute(trigger_sql)
+    if not exists:
+        conn.execute(REBUILD_SQL)
+
+def query_terms(q):
+    """Split a search box value into lowercase terms; raises ValueError if unusable"""
+    terms = [term.lower() for term in _TERM_RE.findall(q or '')][:MAX_TERMS]
+    if not terms or sum(len(term) for term in terms) < MIN_QUERY_LENGTH:
+        raise ValueError(f"q must contain at least {MIN_QUERY_LENGTH} letters or digits")
+    return terms
+
+def match_expression(terms):
+    # Quoted so user input is never parsed as FTS5 syntax; every term a prefix
+    return ' '.join(f'"{term}"*' for term in terms)
+
+_BM25 = f"bm25(profiles_fts, {', '.join(str(weight) for _, weight in COLUMN_WEIGHTS)})"
+
+SEARCH_SQL = f'''
+    SELECT user_id, score FROM (
+        SELECT rowid AS user_id, {_BM25} AS score
+        FROM profiles_fts WHERE profiles_fts MATCH ?
+    )
+'''
+
+RESULTS_SQL = '''
+    SELECT p.user_id, p.username, u.full_name, p.organization_name, p.location,
+           p.profile_image, p.profile_url
+    FROM profiles p JOIN users u ON u.id = p.user_id
+    WHERE p.user_id IN ({placeholders})
+'''
+
+def search_profiles(conn, q, limit, secret, cursor=None):
+    """One page of profiles matching q, best first, plus the next cursor.
+
+    bm25 scores are lower for better matches, so pages run in ascending
+    (score, user_id) order. The cursor is bound to the normalized terms.
+    """
+    terms = query_terms(q)
+    scope = 'search:' + ' '.join(terms)
+    sql = SEARCH_SQL
+    params = [match_expression(terms)]
+    if cursor:
+        score, user_id = decode_cursor(cursor, secret, scope)
+        sql += ' WHERE ' + keyset_condition('score', 'user_id', descending=False)
+        params.extend(keyset_params(score, user_id))
+    sql += ' ORDER BY score, user_id LIMIT ?'
+    params.append(limit + 1)
+
+    hits = conn.execute(sql, params).fetchall()
+    page, next_cursor = keyset_page(
+        hits, limit, lambda hit: (hit['score'], hit['user_id']), secret, scope
+    )
+    if not page:
+        return [], None
+
+    user_ids = [hit['user_id'] for hit in page]
+    rows = conn.execute(
+        RESULTS_SQL.format(placeholders=', '.join('?' * len(user_ids))), user_ids
+    ).fetchall()
+    by_id = {row['user_id']: dict(row) for row in rows}
+    return [by_id[user_id] for user_id in user_ids if user_id in by_id], next_cursor
@@ -0,0 +1,203 @@
+import hashlib
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from analytics import EVENT_TYPES
+from queries import LINK_FIELDS
+
+# Unique visitors: one HyperLogLog sketch per (user, day, event type, link
+# field), updated by each analytics flush. A sketch answers "how many distinct
+# visitor ids" within ~1.6% using at most 4 KB, and sketches for a week or a
+# month are merged register by register at query time.
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+
+# Serialized layout: version byte, precision byte, then either sparse
+# (index hi, index lo, rank) triples or all registers, whichever is smaller
+FORMAT_VERSION = 1
+_SPARSE = 0
+_DENSE = 1
+
+PERIODS = {
+    'day': 1,
+    'week': 7,
+    'month': 30
+}
+
+MAX_DAYS = 366
+
+SKETCHES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS visitor_sketches (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        event_type TEXT NOT NULL,
+        link_field TEXT NOT NULL DEFAULT '',
+        sketch BLOB NOT NULL,
+        PRIMARY KEY (user_id, day, event_type, link_field)
+    ) WITHOUT ROWID
+'''
+
+def _hash64(value):
+    # Stable across processes, unlike hash()
+    digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+class HyperLogLog:
+    """Fixed-size cardinality sketch with mergeable registers"""
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers is not None else bytearray(REGISTERS)
+
+    def add(self, value):
+        hashed = _hash64(value)
+        index = hashed >> (64 - PRECISION)
+        remainder = hashed & ((1 << (64 - PRECISION)) - 1)
+        rank = (64 - PRECISION) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Fold another sketch into this one (union of the two visitor sets)"""
+        registers = self.registers
+        for index, rank in enumerate(other.registers):
+            if rank > registers[index]:
+                registers[index] = rank
+        return self
+
+    def count(self):
+        m = REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is far more accurate for small sets
+            return round(m * math.log(m / zeros))
+        return round(estimate)
+
+    def to_bytes(self):
+        used = [(index, rank) for index, rank in enumerate(self.registers) if rank]
+        if len(used) * 3 < REGISTERS:
+            body = bytearray()
+            for index, rank in used:
+                body += bytes((index >> 8, index & 0xFF, rank))
+            return bytes((FORMAT_VERSION, PRECISION, _SPARSE)) + bytes(body)
+        return bytes((FORMAT_VERSION, PRECISION, _DENSE)) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data:
+            return cls()
+        version, precision, encoding = data[0], data[1], data[2]
+        if version != FORMAT_VERSION or precision != PRECISION:
+            raise ValueError("Unsupported sketch format")
+        if encoding == _DENSE:
+            return cls(data[3:3 + REGISTERS])
+        sketch = cls()
+        body = data[3:]
+        for offset in range(0, len(body) - 2, 3):
+            sketch.registers[(body[offset] << 8) | body[offset + 1]] = body[offset + 2]
+        return sketch
+
+def day_key(moment):
+    """UTC calendar day of an aware datetime as YYYY-MM-DD"""
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%d')
+
+def sketch_updates(rows):
+    """Group visitor ids from (user_id, event) pairs by sketch key.
+
+    Events without a visitor_id cannot be deduplicated and are left out.
+    """
+    updates = defaultdict(set)
+    for user_id, event in rows:
+        if not event.get('visitor_id'):
+            continue
+        key = (user_id, day_key(event['occurred_at']), event['type'], event['link_field'] or '')
+        updates[key].add(event['visitor_id'])
+    return updates
+
+def write_sketches(conn, rows):
+    """Fold a flushed batch's visitor ids into the stored daily sketches.
+
+    Runs inside the flush transaction after the events insert, which already
+    holds SQLite's write lock, so the read-modify-write cannot interleave with
+    another writer.
+    """
+    for key, visitors in sketch_updates(rows).items():
+        existing = conn.execute('''
+            SELECT sketch FROM visitor_sketches
+            WHERE user_id = ? AND day = ? AND event_type = ? AND link_field = ?
+        ''', key).fetchone()
+        sketch = HyperLogLog.from_bytes(existing[0] if existing else None)
+        for visitor_id in visitors:
+            sketch.add(visitor_id)
+        conn.execute('''
+            INSERT INTO visitor_sketches (user_id, day, event_type, link_field, sketch)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, day, event_type, link_field)
+            DO UPDATE SET sketch = excluded.sketch
+        ''', key + (sketch.to_bytes(),))
+
+def resolve_days(period=None, start=None, end=None):
+    """Validate query parameters and return inclusive (first_day, last_day) dates.
+
+    ``period`` (day/week/month) counts back from ``end`` (default today) and
+    is ignored when ``start`` is given. Raises ValueError with a client-facing
+    message.
+    """
+    try:
+        last = datetime.fromisoformat(end.strip()[:10]).date() if end else datetime.now(timezone.utc).date()
+        first = datetime.fromisoformat(start.strip()[:10]).date() if start else None
+    except ValueError:
+        raise ValueError("start and end must be ISO 8601 dates")
+    if first is None:
+        period = period or 'week'
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of: {', '.join(PERIODS)}")
+        first = last - timedelta(days=PERIODS[period] - 1)
+    if first > last:
+        raise ValueError("start must not be after end")
+    if (last - first).days + 1 > MAX_DAYS:
+        raise ValueError(f"Range cannot exceed {MAX_DAYS} days")
+    return first, last
+
+def assemble_unique(rows, first, last):
+    """Merge (event_type, link_field, sketch bytes) rows into unique counts"""
+    merged = {}
+    for event_type, link_field, data in rows:
+        key = (event_type, link_field or '')
+        sketch = HyperLogLog.from_bytes(data)
+        if key in merged:
+            merged[key].merge(sketch)
+        else:
+            merged[key] = sketch
+
+    unique = {event_type: 0 for event_type in EVENT_TYPES}
+    links = {field: 0 for field in LINK_FIELDS}
+    clickers = None
+    for (event_type, link_field), sketch in merged.items():
+        if event_type == 'link_click':
+            if link_field in links:
+                links[link_field] = sketch.count()
+            # Per-link sketches merge into "anyone who clicked any link"
+            clickers = HyperLogLog(sketch.registers) if clickers is None else clickers.merge(sketch)
+        elif event_type in unique:
+            unique[event_type] = sketch.count()
+    if clickers is not None:
+        unique['link_click'] = clickers.count()
+
+    return {
+        "start": first.isoformat(),
+        "end": last.isoformat(),
+        "unique": unique,
+        "links": links
+    }
+
+def query_unique(conn, user_id, first, last):
+    """Merge a user's daily sketches over [first, last] into unique counts"""
+    rows = conn.execute('''
+        SELECT event_type, link_field, sketch
+        FROM visitor_sketches
+        WHERE user_id = ? AND day >= ? AND day <= ?
+    ''', (user_id, first.isoformat(), last.isoformat())).fetchall()
+    return assemble_unique([(row[0], row[1], row[2]) for row in rows], first, last)
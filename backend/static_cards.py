@@ -0,0 +1,404 @@
+import gzip
+import html
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from string import Template
+from images import IMAGE_URL_PREFIX
+from queries import LINK_FIELDS, PUBLIC_USER_COLUMNS, fetch_cards, iter_cards
+
+logger = logging.getLogger(__name__)
+
+# Static card pages: every public card is also written to a directory as
+# <username>/index.html plus <username>/card.json (profile, public user fields
+# and links), each with precompressed .gz and .br siblings, so
+# tapzx.app/{username} can be served by any static file server (nginx
+# gzip_static/brotli_static, a CDN bucket) without Python in the path. Pages
+# are re-rendered in the background after profile/links writes; a full
+# parallel rebuild picks up template changes.
+
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'card.html')
+
+# user_id -> published username, used to drop the old page after a rename
+OWNERS_DIR = '.owners'
+
+# Same rule as profile usernames, so a page name can never escape the root
+_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_-]{3,30}$')
+
+# Handles stored in links become URLs with these prefixes
+LINK_PREFIXES = {
+    'instagram': 'https://instagram.com/',
+    'twitter': 'https://twitter.com/',
+    'linkedin': 'https://www.linkedin.com/in/',
+    'facebook': 'https://facebook.com/',
+    'youtube': 'https://youtube.com/@',
+    'tiktok': 'https://www.tiktok.com/@',
+    'github': 'https://github.com/'
+}
+
+LINK_LABELS = {
+    'website': 'Website', 'email': 'Email', 'phone': 'Phone', 'whatsapp': 'WhatsApp',
+    'instagram': 'Instagram', 'twitter': 'Twitter', 'linkedin': 'LinkedIn',
+    'facebook': 'Facebook', 'youtube': 'YouTube', 'tiktok': 'TikTok',
+    'github': 'GitHub', 'discord': 'Discord'
+}
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def card_snapshot(card):
+    """The JSON written beside each page: profile, public user fields and links"""
+    user = card['user'] or {}
+    return {
+        "profile": card['profile'],
+        "user": {column: user.get(column) for column in PUBLIC_USER_COLUMNS},
+        "links": card['links']
+    }
+
+def link_href(field, value):
+    """Where a links value points, or None when it is shown as text only"""
+    value = value.strip()
+    if field == 'email':
+        return 'mailto:' + value
+    if field == 'phone':
+        return 'tel:' + re.sub(r'[^\d+]', '', value)
+    if field == 'whatsapp':
+        return 'https://wa.me/' + re.sub(r'\D', '', value)
+    if re.match(r'^https?://', value, re.IGNORECASE):
+        return value
+    if field == 'website':
+        return 'https://' + value
+    if field in LINK_PREFIXES:
+        return LINK_PREFIXES[field] + value.lstrip('@')
+    return None
+
+def _links_html(links):
+    items = []
+    for field in LINK_FIELDS:
+        value = (links or {}).get(field)
+        if not value:
+            continue
+        label = f"{LINK_LABELS[field]}: {value}" if field == 'discord' else LINK_LABELS[field]
+        href = link_href(field, value)
+        if href:
+            items.append(f'<li><a href="{html.escape(href)}" rel="me noopener">{html.escape(label)}</a></li>')
+        else:
+            items.append(f'<li><span>{html.escape(label)}</span></li>')
+    return '\n'.join(items)
+
+def _image_url(profile_image):
+    if profile_image and profile_image.startswith(IMAGE_URL_PREFIX):
+        return profile_image + '?size=medium'
+    return profile_image or ''
+
+def _script_json(data):
+    # Safe inside <script>: no "</script>" or "<!--" can appear
+    return data.replace('<', '\\u003c')
+
+class StaticCardWriter:
+    """Renders cards into ``root/<username>/`` with atomic, change-only writes"""
+
+    def __init__(self, root, template_path=None):
+        self.root = root
+        self.template_path = template_path or DEFAULT_TEMPLATE_PATH
+        with open(self.template_path, encoding='utf-8') as f:
+            self.template = Template(f.read())
+
+    def page_dir(self, username):
+        if not _USERNAME_RE.match(username or ''):
+            raise ValueError(f"Cannot publish a page for username {username!r}")
+        return os.path.join(self.root, username)
+
+    def _owner_path(self, user_id):
+        return os.path.join(self.root, OWNERS_DIR, str(user_id))
+
+    def render(self, card):
+        """Return {file name: bytes} for a card"""
+        snapshot = card_snapshot(card)
+        card_json = json.dumps(snapshot, default=str, separators=(',', ':'))
+        profile, user = snapshot['profile'], snapshot['user']
+        name = user['full_name'] or profile['username']
+        image = _image_url(profile.get('profile_image'))
+        page = self.template.safe_substitute(
+            title=html.escape(f"{name} | Tapzx"),
+            description=html.escape(' '.join((profile.get('bio') or '').split()[:40])),
+            image=html.escape(image),
+            avatar=f'<img class="avatar" src="{html.escape(image)}" alt="">' if image else '',
+            name=html.escape(name),
+            organization=html.escape(profile.get('organization_name') or ''),
+            location=html.escape(profile.get('location') or ''),
+            bio=html.escape(profile.get('bio') or ''),
+            links=_links_html(snapshot['links']),
+            card_json=_script_json(card_json)
+        )
+        return {'index.html': page.encode('utf-8'), 'card.json': card_json.encode('utf-8')}
+
+    def write(self, card):
+        """Write a card's files and compressed variants; returns whether anything changed"""
+        directory = self.page_dir(card['profile']['username'])
+        os.makedirs(directory, exist_ok=True)
+        changed = False
+        for name, data in self.render(card).items():
+            path = os.path.join(directory, name)
+            if _read(path) == data:
+                continue
+            # Compressed variants first, so a fresh page never pairs with a stale .gz
+            _write_atomic(path + '.gz', gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                _write_atomic(path + '.br', brotli.compress(data))
+            _write_atomic(path, data)
+            changed = True
+        return changed
+
+    def remove(self, username, user_id=None):
+        """Delete a page, only if it still belongs to user_id when one is given"""
+        try:
+            directory = self.page_dir(username)
+        except ValueError:
+            return False
+        if user_id is not None and str(self._page_owner(directory)) != str(user_id):
+            return False
+        shutil.rmtree(directory, ignore_errors=True)
+        return True
+
+    def _page_owner(self, directory):
+        data = _read(os.path.join(directory, 'card.json'))
+        if data is None:
+            return None
+        try:
+            return json.loads(data)['profile']['user_id']
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def publish(self, user_id, card):
+        """Bring one user's page in line with their current card (None removes it)"""
+        owner_path = self._owner_path(user_id)
+        previous = (_read(owner_path) or b'').decode('utf-8') or None
+        if card is None or card['user'] is None:
+            removed = bool(previous) and self.remove(previous, user_id)
+            if os.path.exists(owner_path):
+                os.unlink(owner_path)
+            return removed
+        username = card['profile']['username']
+        changed = self.write(card)
+        if previous != username:
+            if previous:
+                self.remove(previous, user_id)
+            _write_atomic(owner_path, username.encode('utf-8'))
+        return changed
+
+    def published(self):
+        """(user_id, username) pairs for every published page"""
+        owners_dir = os.path.join(self.root, OWNERS_DIR)
+        if not os.path.isdir(owners_dir):
+            return []
+        pairs = []
+        for user_id in os.listdir(owners_dir):
+            if user_id.startswith('.'):
+                continue
+            username = (_read(os.path.join(owners_dir, user_id)) or b'').decode('utf-8')
+            pairs.append((user_id, username))
+        return pairs
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.page-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def sqlite_card_loader(get_connection):
+    """Card loader for StaticCardPublisher backed by pooled SQLite connections"""
+    def load(user_id):
+        conn = get_connection()
+        try:
+            cards = fetch_cards(conn, user_ids=[user_id])
+        finally:
+            conn.close()
+        return cards[0] if cards else None
+    return load
+
+class StaticCardPublisher:
+    """Background worker pool that re-renders a user's page after a write.
+
+    ``load_card(user_id)`` returns the current card or None. A user already
+    queued is not queued again; one whose page is being rendered is rendered
+    once more afterwards, so the last write always wins. With no writer
+    (static pages disabled) submit does nothing.
+    """
+
+    def __init__(self, writer, load_card, max_workers=1):
+        self.writer = writer
+        self.load_card = load_card
+        self.max_workers = max(1, int(max_workers))
+        self._executor = None
+        self._queued = set()
+        self._running = set()
+        self._rerun = set()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.rendered = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    @property
+    def enabled(self):
+        return self.writer is not None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='static-cards'
+            )
+        return self._executor
+
+    def submit(self, user_id):
+        if self.writer is None:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            if user_id in self._queued:
+                return
+            if user_id in self._running:
+                self._rerun.add(user_id)
+                return
+            self._queued.add(user_id)
+            executor = self._get_executor()
+        executor.submit(self._render, user_id)
+
+    def _render(self, user_id):
+        with self._lock:
+            self._queued.discard(user_id)
+            self._running.add(user_id)
+        changed = failed = False
+        try:
+            changed = self.writer.publish(user_id, self.load_card(user_id))
+        except Exception:
+            logger.exception("Failed to publish static card for user %s", user_id)
+            failed = True
+        with self._lock:
+            self._running.discard(user_id)
+            again = user_id in self._rerun
+            self._rerun.discard(user_id)
+            if failed:
+                self.failed += 1
+            elif changed:
+                self.rendered += 1
+            else:
+                self.unchanged += 1
+        if again:
+            self.submit(user_id)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "enabled": self.writer is not None,
+                "workers": self.max_workers,
+                "pending": len(self._queued) + len(self._rerun),
+                "rendered": self.rendered,
+                "unchanged": self.unchanged,
+                "failed": self.failed
+            }
+
+_worker_writer = None
+
+def _init_worker(root, template_path):
+    global _worker_writer
+    _worker_writer = StaticCardWriter(root, template_path)
+
+def _publish_batch(cards):
+    written = 0
+    for card in cards:
+        if _worker_writer.publish(card['profile']['user_id'], card):
+            written += 1
+    return written
+
+def rebuild(conn, writer, workers=None, batch_size=500):
+    """Re-render every card across a process pool and prune pages with no card.
+
+    Returns (written, removed). Unchanged pages are compared and skipped, so a
+    rebuild without a template change is mostly reads.
+    """
+    workers = workers or os.cpu_count() or 1
+    seen = set()
+    written = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(writer.root, writer.template_path)
+    ) as pool:
+        # A couple of batches per process in flight keeps memory flat
+        pending = deque()
+        for cards in iter_cards(conn, batch_size):
+            cards = [card for card in cards if card['user'] is not None]
+            seen.update(str(card['profile']['user_id']) for card in cards)
+            pending.append(pool.submit(_publish_batch, cards))
+            if len(pending) >= 2 * workers:
+                written += pending.popleft().result()
+        while pending:
+            written += pending.popleft().result()
+
+    removed = 0
+    for user_id, _ in writer.published():
+        if user_id not in seen:
+            writer.publish(user_id, None)
+            removed += 1
+    return written, removed
+
+def main(argv=None):
+    """Command line entry point: python static_cards.py rebuild [--workers N]"""
+    import argparse
+    from config import Config
+    from database import database
+
+    parser = argparse.ArgumentParser(description="Render every public card as static files")
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Rendering processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    if not Config.STATIC_CARDS_PATH:
+        parser.error("STATIC_CARDS_PATH is not set")
+    database.init_database()
+    writer = StaticCardWriter(Config.STATIC_CARDS_PATH, Config.STATIC_CARDS_TEMPLATE or None)
+    conn = database.get_connection()
+    try:
+        written, removed = rebuild(conn, writer, args.workers)
+    finally:
+        conn.close()
+    print(f"Rendered {written} changed cards, removed {removed} stale pages")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Username availability: every taken username is held in memory, warmed from
+# profiles.username at startup and updated on profile saves and deletes, so
+# the check-username endpoint (called on each keystroke in the profile editor)
+# answers without a query. The database's UNIQUE constraint stays the source
+# of truth; saves still check it, and the index is reloaded periodically in
+# the background to pick up writes made by other workers.
+
+MIN_LENGTH = 3
+MAX_LENGTH = 30
+
+DEFAULT_SUGGESTIONS = 3
+
+# Upper bound on candidates tried per call, so a heavily taken name stays cheap
+MAX_CANDIDATES = 200
+
+def candidates(username):
+    """Yield alternatives closest to username first: name1, name_, name-, name2, name_1, ...
+
+    The base is shortened when needed so every candidate stays within
+    MAX_LENGTH.
+    """
+    yield from _fit(username, '1')
+    yield from _fit(username, '_')
+    yield from _fit(username, '-')
+    number = 2
+    while True:
+        yield from _fit(username, str(number))
+        yield from _fit(username, f"_{number - 1}")
+        number += 1
+
+def _fit(username, suffix):
+    base = username[:MAX_LENGTH - len(suffix)]
+    if len(base) + len(suffix) >= MIN_LENGTH:
+        yield base + suffix
+
+class UsernameIndex:
+    """Thread-safe map of taken usernames to their owners' user ids"""
+
+    def __init__(self, refresh_interval=300.0):
+        self.refresh_interval = refresh_interval
+        self._owners = {}
+        self._by_user = {}
+        self._lock = threading.Lock()
+        # Writes made while a reload reads its rows (None when not reloading)
+        self._journal = None
+        self._loading = 0
+        self.loaded_at = None
+
+        # Counters
+        self.lookups = 0
+        self.reloads = 0
+
+    def __len__(self):
+        return len(self._owners)
+
+    def begin_load(self):
+        """Start recording writes; call before reading the rows for load() and
+        pass the returned marker to it"""
+        with self._lock:
+            if self._journal is None:
+                self._journal = []
+            self._loading += 1
+            return len(self._journal)
+
+    def cancel_load(self):
+        """End a begin_load() whose rows could not be read"""
+        with self._lock:
+            self._loading -= 1
+            if not self._loading:
+                self._journal = None
+
+    def load(self, rows, since=None):
+        """Replace the contents with (username, user_id) pairs.
+
+        Writes recorded since the begin_load() marker are replayed on top of
+        the rows, so a name claimed while the rows were being read is not lost.
+        """
+        owners = {}
+        by_user = {}
+        for username, user_id in rows:
+            owners[username] = str(user_id)
+            by_user[str(user_id)] = username
+        with self._lock:
+            if since is not None:
+                for write, args in self._journal[since:]:
+                    write(owners, by_user, *args)
+                self._loading -= 1
+                if not self._loading:
+                    self._journal = None
+            self._owners = owners
+            self._by_user = by_user
+            self.loaded_at = time.monotonic()
+            self.reloads += 1
+
+    @staticmethod
+    def _set(owners, by_user, user_id, username):
+        previous = by_user.get(user_id)
+        if previous is not None and owners.get(previous) == user_id:
+            del owners[previous]
+        owners[username] = user_id
+        by_user[user_id] = username
+
+    @staticmethod
+    def _discard(owners, by_user, user_id):
+        username = by_user.pop(user_id, None)
+        if username is not None and owners.get(username) == user_id:
+            del owners[username]
+
+    def _write(self, write, *args):
+        with self._lock:
+            write(self._owners, self._by_user, *args)
+            if self._journal is not None:
+                self._journal.append((write, args))
+
+    def set(self, user_id, username):
+        """Record that user_id now owns username, releasing their previous one"""
+        self._write(self._set, str(user_id), username)
+
+    def discard_user(self, user_id):
+        """Release the username held by user_id, if any"""
+        self._write(self._discard, str(user_id))
+
+    def is_taken(self, username, user_id=None):
+        """Whether username belongs to someone other than user_id"""
+        with self._lock:
+            self.lookups += 1
+            owner = self._owners.get(username)
+        return owner is not None and owner != (str(user_id) if user_id is not None else None)
+
+    def suggest(self, username, limit=DEFAULT_SUGGESTIONS):
+        """Up to ``limit`` free usernames near username"""
+        suggestions = []
+        with self._lock:
+            for tried, candidate in enumerate(candidates(username)):
+                if tried >= MAX_CANDIDATES or len(suggestions) >= limit:
+                    break
+                if candidate not in self._owners:
+                    suggestions.append(candidate)
+        return suggestions
+
+    def check(self, username, user_id=None, limit=DEFAULT_SUGGESTIONS):
+        """Availability of username plus suggestions when it is taken"""
+        taken = self.is_taken(username, user_id)
+        return {
+            "username": username,
+            "available": not taken,
+            "suggestions": self.suggest(username, limit) if taken else []
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "usernames": len(self._owners),
+                "lookups": self.lookups,
+                "reloads": self.reloads
+            }
+
+def load_index(conn, index):
+    """Warm or refresh the index from profiles.username"""
+    since = index.begin_load()
+    try:
+        rows = conn.execute('SELECT username, user_id FROM profiles').fetchall()
+    except Exception:
+        index.cancel_load()
+        raise
+    index.load(rows, since)
+
+class IndexRefresher:
+    """Daemon thread that reloads the index every refresh_interval seconds.
+
+    ``load`` does the actual reload (e.g. a query through the pool), so
+    requests never wait on it; a failed reload keeps the current contents.
+    """
+
+    def __init__(self, index, load):
+        self.index = index
+        self.load = load
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.index.refresh_interval:
+            self._thread = threading.Thread(target=self._run, name='username-index', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.index.refresh_interval):
+            try:
+                self.load()
+            except Exception:
+                logger.exception("Failed to refresh the username index")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
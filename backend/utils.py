@@ -1,3 +1,7 @@
+import base64
+import hashlib
+import hmac
+import json
 import re
 import sqlite3
 
@@ -46,4 +50,147 @@ def validate_required_fields(data, required_fields):
     if missing_fields:
         return False, f"Missing required fields: {', '.join(missing_fields)}"
     
-    return True, None
\ No newline at end of file
+    return True, None
+
+def ensure_column(conn, table, column, definition):
+    """Add a column to an existing table if an older schema lacks it"""
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def parse_batch_lookup(data, max_items, id_type=int):
+    """Validate a batch lookup body of {"usernames": [...], "user_ids": [...]}.
+
+    Returns de-duplicated (usernames, user_ids) in request order and raises
+    ValueError with a client-facing message.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    usernames = data.get('usernames') or []
+    user_ids = data.get('user_ids') or []
+    if not isinstance(usernames, list) or not isinstance(user_ids, list):
+        raise ValueError("usernames and user_ids must be lists")
+    if not usernames and not user_ids:
+        raise ValueError("Provide usernames or user_ids")
+    if len(usernames) + len(user_ids) > max_items:
+        raise ValueError(f"At most {max_items} profiles per request")
+
+    cleaned_usernames = []
+    for username in usernames:
+        username = str(username).strip().lower()
+        if not validate_username(username):
+            raise ValueError(f"Invalid username: {username}")
+        if username not in cleaned_usernames:
+            cleaned_usernames.append(username)
+
+    cleaned_ids = []
+    for user_id in user_ids:
+        try:
+            user_id = id_type(user_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid user id: {user_id}")
+        if user_id not in cleaned_ids:
+            cleaned_ids.append(user_id)
+
+    return cleaned_usernames, cleaned_ids
+
+def parse_patch(data, allowed_fields):
+    """Validate a PATCH body of changed fields plus an optional expected version.
+
+    Only keys present in the body are returned, so omitted fields keep their
+    stored values and explicit nulls clear them. Raises ValueError with a
+    client-facing message.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    data = dict(data)
+    expected_version = data.pop('version', None)
+    if expected_version is not None:
+        if isinstance(expected_version, bool) or not isinstance(expected_version, int):
+            raise ValueError("version must be an integer")
+    unknown = sorted(key for key in data if key not in allowed_fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if not data:
+        raise ValueError("No fields to update")
+    for field, value in data.items():
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{field} must be a string or null")
+    return data, expected_version
+
+# Keyset (cursor) pagination shared by the list endpoints. Pages are ordered
+# by (sort value, id) and continue strictly after the last row of the previous
+# page, so page 500 costs the same index seek as page 1. Cursors are opaque
+# and HMAC-signed with the app secret and the list's scope, so clients cannot
+# forge positions or replay a cursor against another list.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a ?limit= value to [1, maximum]"""
+    if value is None or value == '':
+        return default
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(size, maximum))
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _cursor_signature(payload, secret, scope):
+    mac = hmac.new(secret.encode('utf-8'), scope.encode('utf-8') + b'|' + payload, hashlib.sha256)
+    return mac.digest()[:16]
+
+def encode_cursor(values, secret, scope=''):
+    """Encode the last row's (sort value, id) as an opaque signed cursor"""
+    payload = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return _b64encode(payload) + '.' + _b64encode(_cursor_signature(payload, secret, scope))
+
+def decode_cursor(cursor, secret, scope=''):
+    """Verify and decode a cursor; raises ValueError if it is malformed or forged"""
+    try:
+        payload_text, signature_text = cursor.split('.', 1)
+        payload = _b64decode(payload_text)
+        signature = _b64decode(signature_text)
+    except (ValueError, AttributeError):
+        raise ValueError("Invalid cursor")
+    if not hmac.compare_digest(signature, _cursor_signature(payload, secret, scope)):
+        raise ValueError("Invalid cursor")
+    try:
+        values = json.loads(payload)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+def keyset_condition(sort_column, id_column, descending=True):
+    """SQL condition selecting rows after (sort value, id) in page order.
+
+    Written as a row-value comparison so SQLite can use it as a range bound
+    on a (..., sort_column, id_column) index instead of filtering every
+    earlier row.
+    """
+    op = '<' if descending else '>'
+    return f'({sort_column}, {id_column}) {op} (?, ?)'
+
+def keyset_params(sort_value, row_id):
+    """Parameters for keyset_condition"""
+    return [sort_value, row_id]
+
+def keyset_page(rows, limit, cursor_values, secret, scope=''):
+    """Trim a limit+1 fetch to one page and build the next cursor if more remain.
+
+    ``cursor_values(row)`` returns the (sort value, id) of a row.
+    """
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_cursor(cursor_values(page[-1]), secret, scope)
+    return page, next_cursor
@@ -0,0 +1,207 @@
+import base64
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from urllib.parse import quote
+from images import IMAGE_URL_PREFIX, decode_data_uri, image_url, is_valid_digest, ImageError
+from queries import fetch_cards
+from static_cards import LINK_PREFIXES, link_href
+from utils import keyset_condition, keyset_params
+
+# "Save contact": RFC 6350 (vCard 4.0) cards built from the same joined card
+# row as the public profile endpoints. Single cards are cached with the other
+# card representations; a user's whole connections list is streamed one
+# keyset page at a time so it is never held in memory.
+
+PHOTO_MODES = ('embed', 'link', 'none')
+
+# Photos larger than this are linked instead of embedded
+MAX_EMBED_BYTES = 64 * 1024
+
+# vCard lines are folded at 75 octets (RFC 6350 section 3.2)
+MAX_LINE_OCTETS = 75
+
+BULK_CHUNK_SIZE = 200
+
+_UID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'https://tapzx.app/')
+
+def escape_text(value):
+    """Escape a TEXT value: backslash, comma, semicolon and newlines"""
+    value = str(value).replace('\\', '\\\\').replace(',', '\\,').replace(';', '\\;')
+    return value.replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+
+# Characters allowed unencoded in a URI (RFC 3986 reserved and unreserved)
+_URI_SAFE = ":/?#[]@!$&'()*+,;=-._~%"
+
+_CONTROL_CHARS = re.compile(r'[\x00-\x1f\x7f]')
+
+def escape_uri(value):
+    """Make a URI value safe for a content line: control characters are
+    dropped and anything else outside RFC 3986 is percent-encoded, so a
+    stored link can never end the line or add a property"""
+    return quote(_CONTROL_CHARS.sub('', str(value)), safe=_URI_SAFE)
+
+def fold(line):
+    """Split a content line into CRLF-joined chunks of at most 75 octets"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line + '\r\n'
+    chunks = []
+    start = 0
+    limit = MAX_LINE_OCTETS
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split inside a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        chunks.append(encoded[start:end].decode('utf-8'))
+        start = end
+        limit = MAX_LINE_OCTETS - 1  # continuation lines start with a space
+    return '\r\n '.join(chunks) + '\r\n'
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y%m%dT%H%M%SZ')
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '')).strftime('%Y%m%dT%H%M%SZ')
+        except ValueError:
+            return None
+    return None
+
+def card_photo(profile_image, store, mode='embed', base_url=''):
+    """The PHOTO URI for a profile image: a data URI, an absolute URL or None.
+
+    Images in the blob store are embedded from their thumbnail (or linked
+    when too large or when mode is "link"); external URLs are always linked.
+    """
+    if not profile_image or mode == 'none':
+        return None
+    if profile_image.startswith(IMAGE_URL_PREFIX):
+        digest = profile_image[len(IMAGE_URL_PREFIX):].split('?', 1)[0]
+        if not is_valid_digest(digest):
+            return None
+        if mode == 'embed' and store is not None:
+            resolved = store.resolve(digest, 'thumb')
+            if resolved and os.path.getsize(resolved[0]) <= MAX_EMBED_BYTES:
+                path, content_type, _ = resolved
+                with open(path, 'rb') as f:
+                    data = base64.b64encode(f.read()).decode('ascii')
+                return f"data:{content_type};base64,{data}"
+        return base_url.rstrip('/') + image_url(digest) + '?size=thumb'
+    if profile_image.startswith('data:'):
+        # Legacy inline images that were never moved into the blob store
+        try:
+            data = decode_data_uri(profile_image)
+        except ImageError:
+            return None
+        if mode == 'embed' and data is not None and len(data) <= MAX_EMBED_BYTES:
+            return profile_image
+        return None
+    if profile_image.startswith(('http://', 'https://')):
+        return profile_image
+    return None
+
+def build_vcard(card, photo=None, categories=()):
+    """Render one card as a vCard 4.0 string with CRLF line endings.
+
+    ``photo`` is a URI from card_photo(); ``categories`` become CATEGORIES
+    (a connection's tags, for example).
+    """
+    profile = card['profile']
+    user = card['user'] or {}
+    links = card['links'] or {}
+    full_name = (user.get('full_name') or profile['username']).strip()
+    given, _, family = full_name.rpartition(' ')
+    if not given:
+        given, family = family, ''
+
+    lines = [
+        'BEGIN:VCARD',
+        'VERSION:4.0',
+        f"UID:urn:uuid:{uuid.uuid5(_UID_NAMESPACE, str(profile['user_id']))}",
+        f"FN:{escape_text(full_name)}",
+        f"N:{escape_text(family)};{escape_text(given)};;;",
+        f"NICKNAME:{escape_text(profile['username'])}"
+    ]
+    if profile.get('organization_name'):
+        lines.append(f"ORG:{escape_text(profile['organization_name'])}")
+    if profile.get('location'):
+        lines.append(f"ADR;TYPE=work:;;;{escape_text(profile['location'])};;;")
+    if profile.get('bio'):
+        lines.append(f"NOTE:{escape_text(profile['bio'])}")
+
+    emails = []
+    for email in (user.get('email'), links.get('email')):
+        if email and email.strip().lower() not in emails:
+            emails.append(email.strip().lower())
+    for preference, email in enumerate(emails, 1):
+        lines.append(f"EMAIL;TYPE=work;PREF={preference}:{escape_text(email)}")
+    if links.get('phone'):
+        lines.append(f"TEL;VALUE=uri;TYPE=\"cell,voice\":{escape_uri(link_href('phone', links['phone']))}")
+    if links.get('whatsapp'):
+        lines.append(f"URL;TYPE=x-whatsapp:{escape_uri(link_href('whatsapp', links['whatsapp']))}")
+    if links.get('website'):
+        lines.append(f"URL;TYPE=work:{escape_uri(link_href('website', links['website']))}")
+    if profile.get('profile_url'):
+        lines.append(f"URL;TYPE=x-tapzx:{escape_uri('https://' + profile['profile_url'])}")
+    for field in LINK_PREFIXES:
+        if links.get(field):
+            lines.append(f"X-SOCIALPROFILE;TYPE={field}:{escape_uri(link_href(field, links[field]))}")
+    if links.get('discord'):
+        lines.append(f"IMPP:discord:{escape_text(links['discord'])}")
+    if photo:
+        lines.append(f"PHOTO:{escape_uri(photo)}")
+    if categories:
+        lines.append('CATEGORIES:' + ','.join(escape_text(category) for category in categories))
+    revision = _timestamp(profile.get('updated_at'))
+    if revision:
+        lines.append(f"REV:{revision}")
+    lines.append('END:VCARD')
+    return ''.join(fold(line) for line in lines)
+
+CONNECTION_PAGE_SQL = '''
+    SELECT id, target_user_id, tags, created_at FROM connections
+    WHERE owner_id = ?
+'''
+
+def iter_connection_vcards(get_connection, owner_id, store=None, photo='link', base_url='',
+                           tag=None, chunk_size=BULK_CHUNK_SIZE):
+    """Yield one vCard per connection, newest first, one keyset page per query.
+
+    Each page is a connections range scan plus one batched card lookup, and
+    the pooled connection is released between pages.
+    """
+    after = None
+    while True:
+        sql = CONNECTION_PAGE_SQL
+        params = [owner_id]
+        if after:
+            sql += ' AND ' + keyset_condition('created_at', 'id')
+            params.extend(keyset_params(*after))
+        if tag:
+            sql += ' AND EXISTS (SELECT 1 FROM json_each(tags) WHERE json_each.value = ?)'
+            params.append(tag)
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(chunk_size)
+
+        conn = get_connection()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            cards = fetch_cards(conn, user_ids=[row['target_user_id'] for row in rows]) if rows else []
+        finally:
+            conn.close()
+        if not rows:
+            return
+
+        by_user_id = {card['profile']['user_id']: card for card in cards if card['user']}
+        for row in rows:
+            card = by_user_id.get(row['target_user_id'])
+            if card:
+                yield build_vcard(
+                    card, card_photo(card['profile'].get('profile_image'), store, photo, base_url),
+                    json.loads(row['tags'])
+                )
+        after = (rows[-1]['created_at'], rows[-1]['id'])